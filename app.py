@@ -1,14 +1,26 @@
 """Main Streamlit application."""
 
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import uuid
+import queue
+import time
 
 from src.services import LinkedInScraper, LLMService
 from src.memory import MemoryManager
 from src.graph import create_workflow, GraphState
 from src.config.settings import settings
-from src.utils.helpers import format_profile_data, extract_message_content
+from src.utils.helpers import format_profile_data, extract_message_content, generate_session_id, shrink_text
+
+
+# Seconds to wait for the next streamed token before re-checking the workflow
+STREAM_POLL_INTERVAL = 0.05
+
+# Number of most recent chat messages rendered on every rerun
+CHAT_HISTORY_WINDOW = 20
+
+# Seconds between reruns while a background profile scrape is running
+SCRAPE_POLL_INTERVAL = 1.0
 
 
 # Page configuration
@@ -23,13 +35,22 @@ st.set_page_config(
 def initialize_session_state():
     """Initialize Streamlit session state."""
     if 'session_id' not in st.session_state:
-        st.session_state.session_id = str(uuid.uuid4())
+        st.session_state.session_id = generate_session_id()
     
     if 'memory_manager' not in st.session_state:
-        st.session_state.memory_manager = MemoryManager(st.session_state.session_id)
+        st.session_state.memory_manager = MemoryManager(
+            st.session_state.session_id,
+            summarizer=get_llm_service().summarize_conversation
+        )
     
     if 'workflow' not in st.session_state:
-        st.session_state.workflow = create_workflow(st.session_state.memory_manager)
+        st.session_state.workflow = create_workflow(
+            st.session_state.memory_manager,
+            get_llm_service()
+        )
+    
+    if 'workflow_app' not in st.session_state:
+        st.session_state.workflow_app = st.session_state.workflow.compile()
     
     if 'profile_loaded' not in st.session_state:
         st.session_state.profile_loaded = False
@@ -39,10 +60,56 @@ def initialize_session_state():
     
     if 'profile_data' not in st.session_state:
         st.session_state.profile_data = None
+    
+    if 'scrape_future' not in st.session_state:
+        st.session_state.scrape_future = None
+    
+    if 'state_template' not in st.session_state:
+        # Graph state fields that are identical for every query in a session
+        st.session_state.state_template = {
+            "profile_url": None,
+            "profile_analysis": None,
+            "job_match_results": None,
+            "generated_content": None,
+            "career_guidance": None,
+            "next_agent": None,
+            "session_id": st.session_state.session_id
+        }
+
+
+@st.cache_resource
+def get_llm_service() -> LLMService:
+    """Get the process-wide LLM service."""
+    return LLMService()
+
+
+@st.cache_resource
+def get_scraper() -> LinkedInScraper:
+    """Get the process-wide LinkedIn scraper."""
+    return LinkedInScraper()
+
+
+@st.cache_resource
+def get_scrape_executor() -> ThreadPoolExecutor:
+    """Get the process-wide executor used for background profile scrapes."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="scraper")
+
+
+@st.cache_resource
+def get_workflow_executor() -> ThreadPoolExecutor:
+    """Get the process-wide executor used to run streamed workflow queries."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="workflow")
 
 
 def display_sidebar():
     """Display sidebar with profile info and controls."""
+    # Snapshot session state once per rerun; the sidebar reruns on every keystroke
+    state = st.session_state
+    memory_manager = state.memory_manager
+    saved_target_role = memory_manager.get_target_role() or ""
+    saved_career_goals = memory_manager.get_career_goals() or ""
+    saved_custom_jd = state.get('custom_jd', '')
+    
     with st.sidebar:
         st.title("Profile Optimizer")
         
@@ -56,19 +123,26 @@ def display_sidebar():
             help="Paste your LinkedIn profile URL here"
         )
         
-        if st.button("Load Profile", type="primary", use_container_width=True):
+        force_refresh = st.checkbox(
+            "Re-scrape profile",
+            help="Ignore the cached copy of this profile and fetch it again"
+        )
+        
+        scrape_pending = state.scrape_future is not None
+        if st.button("Load Profile", type="primary", use_container_width=True, disabled=scrape_pending):
             if linkedin_url:
-                with st.spinner("Scraping LinkedIn profile..."):
-                    load_linkedin_profile(linkedin_url)
+                load_linkedin_profile(linkedin_url, force_refresh)
             else:
                 st.error("Please enter a valid LinkedIn URL")
         
+        check_profile_load()
+        
         st.markdown("---")
         
         # Profile Status
-        if st.session_state.profile_loaded:
+        if state.profile_loaded:
             st.success("Profile Loaded!")
-            profile = st.session_state.memory_manager.get_profile()
+            profile = memory_manager.get_profile()
             if profile:
                 st.write(f"**Name:** {profile.get('full_name', 'N/A')}")
                 st.write(f"**Headline:** {profile.get('headline', 'N/A')[:50]}...")
@@ -85,22 +159,22 @@ def display_sidebar():
         st.subheader("🎯 Career Goals")
         target_role = st.text_input(
             "Target Role",
-            value=st.session_state.memory_manager.get_target_role() or "",
+            value=saved_target_role,
             placeholder="e.g., Data Analyst"
         )
         
-        if target_role:
-            st.session_state.memory_manager.set_target_role(target_role)
+        if target_role and target_role != saved_target_role:
+            memory_manager.set_target_role(target_role)
         
         career_goals = st.text_area(
             "Career Goals",
-            value=st.session_state.memory_manager.get_career_goals() or "",
+            value=saved_career_goals,
             placeholder="Describe your career aspirations...",
             height=100
         )
         
-        if career_goals:
-            st.session_state.memory_manager.set_career_goals(career_goals)
+        if career_goals and career_goals != saved_career_goals:
+            memory_manager.set_career_goals(career_goals)
         
         st.markdown("---")
         
@@ -117,7 +191,7 @@ def display_sidebar():
         if jd_option == "Paste Custom JD":
             custom_jd = st.text_area(
                 "Paste Job Description",
-                value=st.session_state.get('custom_jd', ''),
+                value=saved_custom_jd,
                 placeholder="""Paste the full job description here...
 
 Example:
@@ -138,47 +212,47 @@ Requirements:
             
             # Save to session state
             if custom_jd:
-                st.session_state.custom_jd = custom_jd
+                state.custom_jd = custom_jd
                 st.info(f"✅ Custom JD loaded ({len(custom_jd)} characters)")
             else:
-                st.session_state.custom_jd = ""
+                state.custom_jd = ""
             
             # Clear online search settings
-            st.session_state.use_online_search = False
+            state.use_online_search = False
             
         else:
             # Clear custom JD if switching modes
-            st.session_state.custom_jd = ""
+            state.custom_jd = ""
             
             # Location input for online search
             location = st.text_input(
                 "Location (Optional)",
-                value=st.session_state.get('job_location', ''),
+                value=state.get('job_location', ''),
                 placeholder="e.g., San Francisco, CA",
                 help="For online job search"
             )
             
             if location:
-                st.session_state.job_location = location
+                state.job_location = location
             
             use_online_search = st.checkbox(
                 "🔍 Search for real job postings online",
-                value=st.session_state.get('use_online_search', False),
+                value=state.get('use_online_search', False),
                 help="Uses Tavily API to fetch actual job descriptions"
             )
             
-            st.session_state.use_online_search = use_online_search
+            state.use_online_search = use_online_search
             
             if use_online_search and not settings.tavily_api_key:
                 st.warning("⚠️ Tavily API key not configured. Will use default JD database.")
         
         # Job Fit Analysis button - placed after Job Description section
-        if st.session_state.profile_loaded:
+        if state.profile_loaded:
             st.markdown("")  # Small spacing
             if st.button("🎯 Job Fit Analysis", type="primary", use_container_width=True):
                 if target_role:
                     # Build query with custom JD info
-                    if st.session_state.get('custom_jd'):
+                    if state.custom_jd:
                         handle_quick_action(
                             f"Analyze my fit for {target_role} using the custom job description I provided"
                         )
@@ -191,17 +265,34 @@ Requirements:
         
         # Clear Chat
         if st.button("🗑️ Clear Chat", use_container_width=True):
-            st.session_state.messages = []
-            st.session_state.memory_manager.clear_session()
+            state.messages = []
+            memory_manager.clear_session()
             st.rerun()
 
 
-def load_linkedin_profile(url: str):
-    """Load LinkedIn profile from URL."""
+def load_linkedin_profile(url: str, force_refresh: bool = False):
+    """Start loading a LinkedIn profile from URL in the background."""
+    print(f"\n[APP] Starting profile load for URL: {url}")
+    # The scraper caches profiles by username, so reloads skip the actor run
+    st.session_state.scrape_future = get_scrape_executor().submit(
+        get_scraper().scrape_profile, url, force_refresh
+    )
+
+
+def check_profile_load():
+    """Poll the background profile scrape and apply its result once finished."""
+    future = st.session_state.scrape_future
+    if future is None:
+        return
+    
+    if not future.done():
+        st.info("⏳ Scraping LinkedIn profile... You can keep editing your settings meanwhile.")
+        return
+    
+    st.session_state.scrape_future = None
+    
     try:
-        print(f"\n[APP] Starting profile load for URL: {url}")
-        scraper = LinkedInScraper()
-        profile_data = scraper.scrape_profile(url)
+        profile_data = future.result()
         
         if profile_data:
             st.session_state.profile_data = profile_data
@@ -251,7 +342,6 @@ How can I help you optimize your profile today?
                 "role": "assistant",
                 "content": welcome_msg
             })
-            st.rerun()
         else:
             st.error("❌ Failed to load profile. The scraper returned no data.")
             st.info("""
@@ -289,47 +379,89 @@ def handle_quick_action(query: str):
         "content": query
     })
     
-    # Process query
+    # Process query; the chat interface renders after the sidebar, so the
+    # new messages show up in this same run
     process_user_query(query)
+
+
+def invoke_with_streaming(workflow_app, initial_state: GraphState, placeholder):
+    """
+    Run the workflow on a worker thread while streaming LLM output into a placeholder.
+    
+    Tokens are handed over through a queue and rendered with st.write_stream;
+    chunks that arrive together are coalesced into a single render.
+    
+    Args:
+        workflow_app: Compiled workflow
+        initial_state: Graph state to invoke the workflow with
+        placeholder: st.empty() placeholder to stream into
+        
+    Returns:
+        Final workflow state
+    """
+    tokens = queue.Queue()
+    
+    def run():
+        with get_llm_service().streaming_to(tokens.put):
+            return workflow_app.invoke(initial_state)
+    
+    future = get_workflow_executor().submit(run)
     
-    st.rerun()
+    def token_stream():
+        while not future.done() or not tokens.empty():
+            try:
+                chunk = tokens.get(timeout=STREAM_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            while not tokens.empty():
+                chunk += tokens.get_nowait()
+            yield chunk
+    
+    with placeholder.container():
+        st.write_stream(token_stream())
+    
+    return future.result()
 
 
-def process_user_query(query: str):
-    """Process user query through the workflow."""
+def process_user_query(query: str, placeholder=None):
+    """
+    Process user query through the workflow.
+    
+    Args:
+        query: User query
+        placeholder: Optional st.empty() placeholder to stream the response into
+    """
+    state = st.session_state
+    
     try:
-        memory_manager = st.session_state.memory_manager
+        memory_manager = state.memory_manager
         
         # Save user message
         memory_manager.add_message("user", query)
         
         # Get custom JD and search preferences from session state
-        custom_jd = st.session_state.get('custom_jd', '')
-        use_online_search = st.session_state.get('use_online_search', False)
-        location = st.session_state.get('job_location', '')
+        custom_jd = state.get('custom_jd', '')
+        use_online_search = state.get('use_online_search', False)
+        location = state.get('job_location', '')
         
-        # Create initial state
+        # Create initial state from the per-session template
         initial_state = GraphState(
+            **state.state_template,
             messages=[{"role": "user", "content": query}],
-            profile_data=st.session_state.profile_data,
-            profile_url=None,
+            profile_data=state.profile_data,
             target_role=memory_manager.get_target_role(),
             career_goals=memory_manager.get_career_goals(),
-            job_description=custom_jd if custom_jd else None,
+            job_description=shrink_text(custom_jd, settings.max_job_description_chars) if custom_jd else None,
             use_online_search=use_online_search,
             job_location=location,
-            profile_analysis=None,
-            job_match_results=None,
-            generated_content=None,
-            career_guidance=None,
-            next_agent=None,
-            session_id=st.session_state.session_id,
             user_query=query
         )
         
-        # Run workflow
-        workflow_app = st.session_state.workflow.compile()
-        result = workflow_app.invoke(initial_state)
+        # Run workflow (compiled once per session), streaming tokens if requested
+        if placeholder is not None:
+            result = invoke_with_streaming(state.workflow_app, initial_state, placeholder)
+        else:
+            result = state.workflow_app.invoke(initial_state)
         
         # Get assistant response - Handle both AIMessage objects and dict messages
         if result["messages"]:
@@ -363,6 +495,9 @@ def process_user_query(query: str):
         print(f"[ERROR] {error_msg}")
         import traceback
         print(f"[ERROR TRACEBACK]\n{traceback.format_exc()}")
+    finally:
+        # One session write per turn instead of one per message and analysis
+        state.memory_manager.flush()
 
 
 def display_chat_interface():
@@ -370,11 +505,27 @@ def display_chat_interface():
     st.title("💼 LinkedIn Profile Optimizer")
     st.markdown("*AI-powered career guidance and profile optimization*")
     
+    display_chat_messages()
+
+
+@st.fragment
+def display_chat_messages():
+    """Display chat history and input; reruns on its own without the sidebar."""
     # Display chat messages
     chat_container = st.container()
     
     with chat_container:
-        for message in st.session_state.messages:
+        messages = st.session_state.messages
+        older = messages[:-CHAT_HISTORY_WINDOW]
+        recent = messages[-CHAT_HISTORY_WINDOW:]
+        
+        # Older messages are only rendered on demand
+        if older and st.toggle(f"Show {len(older)} earlier messages", key="show_older_messages"):
+            for message in older:
+                with st.chat_message(message["role"]):
+                    st.markdown(message["content"])
+        
+        for message in recent:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
     
@@ -395,16 +546,15 @@ def display_chat_interface():
             
             # Process and display assistant response
             with st.chat_message("assistant"):
+                placeholder = st.empty()
                 with st.spinner("Thinking..."):
-                    process_user_query(prompt)
-                    
-                    # Display the response
-                    if st.session_state.messages:
-                        last_msg = st.session_state.messages[-1]
-                        if last_msg["role"] == "assistant":
-                            st.markdown(last_msg["content"])
-            
-            st.rerun()
+                    process_user_query(prompt, placeholder)
+                
+                # Replace the streamed draft with the final formatted response
+                if st.session_state.messages:
+                    last_msg = st.session_state.messages[-1]
+                    if last_msg["role"] == "assistant":
+                        placeholder.markdown(last_msg["content"])
 
 
 def main():
@@ -423,6 +573,11 @@ def main():
         """,
         unsafe_allow_html=True
     )
+    
+    # Keep polling while a profile scrape runs in the background
+    if st.session_state.scrape_future is not None:
+        time.sleep(SCRAPE_POLL_INTERVAL)
+        st.rerun()
 
 
 if __name__ == "__main__":
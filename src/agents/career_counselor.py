@@ -1,8 +1,33 @@
 """Career counseling agent."""
 
+import re
+from collections import Counter
 from typing import Dict, Any, Optional
 from src.services.llm_service import LLMService
-from src.utils.helpers import format_profile_data
+from src.config.settings import settings
+from src.utils.helpers import format_profile_data, shrink_text
+from src.utils.prompts import COMPREHENSIVE_COUNSELING_PROMPT, CONVERSATIONAL_COUNSELING_PROMPT
+
+
+# Section header keywords, checked in order; the first match wins
+SECTION_HEADER_KEYWORDS = (
+    ("skill_gaps", ("skill gap", "missing skill", "need to learn")),
+    ("learning_resources", ("learning", "resource", "course", "certification")),
+    ("next_steps", ("next step", "action", "recommendation")),
+    ("timeline", ("timeline",)),
+)
+
+YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+
+# Non-empty lines, walked lazily instead of splitting the whole response
+LINE_PATTERN = re.compile(r'[^\n]+')
+
+# Queries asking for full, structured guidance rather than a quick answer
+COMPREHENSIVE_QUERY_PATTERN = re.compile(
+    r'full guidance|complete guidance|career plan|skill gap analysis|'
+    r'learning path|career roadmap|comprehensive|detailed guidance',
+    re.IGNORECASE
+)
 
 
 class CareerCounselorAgent:
@@ -22,7 +47,8 @@ class CareerCounselorAgent:
         profile_data: Dict[str, Any],
         query: str,
         career_goals: Optional[str] = None,
-        target_role: Optional[str] = None
+        target_role: Optional[str] = None,
+        formatted_profile: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Provide career counseling and guidance.
@@ -32,107 +58,43 @@ class CareerCounselorAgent:
             query: User's question or concern
             career_goals: Stated career goals
             target_role: Target job role
+            formatted_profile: Pre-formatted profile text (formatted on demand if omitted)
             
         Returns:
             Counseling response dictionary
         """
-        formatted_profile = format_profile_data(profile_data)
-        
-        # Analyze skill evolution (ignore endorsements)
-        skill_evolution = self._analyze_skill_evolution(profile_data)
+        if formatted_profile is None:
+            formatted_profile = format_profile_data(profile_data)
+        formatted_profile = shrink_text(formatted_profile, settings.max_profile_chars)
         
         # Check if this is a simple conversational query or a comprehensive guidance request
-        query_lower = query.lower()
-        is_comprehensive = any(keyword in query_lower for keyword in [
-            'full guidance', 'complete guidance', 'career plan', 'skill gap analysis',
-            'learning path', 'career roadmap', 'comprehensive', 'detailed guidance'
-        ])
+        is_comprehensive = bool(COMPREHENSIVE_QUERY_PATTERN.search(query))
         
         # Enhanced prompt based on query type
         if is_comprehensive:
-            enhanced_query = f"""
-You are a senior career counselor with expertise in tech and professional development.
-
-TASK: Provide comprehensive career guidance and a personalized development roadmap.
-
-CURRENT PROFILE:
-{formatted_profile}
-
-SKILL EVOLUTION ANALYSIS:
-- Recent skills (last 2 years): {', '.join(skill_evolution['recent_skills'][:8])}
-- Older skills: {', '.join(skill_evolution['older_skills'][:8])}
-- Consistently used across roles: {', '.join(skill_evolution['consistent_skills'][:8])}
-- Skill acquisition rate: {skill_evolution['new_skills_per_year']} new skills/year (avg)
-
-CAREER GOALS: {career_goals or "Not specified - please infer from profile"}
-TARGET ROLE: {target_role or "Not specified"}
-USER QUESTION: {query}
-
-COMPREHENSIVE ANALYSIS REQUIRED:
-Focus on practical skill development and career trajectory. Endorsements are optional - what matters is building real competency and demonstrating it through work.
-
-OUTPUT FORMAT:
-**CAREER ASSESSMENT:**
-[2-3 sentences on current positioning and trajectory - include skill evolution insights]
-
-**SKILL GAP ANALYSIS:**
-1. [Critical gap - considering current skill trajectory]
-2. [Important gap - based on recent vs. target skills]
-3. [Nice-to-have skill - explain why it matters]
-
-**LEARNING ROADMAP:** (Prioritized by current skill base and market demand)
-**Immediate (0-3 months):** (Build on recent skills)
-- [Resource leveraging existing knowledge + practical project suggestion]
-- [Resource leveraging existing knowledge + practical project suggestion]
-
-**Short-term (3-6 months):** (Fill critical gaps with hands-on practice)
-- [Resource + practical project suggestion]
-- [Resource + practical project suggestion]
-
-**Long-term (6-12 months):** (Advanced capabilities + portfolio building)
-- [Resource + real-world application idea]
-
-**ACTION PLAN:**
-1. [Leverage current momentum in: {skill_evolution['recent_skills'][0] if skill_evolution['recent_skills'] else 'N/A'}]
-2. [Build demonstrable experience in: ...]
-3. [Document work on resume/portfolio: ...]
-4. Optional later: Seek endorsements from colleagues (minor boost)
-
-**TIMELINE:** [Realistic timeline based on skill acquisition velocity]
-
-**SKILL PORTFOLIO STRATEGY:**
-- Keep sharp: [Skills to maintain through practice]
-- Sunset: [Outdated skills to deprioritize]
-- Acquire: [New skills to add with hands-on projects]
-- Demonstrate: [How to show these skills in action]
-
-**NETWORKING SUGGESTIONS:** [Specific communities/events to join]
-
-The goal is building real competency, not just collecting endorsements. Focus on doing the work.
-Be realistic, supportive, and specific. Tailor advice to their experience level.
-"""
+            # Analyze skill evolution (ignore endorsements)
+            skill_evolution = self._analyze_skill_evolution(profile_data)
+            
+            # Prompts keep static instructions first and the user question last
+            # so repeat turns share a byte-identical prefix for provider caching
+            enhanced_query = COMPREHENSIVE_COUNSELING_PROMPT.format_map({
+                "formatted_profile": formatted_profile,
+                "recent_skills": ', '.join(skill_evolution['recent_skills'][:8]),
+                "older_skills": ', '.join(skill_evolution['older_skills'][:8]),
+                "consistent_skills": ', '.join(skill_evolution['consistent_skills'][:8]),
+                "new_skills_per_year": skill_evolution['new_skills_per_year'],
+                "career_goals": career_goals or "Not specified - please infer from profile",
+                "target_role": target_role or "Not specified",
+                "query": query
+            })
         else:
             # Simple conversational query
-            enhanced_query = f"""
-You are a friendly and knowledgeable career counselor.
-
-PROFILE CONTEXT:
-{formatted_profile}
-
-CAREER GOALS: {career_goals or "Not specified"}
-TARGET ROLE: {target_role or "Not specified"}
-
-USER QUESTION: {query}
-
-Provide a helpful, conversational response that:
-- Directly answers their question
-- Relates to their profile and goals
-- Is encouraging and actionable
-- Stays concise (2-4 paragraphs max)
-- Offers 1-2 specific next steps
-
-Keep it friendly, professional, and personalized to their situation.
-"""
+            enhanced_query = CONVERSATIONAL_COUNSELING_PROMPT.format_map({
+                "formatted_profile": formatted_profile,
+                "career_goals": career_goals or "Not specified",
+                "target_role": target_role or "Not specified",
+                "query": query
+            })
         
         counseling_response = self.llm.provide_career_counseling(
             profile_data=formatted_profile,
@@ -145,10 +107,7 @@ Keep it friendly, professional, and personalized to their situation.
         if is_comprehensive:
             return {
                 "guidance": counseling_response,
-                "skill_gaps": self._extract_skill_gaps(counseling_response),
-                "learning_resources": self._extract_learning_resources(counseling_response),
-                "next_steps": self._extract_next_steps(counseling_response),
-                "timeline": self._extract_timeline(counseling_response)
+                **self._extract_all_sections(counseling_response)
             }
         else:
             # For simple queries, just return the response without structured extraction
@@ -160,88 +119,56 @@ Keep it friendly, professional, and personalized to their situation.
                 "timeline": None
             }
     
-    def _extract_skill_gaps(self, response: str) -> list:
-        """Extract identified skill gaps."""
-        lines = response.split('\n')
-        gaps = []
-        capture = False
-        for line in lines:
-            line = line.strip()
-            
-            if any(keyword in line.lower() for keyword in ['skill gap', 'missing skill', 'need to learn']):
-                capture = True
-                continue
-            
-            if capture and any(keyword in line.lower() for keyword in ['learning', 'resource', 'next step']):
-                break
-            
-            if capture and line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
-                clean_line = line.lstrip('0123456789.-•) ').strip()
-                if clean_line:
-                    gaps.append(clean_line)
-                
-        return gaps[:8]
-            
-    def _extract_learning_resources(self, response: str) -> list:
-        """Extract recommended learning resources."""
-        lines = response.split('\n')
-        resources = []
+    def _extract_all_sections(self, response: str) -> Dict[str, Any]:
+        """
+        Extract skill gaps, learning resources, next steps and timeline in one pass.
         
-        capture = False
-        for line in lines:
-            line = line.strip()
+        Section headers (non-list lines) switch the active bucket; list items are
+        collected into whichever bucket is active.
+        
+        Args:
+            response: Counseling response text
             
-            if any(keyword in line.lower() for keyword in ['learning', 'resource', 'course', 'certification']):
-                capture = True
+        Returns:
+            Dictionary with skill_gaps, learning_resources, next_steps and timeline
+        """
+        buckets = {"skill_gaps": [], "learning_resources": [], "next_steps": []}
+        current_section = None
+        timeline_lines = []
+        timeline_remaining = 0
+        
+        for match in LINE_PATTERN.finditer(response):
+            line = match.group().strip()
+            if not line:
                 continue
+            line_lower = line.lower()
             
-            if capture and any(keyword in line.lower() for keyword in ['next step', 'timeline', 'career']):
-                break
-            
-            if capture and line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
-                clean_line = line.lstrip('0123456789.-•) ').strip()
-                if clean_line:
-                    resources.append(clean_line)
-        
-        return resources[:6]
-    
-    def _extract_next_steps(self, response: str) -> list:
-        """Extract actionable next steps."""
-        lines = response.split('\n')
-        steps = []
-        
-        capture = False
-        for line in lines:
-            line = line.strip()
+            # Timeline is the header line plus the few lines that follow it
+            if timeline_remaining:
+                timeline_lines.append(line)
+                timeline_remaining -= 1
+            elif not timeline_lines and 'timeline' in line_lower:
+                timeline_lines.append(line)
+                timeline_remaining = 4
             
-            if any(keyword in line.lower() for keyword in ['next step', 'action', 'recommendation']):
-                capture = True
+            if line[0].isdigit() or line[0] in '-•':
+                if current_section in buckets:
+                    clean_line = line.lstrip('0123456789.-•) ').strip()
+                    if clean_line:
+                        buckets[current_section].append(clean_line)
                 continue
             
-            if capture and 'timeline' in line.lower():
-                break
-            
-            if capture and line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
-                clean_line = line.lstrip('0123456789.-•) ').strip()
-                if clean_line:
-                    steps.append(clean_line)
+            for section, keywords in SECTION_HEADER_KEYWORDS:
+                if any(keyword in line_lower for keyword in keywords):
+                    current_section = section
+                    break
         
-        return steps[:5]
-    
-    def _extract_timeline(self, response: str) -> str:
-        """Extract suggested timeline."""
-        lines = response.split('\n')
-        
-        for i, line in enumerate(lines):
-            if 'timeline' in line.lower():
-                # Get the next few lines
-                timeline_lines = []
-                for j in range(i, min(i + 5, len(lines))):
-                    if lines[j].strip():
-                        timeline_lines.append(lines[j].strip())
-                return ' '.join(timeline_lines)
-        
-        return "Timeline not specified"
+        return {
+            "skill_gaps": buckets["skill_gaps"][:8],
+            "learning_resources": buckets["learning_resources"][:6],
+            "next_steps": buckets["next_steps"][:5],
+            "timeline": ' '.join(timeline_lines) if timeline_lines else "Timeline not specified"
+        }
     
     def _analyze_skill_evolution(self, profile_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze how skills have evolved across positions."""
@@ -250,7 +177,7 @@ Keep it friendly, professional, and personalized to their situation.
         
         recent_skills = set()
         older_skills = set()
-        skill_timeline = {}
+        skill_counts = Counter()
         
         for exp in experience:
             exp_skills = exp.get('skills', [])
@@ -261,30 +188,24 @@ Keep it friendly, professional, and personalized to their situation.
             elif start_year:
                 older_skills.update(exp_skills)
             
-            for skill in exp_skills:
-                if skill not in skill_timeline:
-                    skill_timeline[skill] = []
-                skill_timeline[skill].append(exp.get('title', ''))
+            skill_counts.update(exp_skills)
         
         # Find consistently used skills
-        consistent = {skill for skill, positions in skill_timeline.items() if len(positions) >= 2}
+        consistent = {skill for skill, count in skill_counts.items() if count >= 2}
         
         # Calculate skill acquisition rate
-        years_of_experience = len(experience) if experience else 1
         new_skills_per_year = len(recent_skills) / 2 if recent_skills else 0
         
         return {
             'recent_skills': list(recent_skills),
             'older_skills': list(older_skills - recent_skills),
             'consistent_skills': list(consistent),
-            'new_skills_per_year': round(new_skills_per_year, 1),
-            'skill_timeline': skill_timeline
+            'new_skills_per_year': round(new_skills_per_year, 1)
         }
     
     def _extract_year(self, date_str: str) -> Optional[int]:
         """Extract year from date string."""
-        import re
         if not date_str:
             return None
-        match = re.search(r'\b(20\d{2})\b', date_str)
+        match = YEAR_PATTERN.search(date_str)
         return int(match.group(1)) if match else None
\ No newline at end of file
@@ -1,112 +1,399 @@
 """Content generation agent."""
 
-from typing import Dict, Any, Optional, List
+import asyncio
+import json
+import re
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+from src.config.settings import settings
 from src.services.llm_service import LLMService
 from src.utils.helpers import format_profile_data
 
 
+# JSON fields of a section response in output order, with item limits for list fields
+RESPONSE_FIELDS = (
+    ("rewritten_content", None),
+    ("improvements", 5),
+    ("keywords", 15),
+    ("credibility", 5),
+    ("tips", 5),
+)
+
+# Example value for each response field, shown to the LLM as the output schema
+RESPONSE_SCHEMA = {
+    "rewritten_content": "complete rewritten section",
+    "improvements": ["specific improvement with example"],
+    "keywords": ["keyword"],
+    "credibility": ["Company leverage: specific example"],
+    "tips": ["actionable tip"]
+}
+
+# Verbs signalling the About section already states achievements
+_ACHIEVEMENT_KEYWORDS = ('helped', 'delivered')
+
+# Role titles that give a headline enough clarity
+_RE_ROLE_KEYWORD = re.compile(r"engineer|developer|analyst|manager", re.IGNORECASE)
+
+# Writing guidelines shared by single-section and batch prompts
+WRITING_GUIDELINES = """WRITING GUIDELINES:
+1. **Leverage company brands:** Mention recognizable companies from work history
+2. **Quantify with context:** Use metrics from actual experience
+3. **Skills proof:** Reference skills with WHERE and HOW they were used
+4. Use strong action verbs and concrete examples
+5. Incorporate keywords naturally (NO keyword stuffing)
+6. Maintain professional yet approachable tone
+7. Keep headline under 120 characters, summary under 2,000 characters
+8. Focus on demonstrable achievements, not just claims
+9. Use first-person voice for summary/about section"""
+
+
+# Output format for single-section responses, parsed by _parse_structured_response
+STRUCTURED_OUTPUT_FORMAT = (
+    "CRITICAL: Respond with ONLY a JSON object (no markdown fences, no commentary) "
+    "with exactly these keys, in this order:\n" + json.dumps(RESPONSE_SCHEMA, indent=2)
+)
+
+
+# Advanced optimization tips that apply to every profile
+_STATIC_TIPS = (
+    "**SEO Optimization:** Use your target role keywords in the first 3 lines of your About section for better search visibility",
+    "**Story Arc:** Structure your About section as: Hook → Journey → Expertise → Impact → Call-to-Action",
+    "**Proof Points:** For every skill claim, add 'where' (company) and 'impact' (result)",
+    "**Engagement Hooks:** End your About section with a conversation starter (e.g., 'Let's discuss...' or 'Reach out if...')",
+    "**Visual Hierarchy:** Use line breaks, emojis (sparingly), and formatting to make long sections scannable",
+    "**Social Proof:** If you have notable achievements (awards, publications, speaking), mention them early",
+    "**Custom URL:** Ensure your LinkedIn URL is customized (linkedin.com/in/yourname) for professionalism",
+)
+
+
+@lru_cache(maxsize=64)
+def _overall_strategy(
+    current_title: str,
+    current_company: str,
+    companies: Tuple[str, ...],
+    total_experience_years: int,
+    target_role: Optional[str]
+) -> str:
+    """Build the overall strategy text (pure, no LLM call, so safe to cache)."""
+    strategy = f"""
+**Profile Optimization Strategy:**
+
+**Your Brand Positioning:**
+Current Position: {current_title} at {current_company}
+Target Role: {target_role or 'Career advancement in current field'}
+
+**Key Themes to Emphasize:**
+1. **Company Brand Leverage:** Highlight your experience at {', '.join(companies[:2])}
+2. **Technical Depth:** Focus on skills where you have proven experience
+3. **Impact & Results:** Quantify achievements from your {total_experience_years} years of experience
+
+**Content Philosophy:**
+- SHOW, don't just tell: Every claim should be backed by specific examples
+- Quantify everything: Numbers make impact tangible
+- Context matters: Explain the "why" and "how," not just "what"
+- ATS + Human: Optimize for both algorithms and recruiters
+
+**Recommended Approach:**
+1. Start with quick wins (headline, about section)
+2. Deep-dive into experience descriptions
+3. Optimize skills presentation with proof points
+4. Polish education with relevant achievements
+"""
+    return strategy.strip()
+
+
+def _experience_excerpt(profile_data: Dict[str, Any]) -> str:
+    """Format the first experience entry as an example of current content."""
+    experiences = profile_data.get('experience', [])
+    if not experiences:
+        return "No experience entries"
+    exp = experiences[0]
+    title = exp.get('title', '')
+    company = exp.get('company', '')
+    description = exp.get('description', 'No description')
+    return f"{title} at {company}\n{description}"
+
+
+def _skills_excerpt(profile_data: Dict[str, Any]) -> str:
+    """List the first ten skills as current content."""
+    skills = profile_data.get('skills', [])
+    return ', '.join(skills[:10]) if skills else "No skills listed"
+
+
+def _education_excerpt(profile_data: Dict[str, Any]) -> str:
+    """Format the first education entry as current content."""
+    education = profile_data.get('education', [])
+    if not education:
+        return "No education entries"
+    edu = education[0]
+    return f"{edu.get('degree', '')} in {edu.get('field_of_study', '')} from {edu.get('school', '')}"
+
+
+# Current-content getter for each profile section
+_SECTION_GETTERS = {
+    'headline': lambda profile_data: profile_data.get('headline', ''),
+    'about': lambda profile_data: profile_data.get('about', ''),
+    'experience': _experience_excerpt,
+    'skills': _skills_excerpt,
+    'education': _education_excerpt,
+}
+
+
 class ContentGeneratorAgent:
     """Agent for generating and optimizing profile content."""
     
     # LinkedIn profile sections that can be optimized
-    PROFILE_SECTIONS = ['headline', 'about', 'experience', 'skills', 'education']
+    PROFILE_SECTIONS = ('headline', 'about', 'experience', 'skills', 'education')
+    _PROFILE_SECTIONS_SET = frozenset(PROFILE_SECTIONS)
     
-    def __init__(self, llm_service: LLMService):
+    # Longest quoted response key, for rescanning chunk boundaries while streaming
+    _LONGEST_FIELD_KEY = max(len(name) + 2 for name, _ in RESPONSE_FIELDS)
+    
+    # Maximum section LLM calls in flight at once
+    MAX_CONCURRENT_SECTIONS = 5
+    
+    # Per-profile time budget when optimizing many profiles at once
+    PROFILE_TIMEOUT_SECONDS = 60
+    
+    def __init__(self, llm_service: LLMService, keep_raw_response: Optional[bool] = None):
         """
         Initialize content generator.
         
         Args:
             llm_service: LLM service instance
+            keep_raw_response: Include the raw LLM response in section results
+                (defaults to settings.debug)
         """
         self.llm = llm_service
+        self.keep_raw_response = settings.debug if keep_raw_response is None else keep_raw_response
     
     def generate_all_sections(
         self,
         profile_data: Dict[str, Any],
         target_role: Optional[str] = None,
         job_description: str = "",
-        focus_sections: Optional[List[str]] = None
+        focus_sections: Optional[List[str]] = None,
+        batch: bool = True,
+        formatted_profile: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate comprehensive suggestions for all LinkedIn profile sections.
+        
+        Synchronous wrapper around agenerate_all_sections.
+        
+        Args:
+            profile_data: Full profile context
+            target_role: Target job role
+            job_description: Job description for context
+            focus_sections: Specific sections to focus on (default: all)
+            batch: Generate all sections in a single LLM call
+            formatted_profile: Pre-formatted profile text (formatted on demand if omitted)
+            
+        Returns:
+            Dictionary with suggestions for all sections, prioritized by impact
+        """
+        return asyncio.run(self.agenerate_all_sections(
+            profile_data=profile_data,
+            target_role=target_role,
+            job_description=job_description,
+            focus_sections=focus_sections,
+            batch=batch,
+            formatted_profile=formatted_profile
+        ))
+    
+    async def agenerate_all_sections(
+        self,
+        profile_data: Dict[str, Any],
+        target_role: Optional[str] = None,
+        job_description: str = "",
+        focus_sections: Optional[List[str]] = None,
+        batch: bool = True,
+        formatted_profile: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Generate comprehensive suggestions for all LinkedIn profile sections.
         
+        With batch enabled, all sections are requested in one LLM call; any
+        section missing from the batch response (and every section when batch
+        is disabled) is streamed with its own call, run concurrently and
+        bounded by MAX_CONCURRENT_SECTIONS. Each rewrite is shown as soon as
+        its content is parsed, before the section's tips arrive.
+        
         Args:
             profile_data: Full profile context
             target_role: Target job role
             job_description: Job description for context
             focus_sections: Specific sections to focus on (default: all)
+            batch: Generate all sections in a single LLM call
+            formatted_profile: Pre-formatted profile text (formatted on demand if omitted)
             
         Returns:
             Dictionary with suggestions for all sections, prioritized by impact
         """
-        sections_to_generate = focus_sections or self.PROFILE_SECTIONS
+        if focus_sections:
+            # Skip sections this agent has no content or requirements for
+            sections_to_generate = [
+                section for section in focus_sections if section in self._PROFILE_SECTIONS_SET
+            ]
+        else:
+            sections_to_generate = self.PROFILE_SECTIONS
         work_context = self._extract_work_context(profile_data)
+        if formatted_profile is None:
+            formatted_profile = format_profile_data(profile_data)
         
         # Determine section priorities based on current state
-        section_priorities = self._prioritize_sections(profile_data, work_context)
+        proven_skill_count, unproven_skills = self._partition_skills(
+            profile_data.get('skills_detailed', [])
+        )
+        section_priorities = self._prioritize_sections(profile_data, work_context, proven_skill_count)
         
         all_suggestions = {
             "target_role": target_role or "General professional development",
-            "overall_strategy": self._generate_overall_strategy(profile_data, target_role, job_description),
+            "overall_strategy": self._generate_overall_strategy(work_context, target_role),
             "sections": {},
             "priorities": section_priorities,
             "quick_wins": [],
             "advanced_tips": []
         }
         
-        # Generate suggestions for each section
-        for section in sections_to_generate:
-            current_content = self._get_current_section_content(profile_data, section)
-            suggestion = self.generate(
-                section_name=section,
-                current_content=current_content,
+        if batch:
+            all_suggestions["sections"] = await self.agenerate_batch(
+                sections=sections_to_generate,
                 profile_data=profile_data,
                 target_role=target_role,
-                job_description=job_description
+                job_description=job_description,
+                work_context=work_context,
+                formatted_profile=formatted_profile
+            )
+            for section, suggestion in all_suggestions["sections"].items():
+                self._emit_section_preview(section, suggestion.get("generated_content"))
+        
+        # Stream remaining sections individually and concurrently
+        remaining_sections = [
+            section for section in sections_to_generate
+            if section not in all_suggestions["sections"]
+        ]
+        streamed_fields = {section: {} for section in remaining_sections}
+        async for section, field, value in self.astream_sections(
+            sections=remaining_sections,
+            profile_data=profile_data,
+            target_role=target_role,
+            job_description=job_description,
+            work_context=work_context,
+            formatted_profile=formatted_profile
+        ):
+            streamed_fields[section][field] = value
+            if field == "rewritten_content":
+                self._emit_section_preview(section, value)
+        
+        for section, fields in streamed_fields.items():
+            all_suggestions["sections"][section] = self._build_section_result(
+                section, self._get_current_section_content(profile_data, section), fields
             )
-            all_suggestions["sections"][section] = suggestion
         
         # Identify quick wins
-        all_suggestions["quick_wins"] = self._identify_quick_wins(profile_data, work_context)
+        all_suggestions["quick_wins"] = self._identify_quick_wins(profile_data, work_context, unproven_skills)
         
         # Add advanced optimization tips
         all_suggestions["advanced_tips"] = self._generate_advanced_tips(profile_data, target_role)
         
         return all_suggestions
     
+    def _emit_section_preview(self, section: str, content: Optional[str]):
+        """Stream a section's rewrite to the UI while the others are pending."""
+        if content:
+            self.llm.emit_progress(f"**{section.title()}** ✓\n\n{content}\n\n")
+    
+    async def agenerate_all_sections_batch(
+        self,
+        profiles: List[Dict[str, Any]],
+        target_roles: List[Optional[str]],
+        job_descriptions: List[str],
+        *,
+        concurrency: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate suggestions for all sections of many profiles concurrently.
+        
+        Args:
+            profiles: Profiles to optimize
+            target_roles: Target job role for each profile
+            job_descriptions: Job description for each profile
+            concurrency: Maximum profiles processed at once
+            
+        Returns:
+            Suggestions for each profile, in input order; a profile that fails
+            or exceeds PROFILE_TIMEOUT_SECONDS gets an error dictionary
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def generate_profile(
+            profile_data: Dict[str, Any],
+            target_role: Optional[str],
+            job_description: str
+        ) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        self.agenerate_all_sections(
+                            profile_data=profile_data,
+                            target_role=target_role,
+                            job_description=job_description
+                        ),
+                        timeout=self.PROFILE_TIMEOUT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    return {"error": f"Timed out after {self.PROFILE_TIMEOUT_SECONDS}s"}
+                except Exception as e:
+                    print(f"Error generating profile suggestions: {e}")
+                    return {"error": str(e)}
+        
+        return await asyncio.gather(*(
+            generate_profile(profile_data, target_role, job_description)
+            for profile_data, target_role, job_description
+            in zip(profiles, target_roles, job_descriptions)
+        ))
+    
     def _get_current_section_content(self, profile_data: Dict[str, Any], section: str) -> str:
         """Extract current content for a specific section."""
-        if section == 'headline':
-            return profile_data.get('headline', '')
-        elif section == 'about':
-            return profile_data.get('about', '')
-        elif section == 'experience':
-            experiences = profile_data.get('experience', [])
-            if experiences:
-                # Format first experience as example
-                exp = experiences[0]
-                return f"{exp.get('title', '')} at {exp.get('company', '')}\n{exp.get('description', 'No description')}"
-            return "No experience entries"
-        elif section == 'skills':
-            skills = profile_data.get('skills', [])
-            return ', '.join(skills[:10]) if skills else "No skills listed"
-        elif section == 'education':
-            education = profile_data.get('education', [])
-            if education:
-                edu = education[0]
-                return f"{edu.get('degree', '')} in {edu.get('field_of_study', '')} from {edu.get('school', '')}"
-            return "No education entries"
-        return ""
+        getter = _SECTION_GETTERS.get(section)
+        return getter(profile_data) if getter else ""
     
-    def _prioritize_sections(self, profile_data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    def _partition_skills(self, skills_detailed: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Split detailed skills by whether work experience backs them, in one pass.
+        
+        Args:
+            skills_detailed: Detailed skill entries from the profile
+            
+        Returns:
+            Tuple of (number of proven skills, list of unproven skills)
+        """
+        proven_count = 0
+        unproven = []
+        for skill in skills_detailed:
+            if skill.get('related_experiences'):
+                proven_count += 1
+            else:
+                unproven.append(skill)
+        return proven_count, unproven
+    
+    def _prioritize_sections(
+        self,
+        profile_data: Dict[str, Any],
+        context: Dict[str, Any],
+        skills_with_proof: int
+    ) -> Dict[str, Dict[str, Any]]:
         """Determine which sections need the most attention."""
         priorities = {}
+        headline = profile_data.get('headline', '')
+        about = profile_data.get('about', '')
+        experiences = profile_data.get('experience', [])
+        skills = profile_data.get('skills', [])
+        education = profile_data.get('education', [])
         
         # Headline priority
-        headline = profile_data.get('headline', '')
-        headline_priority = "HIGH" if len(headline) < 50 or not any(
-            keyword in headline.lower() for keyword in ['engineer', 'developer', 'analyst', 'manager']
-        ) else "MEDIUM"
+        headline_priority = "HIGH" if len(headline) < 50 or not _RE_ROLE_KEYWORD.search(headline) else "MEDIUM"
         priorities['headline'] = {
             "priority": headline_priority,
             "reason": "Short or lacks role clarity" if headline_priority == "HIGH" else "Could be more compelling",
@@ -114,7 +401,6 @@ class ContentGeneratorAgent:
         }
         
         # About priority
-        about = profile_data.get('about', '')
         about_priority = "HIGH" if len(about) < 200 else "MEDIUM" if len(about) < 500 else "LOW"
         priorities['about'] = {
             "priority": about_priority,
@@ -123,7 +409,6 @@ class ContentGeneratorAgent:
         }
         
         # Experience priority
-        experiences = profile_data.get('experience', [])
         missing_descriptions = sum(1 for exp in experiences if not exp.get('description'))
         exp_priority = "HIGH" if missing_descriptions > 0 else "MEDIUM"
         priorities['experience'] = {
@@ -133,9 +418,6 @@ class ContentGeneratorAgent:
         }
         
         # Skills priority
-        skills = profile_data.get('skills', [])
-        skills_detailed = profile_data.get('skills_detailed', [])
-        skills_with_proof = sum(1 for skill in skills_detailed if skill.get('related_experiences'))
         skills_priority = "MEDIUM" if len(skills) < 10 or skills_with_proof < len(skills) * 0.5 else "LOW"
         priorities['skills'] = {
             "priority": skills_priority,
@@ -144,7 +426,6 @@ class ContentGeneratorAgent:
         }
         
         # Education priority (usually lowest unless missing)
-        education = profile_data.get('education', [])
         edu_priority = "HIGH" if not education else "LOW"
         priorities['education'] = {
             "priority": edu_priority,
@@ -154,37 +435,22 @@ class ContentGeneratorAgent:
         
         return priorities
     
-    def _generate_overall_strategy(self, profile_data: Dict[str, Any], target_role: Optional[str], job_description: str) -> str:
+    def _generate_overall_strategy(self, work_context: Dict[str, Any], target_role: Optional[str]) -> str:
         """Generate high-level strategy for profile optimization."""
-        work_context = self._extract_work_context(profile_data)
-        
-        strategy = f"""
-**Profile Optimization Strategy:**
-
-**Your Brand Positioning:**
-Current Position: {work_context['current_title']} at {work_context['current_company']}
-Target Role: {target_role or 'Career advancement in current field'}
-
-**Key Themes to Emphasize:**
-1. **Company Brand Leverage:** Highlight your experience at {', '.join(work_context['companies'][:2])}
-2. **Technical Depth:** Focus on skills where you have proven experience
-3. **Impact & Results:** Quantify achievements from your {work_context['total_experience_years']} years of experience
-
-**Content Philosophy:**
-- SHOW, don't just tell: Every claim should be backed by specific examples
-- Quantify everything: Numbers make impact tangible
-- Context matters: Explain the "why" and "how," not just "what"
-- ATS + Human: Optimize for both algorithms and recruiters
-
-**Recommended Approach:**
-1. Start with quick wins (headline, about section)
-2. Deep-dive into experience descriptions
-3. Optimize skills presentation with proof points
-4. Polish education with relevant achievements
-"""
-        return strategy.strip()
+        return _overall_strategy(
+            work_context['current_title'],
+            work_context['current_company'],
+            tuple(work_context['companies']),
+            work_context['total_experience_years'],
+            target_role
+        )
     
-    def _identify_quick_wins(self, profile_data: Dict[str, Any], context: Dict[str, Any]) -> List[Dict[str, str]]:
+    def _identify_quick_wins(
+        self,
+        profile_data: Dict[str, Any],
+        context: Dict[str, Any],
+        unproven_skills: List[Dict[str, Any]]
+    ) -> List[Dict[str, str]]:
         """Identify easy, high-impact improvements."""
         quick_wins = []
         
@@ -201,7 +467,8 @@ Target Role: {target_role or 'Career advancement in current field'}
         
         # About section quick wins
         about = profile_data.get('about', '')
-        if 'helped' not in about.lower() and 'delivered' not in about.lower():
+        about_lower = about.lower()
+        if not any(keyword in about_lower for keyword in _ACHIEVEMENT_KEYWORDS):
             quick_wins.append({
                 "section": "About",
                 "action": "Add 1-2 specific achievements with metrics (e.g., 'Delivered X resulting in Y% improvement')",
@@ -212,19 +479,18 @@ Target Role: {target_role or 'Career advancement in current field'}
         
         # Experience quick wins
         experiences = profile_data.get('experience', [])
-        for i, exp in enumerate(experiences[:2]):  # Top 2 positions
-            if not exp.get('description') or len(exp.get('description', '')) < 100:
+        for exp in experiences[:2]:  # Top 2 positions
+            description_length = len(exp.get('description') or '')
+            if description_length < 100:
                 quick_wins.append({
                     "section": f"Experience ({exp.get('title', 'Position')})",
                     "action": f"Add 3-4 bullet points with PAR format (Problem-Action-Result) for your role at {exp.get('company', 'company')}",
-                    "current_length": f"{len(exp.get('description', ''))} chars",
+                    "current_length": f"{description_length} chars",
                     "time": "15 minutes",
                     "impact": "Critical"
                 })
         
         # Skills quick wins
-        skills_detailed = profile_data.get('skills_detailed', [])
-        unproven_skills = [s for s in skills_detailed if not s.get('related_experiences')]
         if len(unproven_skills) > 3:
             quick_wins.append({
                 "section": "Skills & Experience",
@@ -238,15 +504,7 @@ Target Role: {target_role or 'Career advancement in current field'}
     
     def _generate_advanced_tips(self, profile_data: Dict[str, Any], target_role: Optional[str]) -> List[str]:
         """Generate advanced optimization tips."""
-        tips = [
-            "**SEO Optimization:** Use your target role keywords in the first 3 lines of your About section for better search visibility",
-            "**Story Arc:** Structure your About section as: Hook → Journey → Expertise → Impact → Call-to-Action",
-            "**Proof Points:** For every skill claim, add 'where' (company) and 'impact' (result)",
-            "**Engagement Hooks:** End your About section with a conversation starter (e.g., 'Let's discuss...' or 'Reach out if...')",
-            "**Visual Hierarchy:** Use line breaks, emojis (sparingly), and formatting to make long sections scannable",
-            "**Social Proof:** If you have notable achievements (awards, publications, speaking), mention them early",
-            "**Custom URL:** Ensure your LinkedIn URL is customized (linkedin.com/in/yourname) for professionalism"
-        ]
+        tips = list(_STATIC_TIPS)
         
         if target_role:
             tips.insert(0, f"**Role Alignment:** Mirror {target_role} job posting keywords in your headline and first paragraph")
@@ -259,7 +517,9 @@ Target Role: {target_role or 'Career advancement in current field'}
         current_content: str,
         profile_data: Dict[str, Any],
         target_role: Optional[str] = None,
-        job_description: str = ""
+        job_description: str = "",
+        work_context: Optional[Dict[str, Any]] = None,
+        formatted_profile: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Generate improved content for a profile section.
@@ -270,74 +530,16 @@ Target Role: {target_role or 'Career advancement in current field'}
             profile_data: Full profile context
             target_role: Target job role
             job_description: Job description for context
+            work_context: Precomputed work context (extracted if not provided)
+            formatted_profile: Precomputed formatted profile (formatted if not provided)
             
         Returns:
             Generated content dictionary
         """
-        # Extract company/role context (endorsements not relevant here)
-        work_context = self._extract_work_context(profile_data)
-        
-        # Enhanced prompt for better content generation
-        enhanced_query = f"""
-You are an expert LinkedIn content writer and personal branding specialist.
-
-TASK: Rewrite the {section_name} section to maximize impact and engagement.
-
-TARGET ROLE: {target_role or "General professional development"}
-
-CURRENT CONTENT:
-{current_content or "No existing content"}
-
-WORK HISTORY CONTEXT:
-{self._format_work_context(work_context)}
-
-JOB DESCRIPTION (for context):
-{job_description if job_description else "Not provided"}
-
-FULL PROFILE CONTEXT:
-{format_profile_data(profile_data)}
-
-WRITING GUIDELINES:
-1. **Leverage company brands:** Mention recognizable companies from work history
-2. **Quantify with context:** Use metrics from actual experience
-3. **Skills proof:** Reference skills with WHERE and HOW they were used
-4. Use strong action verbs and concrete examples
-5. Incorporate keywords naturally (NO keyword stuffing)
-6. Maintain professional yet approachable tone
-7. Keep headline under 120 characters, summary under 2,000 characters
-8. Focus on demonstrable achievements, not just claims
-9. Use first-person voice for summary/about section
-
-SECTION-SPECIFIC REQUIREMENTS:
-{self._get_section_requirements(section_name, work_context)}
-
-CRITICAL: You MUST follow this EXACT output format with all sections clearly marked:
-
-═══════════════════════════════════════
-**REWRITTEN {section_name.upper()}:**
-[Your improved content here - write the complete rewritten section]
-═══════════════════════════════════════
-
-**KEY IMPROVEMENTS MADE:**
-1. [First specific improvement with example]
-2. [Second specific improvement with example]
-3. [Third specific improvement with example]
-
-**KEYWORDS ADDED:**
-keyword1, keyword2, keyword3, keyword4, keyword5
-
-**CREDIBILITY ELEMENTS ADDED:**
-- Company leverage: [specific example]
-- Metrics: [specific numbers added]
-- Skills proof: [specific skills with context]
-
-**ADDITIONAL TIPS:**
-- [Actionable tip 1]
-- [Actionable tip 2]
-- [Actionable tip 3]
-
-Make it compelling, authentic, and ATS-friendly. Root ALL claims in actual experience.
-"""
+        enhanced_query = self._build_generation_query(
+            section_name, current_content, profile_data, target_role, job_description,
+            work_context, formatted_profile
+        )
         
         generated_content = self.llm.generate_content(
             section_name=section_name,
@@ -347,19 +549,378 @@ Make it compelling, authentic, and ATS-friendly. Root ALL claims in actual exper
             query=enhanced_query
         )
         
-        # Parse the structured response
-        parsed = self._parse_structured_response(generated_content)
+        return self._build_section_result(
+            section_name, current_content,
+            self._parse_structured_response(generated_content), generated_content
+        )
+    
+    async def agenerate_streaming(
+        self,
+        section_name: str,
+        current_content: str,
+        profile_data: Dict[str, Any],
+        target_role: Optional[str] = None,
+        job_description: str = "",
+        work_context: Optional[Dict[str, Any]] = None,
+        formatted_profile: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, str, Any]]:
+        """
+        Stream improved content for a profile section, one parsed field at a time.
         
-        return {
+        Each JSON field is decoded and yielded as soon as the next field's key
+        arrives, so rewritten content is available before the tips are written.
+        
+        Args:
+            section_name: Section to improve (about, headline, etc.)
+            current_content: Current section content
+            profile_data: Full profile context
+            target_role: Target job role
+            job_description: Job description for context
+            work_context: Precomputed work context (extracted if not provided)
+            formatted_profile: Precomputed formatted profile (formatted if not provided)
+            
+        Yields:
+            (section_name, field, value) tuples, with fields named as in
+            _parse_structured_response
+        """
+        enhanced_query = self._build_generation_query(
+            section_name, current_content, profile_data, target_role, job_description,
+            work_context, formatted_profile
+        )
+        
+        buffer = ""
+        next_field = 0
+        open_field: Optional[Tuple[str, int]] = None
+        yielded = set()
+        
+        chunks = self.llm.astream_content(
+            section_name=section_name,
+            current_content=current_content or "No content provided",
+            target_role=target_role or "general improvement",
+            job_description=job_description,
+            query=enhanced_query
+        )
+        try:
+            async for chunk in chunks:
+                # Only rescan the tail where a key could straddle the chunk boundary
+                search_from = max(len(buffer) - self._LONGEST_FIELD_KEY, open_field[1] if open_field else 0)
+                buffer += chunk
+                
+                while next_field < len(RESPONSE_FIELDS):
+                    found = None
+                    for index in range(next_field, len(RESPONSE_FIELDS)):
+                        start = buffer.find(f'"{RESPONSE_FIELDS[index][0]}"', search_from)
+                        if start != -1 and (found is None or start < found[1]):
+                            found = (index, start)
+                    if found is None:
+                        break
+                    
+                    index, start = found
+                    if open_field:
+                        field, field_start = open_field
+                        value = self._parse_streamed_field(field, buffer[field_start:start])
+                        if value is not None:
+                            yielded.add(field)
+                            yield section_name, field, value
+                    
+                    open_field = (RESPONSE_FIELDS[index][0], start)
+                    next_field = index + 1
+                    search_from = start + 1
+        except Exception as e:
+            # Fields not yet yielded are parsed from what arrived, or from the error
+            print(f"Error streaming section content: {e}")
+            if not buffer:
+                buffer = f"Error: {str(e)}"
+        
+        if open_field:
+            field, field_start = open_field
+            value = self._parse_streamed_field(field, buffer[field_start:])
+            if value is not None:
+                yielded.add(field)
+                yield section_name, field, value
+        
+        # Fields that could not be decoded on the fly come from the full response
+        if len(yielded) < len(RESPONSE_FIELDS):
+            parsed = self._parse_structured_response(buffer)
+            for name, _ in RESPONSE_FIELDS:
+                if name not in yielded:
+                    yield section_name, name, parsed[name]
+    
+    async def astream_sections(
+        self,
+        sections: List[str],
+        profile_data: Dict[str, Any],
+        target_role: Optional[str] = None,
+        job_description: str = "",
+        work_context: Optional[Dict[str, Any]] = None,
+        formatted_profile: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, str, Any]]:
+        """
+        Stream several sections concurrently, interleaving their parsed fields.
+        
+        Args:
+            sections: Sections to improve
+            profile_data: Full profile context
+            target_role: Target job role
+            job_description: Job description for context
+            work_context: Precomputed work context (extracted if not provided)
+            formatted_profile: Precomputed formatted profile (formatted if not provided)
+            
+        Yields:
+            (section_name, field, value) tuples in arrival order
+        """
+        if work_context is None:
+            work_context = self._extract_work_context(profile_data)
+        if formatted_profile is None:
+            formatted_profile = format_profile_data(profile_data)
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_SECTIONS)
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async def stream_section(section: str) -> None:
+            async with semaphore:
+                async for item in self.agenerate_streaming(
+                    section_name=section,
+                    current_content=self._get_current_section_content(profile_data, section),
+                    profile_data=profile_data,
+                    target_role=target_role,
+                    job_description=job_description,
+                    work_context=work_context,
+                    formatted_profile=formatted_profile
+                ):
+                    await results.put(item)
+        
+        async def stream_all() -> None:
+            try:
+                await asyncio.gather(*(stream_section(section) for section in sections))
+            finally:
+                await results.put(None)
+        
+        producer = asyncio.ensure_future(stream_all())
+        try:
+            while (item := await results.get()) is not None:
+                yield item
+            # Surface any error raised while streaming
+            await producer
+        finally:
+            producer.cancel()
+    
+    def generate_batch(
+        self,
+        sections: List[str],
+        profile_data: Dict[str, Any],
+        target_role: Optional[str] = None,
+        job_description: str = "",
+        work_context: Optional[Dict[str, Any]] = None,
+        formatted_profile: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Generate improved content for several sections in a single LLM call.
+        
+        Args:
+            sections: Sections to improve
+            profile_data: Full profile context
+            target_role: Target job role
+            job_description: Job description for context
+            work_context: Precomputed work context (extracted if not provided)
+            formatted_profile: Precomputed formatted profile (formatted if not provided)
+            
+        Returns:
+            Generated content dictionaries keyed by section; sections the LLM
+            failed to return are omitted
+        """
+        return asyncio.run(self.agenerate_batch(
+            sections=sections,
+            profile_data=profile_data,
+            target_role=target_role,
+            job_description=job_description,
+            work_context=work_context,
+            formatted_profile=formatted_profile
+        ))
+    
+    async def agenerate_batch(
+        self,
+        sections: List[str],
+        profile_data: Dict[str, Any],
+        target_role: Optional[str] = None,
+        job_description: str = "",
+        work_context: Optional[Dict[str, Any]] = None,
+        formatted_profile: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Generate improved content for several sections in a single async LLM call.
+        
+        Args:
+            sections: Sections to improve
+            profile_data: Full profile context
+            target_role: Target job role
+            job_description: Job description for context
+            work_context: Precomputed work context (extracted if not provided)
+            formatted_profile: Precomputed formatted profile (formatted if not provided)
+            
+        Returns:
+            Generated content dictionaries keyed by section; sections the LLM
+            failed to return are omitted
+        """
+        current_contents = {
+            section: self._get_current_section_content(profile_data, section)
+            for section in sections
+        }
+        prompt = self._build_batch_query(
+            current_contents, profile_data, target_role, job_description,
+            work_context, formatted_profile
+        )
+        
+        response = await self.llm.agenerate_response(prompt)
+        
+        return self._parse_batch_response(response, current_contents)
+    
+    def _build_batch_query(
+        self,
+        current_contents: Dict[str, str],
+        profile_data: Dict[str, Any],
+        target_role: Optional[str],
+        job_description: str,
+        work_context: Optional[Dict[str, Any]] = None,
+        formatted_profile: Optional[str] = None
+    ) -> str:
+        """Build one prompt covering several sections with a shared preamble."""
+        if work_context is None:
+            work_context = self._extract_work_context(profile_data)
+        if formatted_profile is None:
+            formatted_profile = format_profile_data(profile_data)
+        
+        parts = [
+            "You are an expert LinkedIn content writer and personal branding specialist.",
+            "",
+            f"TASK: Rewrite the following LinkedIn profile sections to maximize impact and engagement: {', '.join(current_contents)}.",
+            "",
+            f"TARGET ROLE: {target_role or 'General professional development'}",
+            "",
+            "WORK HISTORY CONTEXT:",
+            self._format_work_context(work_context),
+            "JOB DESCRIPTION (for context):",
+            job_description or "Not provided",
+            "",
+            "FULL PROFILE CONTEXT:",
+            formatted_profile,
+            "",
+            WRITING_GUIDELINES,
+        ]
+        
+        for section, current_content in current_contents.items():
+            parts.extend([
+                "",
+                f"=== SECTION: {section} ===",
+                "CURRENT CONTENT:",
+                current_content or "No existing content",
+                "",
+                "SECTION-SPECIFIC REQUIREMENTS:",
+                self._get_section_requirements(section, work_context),
+            ])
+        
+        schema = {section: RESPONSE_SCHEMA for section in current_contents}
+        parts.extend([
+            "",
+            "CRITICAL: Respond with ONLY a JSON object (no markdown fences, no commentary) with exactly this shape:",
+            json.dumps(schema, indent=2),
+            "",
+            "Make it compelling, authentic, and ATS-friendly. Root ALL claims in actual experience.",
+        ])
+        
+        return "\n".join(parts)
+    
+    def _parse_batch_response(
+        self,
+        response: str,
+        current_contents: Dict[str, str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Parse a batch JSON response into per-section result dictionaries."""
+        data = self._load_json_response(response)
+        if not isinstance(data, dict):
+            print("Batch content generation returned invalid JSON; falling back to per-section calls")
+            return {}
+        
+        results = {}
+        for section, current_content in current_contents.items():
+            section_data = data.get(section)
+            if not isinstance(section_data, dict) or not section_data.get("rewritten_content"):
+                continue
+            
+            results[section] = self._build_section_result(
+                section, current_content, self._normalize_fields(section_data), response
+            )
+        
+        return results
+    
+    def _build_generation_query(
+        self,
+        section_name: str,
+        current_content: str,
+        profile_data: Dict[str, Any],
+        target_role: Optional[str],
+        job_description: str,
+        work_context: Optional[Dict[str, Any]] = None,
+        formatted_profile: Optional[str] = None
+    ) -> str:
+        """Build the enhanced content generation prompt for a section."""
+        # Extract company/role context (endorsements not relevant here)
+        if work_context is None:
+            work_context = self._extract_work_context(profile_data)
+        if formatted_profile is None:
+            formatted_profile = format_profile_data(profile_data)
+        
+        # Shared parts first so every section's prompt starts with the same
+        # prefix (provider prompt caching); section-specific parts go last
+        return "\n".join([
+            "",
+            "You are an expert LinkedIn content writer and personal branding specialist.",
+            "",
+            WRITING_GUIDELINES,
+            "",
+            STRUCTURED_OUTPUT_FORMAT,
+            "",
+            "Make it compelling, authentic, and ATS-friendly. Root ALL claims in actual experience.",
+            "",
+            f"TARGET ROLE: {target_role or 'General professional development'}",
+            "",
+            "WORK HISTORY CONTEXT:",
+            self._format_work_context(work_context),
+            "JOB DESCRIPTION (for context):",
+            job_description or "Not provided",
+            "",
+            "FULL PROFILE CONTEXT:",
+            formatted_profile,
+            "",
+            f"TASK: Rewrite the {section_name} section to maximize impact and engagement.",
+            "",
+            "CURRENT CONTENT:",
+            current_content or "No existing content",
+            "",
+            "SECTION-SPECIFIC REQUIREMENTS:",
+            self._get_section_requirements(section_name, work_context),
+        ])
+    
+    def _build_section_result(
+        self,
+        section_name: str,
+        current_content: str,
+        parsed: Dict[str, Any],
+        raw_response: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build the section result dictionary from parsed response fields (raw kept if given)."""
+        result = {
             "section": section_name,
             "original_content": current_content,
-            "generated_content": parsed.get("rewritten_content", generated_content),
-            "improvements": parsed.get("improvements", []),
-            "keywords_added": parsed.get("keywords", []),
-            "credibility_elements": parsed.get("credibility", []),
-            "tips": parsed.get("tips", []),
-            "raw_response": generated_content  # Keep for debugging
+            "generated_content": parsed["rewritten_content"],
+            "improvements": parsed["improvements"],
+            "keywords_added": parsed["keywords"],
+            "credibility_elements": parsed["credibility"],
+            "tips": parsed["tips"]
         }
+        if self.keep_raw_response and raw_response is not None:
+            result["raw_response"] = raw_response  # Keep for debugging
+        
+        return result
     
     def _extract_work_context(self, profile_data: Dict[str, Any]) -> Dict[str, Any]:
         """Extract relevant work context for content generation."""
@@ -389,22 +950,26 @@ Make it compelling, authentic, and ATS-friendly. Root ALL claims in actual exper
     
     def _format_work_context(self, context: Dict[str, Any]) -> str:
         """Format work context for prompt."""
-        formatted = f"""
+        parts = [f"""
 Current Position: {context['current_title']} at {context['current_company']}
 Key Companies: {', '.join(context['companies'])}
 Years of Experience: ~{context['total_experience_years']}
 
 Proven Skills (with context):
-"""
-        for skill_data in context['proven_skills']:
-            formatted += f"• {skill_data['skill']}: Used at {skill_data['company']} as {skill_data['role']}\n"
+"""]
+        parts.extend(
+            f"• {skill_data['skill']}: Used at {skill_data['company']} as {skill_data['role']}\n"
+            for skill_data in context['proven_skills']
+        )
         
-        return formatted
+        return "".join(parts)
     
     def _get_section_requirements(self, section: str, context: Dict[str, Any]) -> str:
-        """Get section-specific writing requirements."""
-        requirements = {
-            'headline': f"""
+        """Get section-specific writing requirements (only the requested section is built)."""
+        section = section.lower()
+        
+        if section == 'headline':
+            return f"""
 **HEADLINE REQUIREMENTS (Max 120 characters):**
 Current Position Context: {context['current_title']} at {context['current_company']}
 
@@ -427,8 +992,10 @@ AVOID:
 - Generic terms like "passionate," "innovative" without context
 - Buzzwords without backing (e.g., "thought leader")
 - Multiple special characters or emoji spam
-""",
-            'about': f"""
+"""
+        
+        if section == 'about':
+            return f"""
 **ABOUT SECTION REQUIREMENTS (300-2000 characters, sweet spot: 600-1000):**
 
 Structure (Use this framework):
@@ -465,8 +1032,10 @@ AVOID:
 - Generic statements without proof
 - Listing skills without context (save for Skills section)
 - Redundant experience details (save for Experience section)
-""",
-            'experience': f"""
+"""
+        
+        if section == 'experience':
+            return f"""
 **EXPERIENCE SECTION REQUIREMENTS:**
 For EACH position, use this structure:
 
@@ -506,8 +1075,10 @@ AVOID:
 - No metrics or outcomes
 - Same bullet structure for every position
 - Just listing technologies without showing impact
-""",
-            'skills': f"""
+"""
+        
+        if section == 'skills':
+            return f"""
 **SKILLS SECTION OPTIMIZATION:**
 
 **Current Situation:**
@@ -548,8 +1119,10 @@ AVOID:
 - Listing 50+ skills (looks unfocused)
 - Skills with zero context in your experience
 - Overemphasizing endorsement counts (work proof > social proof)
-""",
-            'education': f"""
+"""
+        
+        if section == 'education':
+            return f"""
 **EDUCATION SECTION REQUIREMENTS:**
 
 For EACH degree/certification:
@@ -601,150 +1174,61 @@ AVOID:
 - Only listing degree without context
 - Irrelevant extracurriculars
 """
-        }
         
-        return requirements.get(section.lower(), "Follow general best practices for professional content.")
+        return "Follow general best practices for professional content."
     
-    def _parse_structured_response(self, response: str) -> Dict[str, Any]:
-        """Parse the LLM response into structured sections."""
-        import re
-        
-        result = {
-            "rewritten_content": "",
-            "improvements": [],
-            "keywords": [],
-            "credibility": [],
-            "tips": []
-        }
+    def _load_json_response(self, response: str) -> Any:
+        """Decode a JSON response, or return None if it is not valid JSON."""
+        text = response.strip()
+        if text.startswith("```"):
+            # Drop a markdown code fence the model may add despite instructions
+            text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
         
-        # Extract rewritten content
-        rewritten_match = re.search(
-            r"\*\*REWRITTEN.*?:\*\*\s*═*\s*(.*?)(?=\*\*KEY IMPROVEMENTS|$)", 
-            response, 
-            re.DOTALL | re.IGNORECASE
-        )
-        if rewritten_match:
-            result["rewritten_content"] = rewritten_match.group(1).strip().strip('═').strip()
-        
-        # Extract improvements (numbered list)
-        improvements_match = re.search(
-            r"\*\*KEY IMPROVEMENTS MADE:\*\*\s*(.*?)(?=\*\*KEYWORDS|$)",
-            response,
-            re.DOTALL | re.IGNORECASE
-        )
-        if improvements_match:
-            improvements_text = improvements_match.group(1)
-            result["improvements"] = [
-                line.strip().lstrip('1234567890.-•').strip()
-                for line in improvements_text.split('\n')
-                if line.strip() and any(c.isalpha() for c in line)
-            ][:5]
-        
-        # Extract keywords (comma-separated)
-        keywords_match = re.search(
-            r"\*\*KEYWORDS ADDED:\*\*\s*(.*?)(?=\*\*CREDIBILITY|\*\*ADDITIONAL|$)",
-            response,
-            re.DOTALL | re.IGNORECASE
-        )
-        if keywords_match:
-            keywords_text = keywords_match.group(1).strip()
-            result["keywords"] = [
-                k.strip() 
-                for k in re.split(r'[,\n]', keywords_text)
-                if k.strip() and len(k.strip()) > 2
-            ][:15]
-        
-        # Extract credibility elements (bullet list)
-        credibility_match = re.search(
-            r"\*\*CREDIBILITY ELEMENTS ADDED:\*\*\s*(.*?)(?=\*\*ADDITIONAL|$)",
-            response,
-            re.DOTALL | re.IGNORECASE
-        )
-        if credibility_match:
-            credibility_text = credibility_match.group(1)
-            result["credibility"] = [
-                line.strip().lstrip('-•').strip()
-                for line in credibility_text.split('\n')
-                if line.strip() and ':' in line
-            ][:5]
-        
-        # Extract tips (bullet list)
-        tips_match = re.search(
-            r"\*\*ADDITIONAL TIPS:\*\*\s*(.*?)$",
-            response,
-            re.DOTALL | re.IGNORECASE
-        )
-        if tips_match:
-            tips_text = tips_match.group(1)
-            result["tips"] = [
-                line.strip().lstrip('-•').strip()
-                for line in tips_text.split('\n')
-                if line.strip() and any(c.isalpha() for c in line)
-            ][:5]
-        
-        # Fallback: if parsing failed, extract whatever we can
-        if not result["rewritten_content"]:
-            # Just take the first substantial paragraph as the rewritten content
-            paragraphs = [p.strip() for p in response.split('\n\n') if len(p.strip()) > 100]
-            if paragraphs:
-                result["rewritten_content"] = paragraphs[0]
-        
-        return result
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
     
-    def _extract_rewritten_content(self, response: str) -> str:
-        """Extract the rewritten content from LLM response."""
-        # Look for content between markers or after specific headers
-        lines = response.split('\n')
-        content_lines = []
-        capture = False
-        
-        for line in lines:
-            if any(marker in line.lower() for marker in ['rewritten', 'improved', 'new version']):
-                capture = True
-                continue
-            
-            if capture and any(marker in line.lower() for marker in ['improvement', 'keyword', 'tip']):
-                break
-            
-            if capture and line.strip():
-                content_lines.append(line.strip())
-        
-        return '\n'.join(content_lines) if content_lines else response
-    
-    def _extract_improvements(self, response: str) -> list:
-        """Extract list of improvements made."""
-        lines = response.split('\n')
-        improvements = []
-        
-        for line in lines:
-            line = line.strip()
-            if 'improvement' in line.lower() and ':' in line:
-                improvements.append(line.split(':', 1)[1].strip())
-            elif line.startswith('-') and 'improve' in line.lower():
-                improvements.append(line.lstrip('- ').strip())
-        
-        return improvements[:5]
+    def _normalize_fields(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Coerce decoded response fields to strings and capped lists of strings."""
+        result = {}
+        for name, limit in RESPONSE_FIELDS:
+            value = data.get(name)
+            if limit is None:
+                result[name] = str(value or "").strip()
+            elif isinstance(value, list):
+                result[name] = [str(item).strip() for item in value if str(item).strip()][:limit]
+            else:
+                result[name] = []
+        return result
     
-    def _extract_keywords_added(self, response: str) -> list:
-        """Extract keywords that were added."""
-        lines = response.split('\n')
-        keywords = []
-        
-        for line in lines:
-            if 'keyword' in line.lower() and ':' in line:
-                keyword_text = line.split(':', 1)[1].strip()
-                keywords.extend([k.strip() for k in keyword_text.split(',')])
+    def _parse_streamed_field(self, name: str, text: str) -> Any:
+        """
+        Decode one `"key": value` member cut from a partially streamed JSON object.
         
-        return keywords[:10]
+        Args:
+            name: Response field name
+            text: Text from the field's key up to the next key (or response end)
+            
+        Returns:
+            Normalized field value, or None if the member is not valid JSON
+        """
+        # Trailing separators, the closing brace and any code fence are not part of the value
+        member = text.strip().rstrip("`} \t\r\n,")
+        try:
+            data = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            return None
+        return self._normalize_fields(data)[name]
     
-    def _extract_tips(self, response: str) -> list:
-        """Extract additional tips."""
-        lines = response.split('\n')
-        tips = []
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Tip') or 'additional' in line.lower():
-                tips.append(line.lstrip('Tip: ').strip())
+    def _parse_structured_response(self, response: str) -> Dict[str, Any]:
+        """Parse the LLM's JSON response into structured sections."""
+        data = self._load_json_response(response)
+        if isinstance(data, dict):
+            return self._normalize_fields(data)
         
-        return tips[:3]
\ No newline at end of file
+        # Not JSON: keep the text as the content rather than guess at structure
+        print("Content generation returned invalid JSON; using the raw response as content")
+        result = self._normalize_fields({})
+        result["rewritten_content"] = response.strip()
+        return result
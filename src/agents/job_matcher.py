@@ -1,19 +1,251 @@
 """Job matching agent."""
 
-from typing import Dict, Any
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Optional
 from src.services.llm_service import LLMService
 from src.services.job_description_service import JobDescriptionService
 from src.utils.helpers import (
     calculate_match_score,
     format_profile_data,
     extract_keywords,
+    extract_keywords_batch,
     find_missing_keywords
 )
 
 
+# Common important technical phrases, fused into one pattern so the job
+# description is scanned once. Callers pass the lowercased description, so the
+# pattern is case-sensitive (re.IGNORECASE makes the scan several times slower)
+_IMPORTANT_PHRASE_ALTERNATIVES = (
+    r'machine learning|deep learning|neural networks?',
+    r'natural language processing|nlp',
+    r'computer vision|cv',
+    r'large language models?|llm|llms',
+    r'data pipelines?|data engineering',
+    r'model deployment|mlops|ml ops',
+    r'a/?b testing|experimentation',
+    r'tensorflow|pytorch|scikit-learn|keras|xgboost',
+    r'docker|kubernetes|containerization',
+    r'aws|azure|gcp|cloud',
+    r'rest api|api development|microservices',
+    r'ci/?cd|continuous integration',
+    r'fine[- ]?tuning|quantization|optimization',
+    r'evaluation metrics|model evaluation',
+    r'statistics|probability|statistical',
+)
+_IMPORTANT_PHRASES_RE = re.compile(
+    r'\b(' + '|'.join(_IMPORTANT_PHRASE_ALTERNATIVES) + r')\b'
+)
+
+
+# Generic words that are not requirements when scoring a match
+_REQUIREMENT_GENERIC_WORDS = frozenset({
+    'experience', 'work', 'strong', 'good', 'years', 'team',
+    'project', 'develop', 'building', 'data', 'code', 'software',
+    'design', 'quality', 'practices', 'familiarity', 'proficiency'
+})
+
+# Skill relationships (if you have A, you get partial credit for B)
+_SKILL_RELATIONSHIPS = {
+    'machine learning': ['ml', 'deep learning', 'neural networks', 'model'],
+    'python': ['python3', 'py', 'scikit-learn', 'tensorflow', 'pytorch'],
+    'deep learning': ['neural networks', 'pytorch', 'tensorflow', 'keras'],
+    'large language models': ['llm', 'llms', 'fine tuning', 'quantization'],
+    'langchain': ['llm', 'large language models'],
+    'artificial intelligence': ['ai', 'machine learning', 'ml'],
+    'computer vision': ['cv', 'image processing'],
+}
+# Inverted index: related skill -> base skills granting partial credit for it
+_RELATED_SKILL_BASES = {
+    related_skill: frozenset(
+        base_skill for base_skill, related in _SKILL_RELATIONSHIPS.items() if related_skill in related
+    )
+    for related_skills in _SKILL_RELATIONSHIPS.values()
+    for related_skill in related_skills
+}
+
+# Sets of equivalent skill names, indexed by name for O(1) comparison
+_EQUIVALENCE_CLASSES = (
+    {'ml', 'machine learning', 'machine-learning'},
+    {'ai', 'artificial intelligence'},
+    {'llm', 'llms', 'large language model', 'large language models'},
+    {'nlp', 'natural language processing'},
+    {'cv', 'computer vision'},
+    {'dl', 'deep learning'},
+    {'python', 'python3', 'py'},
+    {'tf', 'tensorflow'},
+    {'pytorch', 'torch'},
+)
+_EQUIVALENCE_CLASS_IDS = {
+    skill: class_id
+    for class_id, equivalent_skills in enumerate(_EQUIVALENCE_CLASSES)
+    for skill in equivalent_skills
+}
+
+# Common ML/AI abbreviations and variations of skill names
+_SKILL_ABBREVIATIONS = {
+    'machine learning': ['ml', 'machine-learning'],
+    'artificial intelligence': ['ai', 'artificial-intelligence'],
+    'natural language processing': ['nlp', 'natural-language-processing'],
+    'computer vision': ['cv'],
+    'deep learning': ['dl', 'deep-learning'],
+    'large language model': ['llm', 'large-language-model'],
+    'large language models': ['llm', 'llms', 'large-language-models'],
+    'python (programming language)': ['python'],
+    'python': ['python3', 'py'],
+    'tensorflow': ['tf'],
+    'pytorch': ['torch'],
+    'scikit-learn': ['sklearn', 'scikit learn'],
+    'xgboost': ['xgb'],
+}
+
+# Generic/common words to skip when looking for missing skills (not actual skills)
+_GENERIC_WORDS = frozenset({
+    'experience', 'work', 'working', 'strong', 'good', 'knowledge',
+    'understanding', 'ability', 'skills', 'experience', 'years',
+    'team', 'project', 'projects', 'develop', 'building', 'using',
+    'data', 'code', 'software', 'system', 'systems', 'design',
+    'development', 'work', 'build', 'create', 'make', 'use',
+    'contribute', 'deliver', 'end', 'quality', 'practices',
+    'familiarity', 'proficiency', 'clean', 'tested', 'robust'
+})
+
+# Substrings suggesting a keyword is a technical term
+_TECH_INDICATORS = (
+    'py', 'js', 'ml', 'ai', 'api', 'sql', 'framework', 'learn',
+    'model', 'neural', 'cloud', 'deploy', 'test', 'metric'
+)
+
+# Profile skills earning the ML foundation bonus
+_ML_FOUNDATION_SKILLS = frozenset({
+    'machine learning', 'python (programming language)', 'python',
+    'artificial intelligence (ai)', 'deep learning'
+})
+
+# Job description markers of entry-level roles (no seniority penalty)
+_ENTRY_LEVEL_MARKERS = ('junior', 'entry', 'graduate', '1+ year', '1 year')
+
+# Lines of an LLM analysis: a heading that opens the improvements list, or a
+# numbered/bulleted item
+_ANALYSIS_LINE_RE = re.compile(
+    r'^(?P<header>[^\n]*(?:improvement|suggestion|recommendation|optimize)[^\n]*)$'
+    r'|^[^\S\n]*[0-9\-•][0-9.\-•) ]*(?P<item>[^\n]*)',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+# Job match analysis query, filled in per match
+_MATCH_QUERY_TEMPLATE = """
+You are an expert recruiter and ATS (Applicant Tracking System) specialist.
+
+TASK: Analyze how well this candidate's profile matches the job requirements and provide optimization strategies.
+
+JOB TITLE: {job_title}
+
+JOB DESCRIPTION:
+{job_description}
+
+CANDIDATE PROFILE:
+{formatted_profile}
+
+EXPERIENCE-SKILLS MAPPING:
+{position_skills}
+
+MOST RELEVANT PAST ROLES:
+{relevant_experience}
+
+PRELIMINARY MATCH ANALYSIS:
+- Match Score: {score}/100 (Exact: {exact_matches}, Partial: {partial_matches} of {total_requirements} requirements)
+- Matching Skills: {matching_skills}
+- Missing Keywords: {missing_keywords}
+
+ANALYSIS REQUIREMENTS:
+1. **Skills Provenance:** Which skills are PROVEN by actual work experience vs. just listed?
+2. **Experience Relevance:** Which past positions directly relate to this role?
+3. **Skill Recency:** Are relevant skills from recent roles or outdated positions?
+4. **Career Trajectory:** Does the progression align with this target role?
+5. **Transferable Skills:** Consider how existing skills (e.g., LangChain) demonstrate ability to learn similar frameworks (PyTorch, TensorFlow)
+6. Assess ATS compatibility and keyword optimization
+7. Note: Focus on potential and learning capability for entry-level roles
+
+SCORING CONTEXT:
+The match score considers:
+- Exact skill matches (full credit)
+- Related/transferable skills (partial credit - e.g., "LangChain" counts toward "LLM" expertise)
+- Foundation skills bonus (having Python + ML fundamentals)
+- Missing specific frameworks reduce score but don't disqualify if foundation is strong
+
+OUTPUT FORMAT:
+Respond with ONLY a JSON object (no markdown fences, no text before or after it) with these keys:
+- "assessment": Overall fit summary - be balanced and consider growth potential for entry-level roles. A 40-50% match can still be "worth applying" if fundamentals are strong
+- "strengths": List of proven strengths, each "[Skill]: Demonstrated at [Company/Role]"
+- "experience_alignment": List of "[Past role] → [How it relates to target role]"
+- "gaps": List of critical gaps, each with an impact assessment
+- "recommendations": List of optimization recommendations, e.g. "Highlight: [Which experience to emphasize + why]", "Add Context: [Where to add proof of claimed skills]", "Reframe: [How to position existing experience]", "Optional: Seek endorsements for key skills (minor credibility boost)"
+- "keywords_to_add": Prioritized list of 5-8 missing keywords
+- "ats_compatibility": Score/10 with specific issues
+- "interview_prep": List of talking points ("Talk about: [Specific project/achievement to highlight]") and questions to prepare for ("Prepare for questions on: [Gap areas]")
+
+Focus on demonstrable skills over endorsed skills. Real experience trumps endorsements.
+Be specific and actionable. Focus on changes that will move the needle.
+"""
+
+# Keys of the JSON match analysis, with the headings they are rendered under
+_ANALYSIS_SECTIONS = (
+    ('assessment', 'MATCH ASSESSMENT'),
+    ('strengths', 'PROVEN STRENGTHS'),
+    ('experience_alignment', 'EXPERIENCE ALIGNMENT'),
+    ('gaps', 'GAPS TO ADDRESS'),
+    ('recommendations', 'OPTIMIZATION RECOMMENDATIONS'),
+    ('keywords_to_add', 'KEYWORDS TO ADD'),
+    ('ats_compatibility', 'ATS COMPATIBILITY'),
+    ('interview_prep', 'INTERVIEW PREP'),
+)
+
+
+@lru_cache(maxsize=2048)
+def _get_skill_variations(skill_lower: str) -> tuple:
+    """Get common variations and abbreviations for a lowercased skill."""
+    variations = [skill_lower]
+    
+    if skill_lower in _SKILL_ABBREVIATIONS:
+        variations.extend(_SKILL_ABBREVIATIONS[skill_lower])
+    
+    # Remove parentheses content (e.g., "python (programming language)" -> "python")
+    if '(' in skill_lower:
+        clean_skill = skill_lower.split('(')[0].strip()
+        if clean_skill != skill_lower:
+            variations.append(clean_skill)
+    
+    return tuple(variations)
+
+
+@lru_cache(maxsize=32)
+def _experience_keywords(exp_texts: tuple) -> tuple:
+    """
+    Extract keyword sets for a profile's experience texts.
+    
+    Cached on the texts, so matching the same profile against several jobs
+    extracts each text's keywords once.
+    """
+    return tuple(frozenset(keywords) for keywords in extract_keywords_batch(list(exp_texts)))
+
+
 class JobMatcherAgent:
     """Agent for matching profiles with job descriptions."""
     
+    # Results of match() are reused for identical inputs within the TTL
+    MATCH_CACHE_SIZE = 128
+    MATCH_CACHE_TTL_SECONDS = 3600
+    
     def __init__(self, llm_service: LLMService, job_service: JobDescriptionService):
         """
         Initialize job matcher.
@@ -24,6 +256,8 @@ class JobMatcherAgent:
         """
         self.llm = llm_service
         self.job_service = job_service
+        self._match_cache = OrderedDict()
+        self._match_cache_lock = threading.Lock()
     
     def match(
         self,
@@ -31,7 +265,8 @@ class JobMatcherAgent:
         job_title: str,
         custom_jd: str = None,
         location: str = "",
-        use_online_search: bool = False
+        use_online_search: bool = False,
+        formatted_profile: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Match profile with job description.
@@ -42,28 +277,121 @@ class JobMatcherAgent:
             custom_jd: Custom job description (optional)
             location: Location for online job search (optional)
             use_online_search: Whether to search for real job postings online (optional)
+            formatted_profile: Pre-formatted profile text (formatted on demand if omitted)
             
         Returns:
             Match analysis dictionary
         """
-        # Get job description (with optional online search)
-        job_data = self.job_service.get_job_description(
-            job_title=job_title,
-            custom_description=custom_jd,
-            location=location,
-            use_online_search=use_online_search
+        cache_key = self._match_cache_key(profile_data, job_title, custom_jd, location, use_online_search)
+        cached = self._get_cached_match(cache_key)
+        if cached is not None:
+            return cached
+        
+        prepared = self._prepare_match(
+            profile_data, job_title, custom_jd, location, use_online_search, formatted_profile
         )
         
-        # Format profile
-        formatted_profile = format_profile_data(profile_data)
+        # Get detailed LLM analysis
+        llm_analysis = self.llm.match_job(
+            profile_data=prepared["formatted_profile"],
+            job_description=prepared["job_description"],
+            job_title=prepared["enhanced_query"]
+        )
         
-        # Extract actual skills from profile (not just text keywords)
-        profile_skills = self._extract_all_skills(profile_data)
-        job_keywords = extract_keywords(job_data["description"])
+        result = self._build_match_result(prepared, llm_analysis)
+        # Failed analyses, and matches against a fallback description because
+        # the online search timed out or found nothing, are retried on the
+        # next call rather than cached
+        search_fell_back = (
+            use_online_search and not custom_jd and self.job_service.tavily_api_key
+            and prepared["job_description_source"] != "tavily_search"
+        )
+        if not llm_analysis.startswith("Error:") and not search_fell_back:
+            self._cache_match(cache_key, result)
+        return result
+    
+    def clear_match_cache(self):
+        """Drop cached match results (e.g. after the profile is edited)."""
+        with self._match_cache_lock:
+            self._match_cache.clear()
+    
+    def _match_cache_key(self, *inputs: Any) -> str:
+        """Hash match inputs (profile data included) into a cache key."""
+        payload = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _get_cached_match(self, cache_key: str) -> Dict[str, Any]:
+        """Return a copy of an unexpired cached match result, or None."""
+        with self._match_cache_lock:
+            entry = self._match_cache.get(cache_key)
+            if entry is None:
+                return None
+            
+            cached_at, result = entry
+            if time.monotonic() - cached_at > self.MATCH_CACHE_TTL_SECONDS:
+                del self._match_cache[cache_key]
+                return None
+            
+            self._match_cache.move_to_end(cache_key)
+        # Copy so callers can't mutate the cached result
+        return copy.deepcopy(result)
+    
+    def _cache_match(self, cache_key: str, result: Dict[str, Any]):
+        """Store a match result, evicting the least recently used beyond the cache size."""
+        with self._match_cache_lock:
+            self._match_cache[cache_key] = (time.monotonic(), copy.deepcopy(result))
+            self._match_cache.move_to_end(cache_key)
+            while len(self._match_cache) > self.MATCH_CACHE_SIZE:
+                self._match_cache.popitem(last=False)
+    
+    def _prepare_match(
+        self,
+        profile_data: Dict[str, Any],
+        job_title: str,
+        custom_jd: str,
+        location: str,
+        use_online_search: bool,
+        formatted_profile: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Fetch the job description, score the match and build the analysis query."""
+        # Get job description (with optional online search) in the background;
+        # the profile-only preprocessing below overlaps the network request
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            job_future = executor.submit(
+                self.job_service.get_job_description,
+                job_title=job_title,
+                custom_description=custom_jd,
+                location=location,
+                use_online_search=use_online_search
+            )
+            
+            # Format profile
+            if formatted_profile is None:
+                formatted_profile = format_profile_data(profile_data)
+            
+            # Extract actual skills from profile (not just text keywords)
+            profile_skills = self._extract_all_skills(profile_data)
+            
+            # Analyze position-specific skills (focus on WHERE used, not endorsements)
+            position_skills_map = self._extract_position_skills(profile_data)
+            
+            job_data = job_future.result()
+        
+        # Lowercase the description once; the helpers below all match case-insensitively
+        job_desc_lower = job_data["description"].lower()
+        
+        # One fit serves both the top-30 requirements for scoring and the
+        # top-20 keywords for missing skills and experience relevance
+        ranked_job_keywords = extract_keywords(job_desc_lower, top_n=30, ranked=True)
+        job_keywords = sorted(ranked_job_keywords[:20])
+        
+        # Skills (or their variations) named in the job description, scanned
+        # once and shared by skill matching and experience relevance
+        mentioned_skills = self._find_mentioned_skills(profile_skills, job_desc_lower)
         
         # Better matching: check if skill appears in job description or vice versa
-        matching_skills = self._find_matching_skills(profile_skills, job_data["description"])
-        missing_keywords = self._find_missing_skills(profile_skills, job_data["description"], job_keywords)
+        matching_skills = self._find_matching_skills(profile_skills, job_desc_lower, mentioned_skills)
+        missing_keywords = self._find_missing_skills(profile_skills, job_desc_lower, job_keywords)
         
         # Calculate enhanced match score based on skills overlap
         # This is more accurate than pure TF-IDF similarity
@@ -71,105 +399,106 @@ class JobMatcherAgent:
             profile_skills, 
             matching_skills, 
             missing_keywords,
-            job_data["description"]
+            job_desc_lower,
+            ranked_job_keywords
         )
         
-        # Analyze position-specific skills (focus on WHERE used, not endorsements)
-        position_skills_map = self._extract_position_skills(profile_data)
-        relevant_experience = self._find_relevant_experience(profile_data, job_data["description"])
+        relevant_experience = self._find_relevant_experience(
+            profile_data, job_desc_lower, mentioned_skills, job_keywords
+        )
         
         # Enhanced prompt for better job matching
-        enhanced_query = f"""
-You are an expert recruiter and ATS (Applicant Tracking System) specialist.
-
-TASK: Analyze how well this candidate's profile matches the job requirements and provide optimization strategies.
-
-JOB TITLE: {job_title}
-
-JOB DESCRIPTION:
-{job_data["description"]}
-
-CANDIDATE PROFILE:
-{formatted_profile}
-
-EXPERIENCE-SKILLS MAPPING:
-{self._format_position_skills(position_skills_map)}
-
-MOST RELEVANT PAST ROLES:
-{self._format_relevant_experience(relevant_experience)}
-
-PRELIMINARY MATCH ANALYSIS:
-- Match Score: {match_score_data["score"]}/100 (Exact: {match_score_data.get("exact_matches", 0)}, Partial: {match_score_data.get("partial_matches", 0)} of {match_score_data.get("total_requirements", 0)} requirements)
-- Matching Skills: {matching_skills[:10]}
-- Missing Keywords: {missing_keywords[:15]}
-
-ANALYSIS REQUIREMENTS:
-1. **Skills Provenance:** Which skills are PROVEN by actual work experience vs. just listed?
-2. **Experience Relevance:** Which past positions directly relate to this role?
-3. **Skill Recency:** Are relevant skills from recent roles or outdated positions?
-4. **Career Trajectory:** Does the progression align with this target role?
-5. **Transferable Skills:** Consider how existing skills (e.g., LangChain) demonstrate ability to learn similar frameworks (PyTorch, TensorFlow)
-6. Assess ATS compatibility and keyword optimization
-7. Note: Focus on potential and learning capability for entry-level roles
-
-SCORING CONTEXT:
-The match score considers:
-- Exact skill matches (full credit)
-- Related/transferable skills (partial credit - e.g., "LangChain" counts toward "LLM" expertise)
-- Foundation skills bonus (having Python + ML fundamentals)
-- Missing specific frameworks reduce score but don't disqualify if foundation is strong
-
-OUTPUT FORMAT:
-**MATCH ASSESSMENT:** [Overall fit summary - be balanced and consider growth potential for entry-level roles. A 40-50% match can still be "worth applying" if fundamentals are strong]
-
-**PROVEN STRENGTHS:** (Skills + Where Demonstrated)
-- [Skill]: Demonstrated at [Company/Role]
-- [Skill]: Demonstrated at [Company/Role]
-
-**EXPERIENCE ALIGNMENT:**
-- [Past role] → [How it relates to target role]
-- [Past role] → [How it relates to target role]
-
-**GAPS TO ADDRESS:**
-- [Critical gap with impact assessment]
-- [Critical gap with impact assessment]
-
-**OPTIMIZATION RECOMMENDATIONS:**
-1. **Highlight:** [Which experience to emphasize + why]
-2. **Add Context:** [Where to add proof of claimed skills]
-3. **Reframe:** [How to position existing experience]
-4. Optional: Seek endorsements for key skills (minor credibility boost)
-
-**KEYWORDS TO ADD:** [Prioritized list of 5-8 missing keywords]
-
-**ATS COMPATIBILITY:** [Score/10 with specific issues]
-
-**INTERVIEW PREP:**
-- Talk about: [Specific project/achievement to highlight]
-- Prepare for questions on: [Gap areas]
-
-Focus on demonstrable skills over endorsed skills. Real experience trumps endorsements.
-Be specific and actionable. Focus on changes that will move the needle.
-"""
-        
-        # Get detailed LLM analysis
-        llm_analysis = self.llm.match_job(
-            profile_data=formatted_profile,
-            job_description=job_data["description"],
-            job_title=enhanced_query
-        )
+        enhanced_query = _MATCH_QUERY_TEMPLATE.format_map({
+            'job_title': job_title,
+            'job_description': job_data["description"],
+            'formatted_profile': formatted_profile,
+            'position_skills': self._format_position_skills(position_skills_map),
+            'relevant_experience': self._format_relevant_experience(relevant_experience),
+            'score': match_score_data["score"],
+            'exact_matches': match_score_data.get("exact_matches", 0),
+            'partial_matches': match_score_data.get("partial_matches", 0),
+            'total_requirements': match_score_data.get("total_requirements", 0),
+            'matching_skills': matching_skills[:10],
+            'missing_keywords': missing_keywords[:15]
+        })
         
         return {
             "job_title": job_title,
+            "job_description": job_data["description"],
+            "job_description_source": job_data.get("source"),
+            "formatted_profile": formatted_profile,
+            "match_score_data": match_score_data,
+            "matching_skills": matching_skills,
+            "missing_keywords": missing_keywords,
+            "enhanced_query": enhanced_query
+        }
+    
+    def _build_match_result(self, prepared: Dict[str, Any], llm_analysis: str) -> Dict[str, Any]:
+        """Combine the prepared match data with the LLM analysis."""
+        match_score_data = prepared["match_score_data"]
+        
+        analysis = self._load_analysis(llm_analysis)
+        if analysis is not None:
+            detailed_analysis = self._format_analysis(analysis)
+            recommendations = self._as_list(analysis.get('recommendations'))[:8]
+        else:
+            # Not JSON (or an error message): show it as is and fall back to
+            # heuristic parsing
+            detailed_analysis = llm_analysis
+            recommendations = self._extract_improvements(llm_analysis)
+        
+        return {
+            "job_title": prepared["job_title"],
             "match_score": match_score_data["score"],
             "confidence": match_score_data["confidence"],
-            "matching_skills": matching_skills,
-            "missing_skills": missing_keywords[:15],
-            "detailed_analysis": llm_analysis,
-            "job_description": job_data["description"],
-            "recommendations": self._extract_improvements(llm_analysis)
+            "matching_skills": prepared["matching_skills"],
+            "missing_skills": prepared["missing_keywords"][:15],
+            "detailed_analysis": detailed_analysis,
+            "job_description": prepared["job_description"],
+            "recommendations": recommendations
         }
     
+    def _load_analysis(self, llm_analysis: str) -> Dict[str, Any]:
+        """Decode a JSON match analysis, or return None if it is not a JSON object."""
+        text = llm_analysis.strip()
+        if text.startswith("```"):
+            # Drop a markdown code fence the model may add despite instructions
+            text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+        
+        try:
+            analysis = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return analysis if isinstance(analysis, dict) else None
+    
+    def _as_list(self, value: Any) -> list:
+        """Coerce a decoded analysis field to a list of non-empty strings."""
+        if not isinstance(value, list):
+            value = [value] if value else []
+        return [str(item).strip() for item in value if str(item).strip()]
+    
+    def _format_analysis(self, analysis: Dict[str, Any]) -> str:
+        """Render a JSON match analysis as markdown for display."""
+        formatted = []
+        for key, heading in _ANALYSIS_SECTIONS:
+            value = analysis.get(key)
+            if not value:
+                continue
+            
+            if key == 'keywords_to_add' and isinstance(value, list):
+                formatted.append(f"**{heading}:** {', '.join(self._as_list(value))}")
+            elif isinstance(value, list):
+                items = self._as_list(value)
+                if key == 'recommendations':
+                    lines = [f"{i}. {item}" for i, item in enumerate(items, 1)]
+                else:
+                    lines = [f"- {item}" for item in items]
+                formatted.append(f"**{heading}:**\n" + "\n".join(lines))
+            else:
+                formatted.append(f"**{heading}:** {str(value).strip()}")
+        
+        return "\n\n".join(formatted)
+    
     def _extract_all_skills(self, profile_data: Dict[str, Any]) -> list:
         """
         Extract ALL skills from profile as complete phrases.
@@ -178,67 +507,53 @@ Be specific and actionable. Focus on changes that will move the needle.
         - Skills from certifications
         Returns lowercase skill names for matching.
         """
-        all_skills = set()
+        # Keep each skill as a complete phrase, just normalize case and clean
+        all_skills = {skill.lower().strip() for skill in self._iter_raw_skills(profile_data)}
+        all_skills.discard('')
         
+        return list(all_skills)
+    
+    def _iter_raw_skills(self, profile_data: Dict[str, Any]):
+        """Yield raw skill names from every profile section that lists them."""
         # 1. Main skills list
-        if profile_data.get('skills'):
-            for skill in profile_data['skills']:
-                # Keep as complete phrase, just normalize case and clean
-                clean_skill = skill.lower().strip()
-                if clean_skill:
-                    all_skills.add(clean_skill)
+        yield from profile_data.get('skills') or ()
         
         # 2. Skills from detailed skills section
-        if profile_data.get('skills_detailed'):
-            for skill_obj in profile_data['skills_detailed']:
-                skill = skill_obj.get('name', '').lower().strip()
-                if skill:
-                    all_skills.add(skill)
+        for skill_obj in profile_data.get('skills_detailed') or ():
+            yield skill_obj.get('name', '')
         
         # 3. Skills from experience
-        if profile_data.get('experience'):
-            for exp in profile_data['experience']:
-                if exp.get('skills'):
-                    for skill in exp['skills']:
-                        clean_skill = skill.lower().strip()
-                        if clean_skill:
-                            all_skills.add(clean_skill)
+        for exp in profile_data.get('experience') or ():
+            yield from exp.get('skills') or ()
         
         # 4. Skills from certifications
-        if profile_data.get('certifications'):
-            for cert in profile_data['certifications']:
-                if cert.get('skills'):
-                    for skill in cert['skills']:
-                        clean_skill = skill.lower().strip()
-                        if clean_skill:
-                            all_skills.add(clean_skill)
-        
-        return list(all_skills)
+        for cert in profile_data.get('certifications') or ():
+            yield from cert.get('skills') or ()
     
     def _calculate_skill_based_match_score(
         self, 
         profile_skills: list, 
         matching_skills: list, 
         missing_skills: list,
-        job_desc: str
+        job_desc_lower: str,
+        job_keywords: list = None
     ) -> Dict[str, Any]:
         """
         Calculate match score based on actual skill overlap with nuanced evaluation.
         Considers exact matches, related skills, and transferable knowledge.
+        Expects the job description already lowercased.
         """
         # Extract important requirements from job description
-        important_phrases = self._extract_important_phrases(job_desc)
+        important_phrases = self._extract_important_phrases(job_desc_lower)
         
         # Count total requirements (unique important phrases + technical keywords)
-        job_keywords = extract_keywords(job_desc, top_n=30)
+        if job_keywords is None:
+            job_keywords = extract_keywords(job_desc_lower, top_n=30)
         
         # Filter job keywords to only technical terms
-        generic_words = {
-            'experience', 'work', 'strong', 'good', 'years', 'team',
-            'project', 'develop', 'building', 'data', 'code', 'software',
-            'design', 'quality', 'practices', 'familiarity', 'proficiency'
-        }
-        technical_keywords = [k for k in job_keywords if k.lower() not in generic_words and len(k) > 3]
+        technical_keywords = [
+            k for k in job_keywords if k not in _REQUIREMENT_GENERIC_WORDS and len(k) > 3
+        ]
         
         # Combine important phrases and technical keywords
         all_requirements = set(important_phrases + technical_keywords)
@@ -247,42 +562,32 @@ Be specific and actionable. Focus on changes that will move the needle.
         exact_matches = set()
         partial_matches = set()
         
-        # Define skill relationships (if you have A, you get partial credit for B)
-        skill_relationships = {
-            'machine learning': ['ml', 'deep learning', 'neural networks', 'model'],
-            'python': ['python3', 'py', 'scikit-learn', 'tensorflow', 'pytorch'],
-            'deep learning': ['neural networks', 'pytorch', 'tensorflow', 'keras'],
-            'large language models': ['llm', 'llms', 'fine tuning', 'quantization'],
-            'langchain': ['llm', 'large language models'],
-            'artificial intelligence': ['ai', 'machine learning', 'ml'],
-            'computer vision': ['cv', 'image processing'],
+        # Base skills of _SKILL_RELATIONSHIPS that appear in any profile skill
+        # (profile skills and requirements are both already lowercased)
+        skill_bases_present = {
+            base_skill for base_skill in _SKILL_RELATIONSHIPS
+            if any(base_skill in skill for skill in profile_skills)
+        }
+        # Equivalence classes (see _EQUIVALENCE_CLASSES) of the profile skills
+        profile_skill_classes = {
+            _EQUIVALENCE_CLASS_IDS[skill] for skill in profile_skills
+            if skill in _EQUIVALENCE_CLASS_IDS
         }
         
         for req in all_requirements:
-            req_lower = req.lower()
-            matched = False
-            
-            # Check for exact/direct match
-            for skill in profile_skills:
-                skill_lower = skill.lower()
-                if (req_lower in skill_lower or skill_lower in req_lower or
-                    self._are_skills_equivalent(req_lower, skill_lower)):
-                    exact_matches.add(req)
-                    matched = True
-                    break
+            # Check for exact/direct match: an equivalent skill, or one that
+            # contains (or is contained in) the requirement
+            matched = _EQUIVALENCE_CLASS_IDS.get(req) in profile_skill_classes or any(
+                req in skill or skill in req
+                for skill in profile_skills
+            )
+            if matched:
+                exact_matches.add(req)
             
-            # Check for partial/related match
-            if not matched:
-                for skill in profile_skills:
-                    skill_lower = skill.lower()
-                    # Check if skill gives partial credit for this requirement
-                    for base_skill, related in skill_relationships.items():
-                        if base_skill in skill_lower and req_lower in related:
-                            partial_matches.add(req)
-                            matched = True
-                            break
-                    if matched:
-                        break
+            # Check for partial/related match: some base skill present in the
+            # profile lists this requirement as related
+            if not matched and _RELATED_SKILL_BASES.get(req, frozenset()) & skill_bases_present:
+                partial_matches.add(req)
         
         # Calculate weighted score
         total_reqs = len(all_requirements) if all_requirements else 1
@@ -302,26 +607,23 @@ Be specific and actionable. Focus on changes that will move the needle.
             base_score = 0
         
         # Boost score if candidate has fundamental ML skills even if missing specific frameworks
-        has_ml_foundation = any(skill in profile_skills for skill in [
-            'machine learning', 'python (programming language)', 'python',
-            'artificial intelligence (ai)', 'deep learning'
-        ])
+        has_ml_foundation = not _ML_FOUNDATION_SKILLS.isdisjoint(profile_skills)
         
-        has_llm_experience = any('llm' in skill.lower() or 'language model' in skill.lower() 
+        has_llm_experience = any('llm' in skill or 'language model' in skill
                                  for skill in profile_skills)
         
         # Apply foundation bonuses
         if has_ml_foundation:
             base_score += 10  # +10% for having ML fundamentals
-        if has_llm_experience and 'llm' in job_desc.lower():
+        if has_llm_experience and 'llm' in job_desc_lower:
             base_score += 5   # +5% for LLM experience when job requires it
         
         # Apply experience penalty/bonus based on job description context
         # Don't penalize too heavily for junior roles or internships
-        if any(word in job_desc.lower() for word in ['junior', 'entry', 'graduate', '1+ year', '1 year']):
+        if any(word in job_desc_lower for word in _ENTRY_LEVEL_MARKERS):
             # For entry-level roles, be more lenient
             pass  # No penalty
-        elif '3+' in job_desc or '5+' in job_desc or 'senior' in job_desc.lower():
+        elif '3+' in job_desc_lower or '5+' in job_desc_lower or 'senior' in job_desc_lower:
             # For senior roles, apply penalty if profile is junior
             base_score *= 0.85  # 15% penalty for seniority mismatch
         
@@ -348,206 +650,133 @@ Be specific and actionable. Focus on changes that will move the needle.
     
     def _are_skills_equivalent(self, skill1: str, skill2: str) -> bool:
         """Check if two skills are equivalent (considering variations/abbreviations)."""
-        equivalences = [
-            {'ml', 'machine learning', 'machine-learning'},
-            {'ai', 'artificial intelligence'},
-            {'llm', 'llms', 'large language model', 'large language models'},
-            {'nlp', 'natural language processing'},
-            {'cv', 'computer vision'},
-            {'dl', 'deep learning'},
-            {'python', 'python3', 'py'},
-            {'tf', 'tensorflow'},
-            {'pytorch', 'torch'},
-        ]
-        
-        for equiv_set in equivalences:
-            if skill1 in equiv_set and skill2 in equiv_set:
-                return True
+        return _EQUIVALENCE_CLASS_IDS.get(skill1, -1) == _EQUIVALENCE_CLASS_IDS.get(skill2, -2)
+    
+    def _find_mentioned_skills(self, profile_skills: list, job_desc_lower: str) -> set:
+        """
+        Find profile skills named in the (lowercased) job description, directly
+        or through a common abbreviation/variation.
+        Expects skills normalized as by _extract_all_skills.
+        """
+        mentioned = set()
         
-        return False
+        for skill in profile_skills:
+            # Direct substring match (e.g., "machine learning" in job description),
+            # then common abbreviations and variations
+            if skill in job_desc_lower or any(
+                variation in job_desc_lower for variation in _get_skill_variations(skill)
+            ):
+                mentioned.add(skill)
+        
+        return mentioned
     
-    def _find_matching_skills(self, profile_skills: list, job_desc: str) -> list:
+    def _find_matching_skills(self, profile_skills: list, job_desc_lower: str, mentioned_skills: set = None) -> list:
         """
-        Find skills from profile that appear in job description.
+        Find skills from profile that appear in the (lowercased) job description.
         Uses intelligent matching to handle variations and abbreviations.
+        Expects skills normalized as by _extract_all_skills.
         """
-        job_desc_lower = job_desc.lower()
+        if mentioned_skills is None:
+            mentioned_skills = self._find_mentioned_skills(profile_skills, job_desc_lower)
         matching = []
         
         for skill in profile_skills:
-            skill_lower = skill.lower()
-            
-            # Direct substring match (e.g., "machine learning" in job description)
-            if skill_lower in job_desc_lower:
-                matching.append(skill)
-                continue
-            
-            # Check for common abbreviations and variations
-            skill_variations = self._get_skill_variations(skill_lower)
-            if any(variation in job_desc_lower for variation in skill_variations):
+            # Direct or variation match
+            if skill in mentioned_skills:
                 matching.append(skill)
                 continue
             
             # For multi-word skills (>10 chars), check if all significant words appear
-            if len(skill_lower) > 10 and ' ' in skill_lower:
-                words = [w for w in skill_lower.split() if len(w) > 3]
+            if len(skill) > 10 and ' ' in skill:
+                words = [w for w in skill.split() if len(w) > 3]
                 if len(words) >= 2 and all(word in job_desc_lower for word in words):
                     matching.append(skill)
         
         return matching
     
-    def _get_skill_variations(self, skill: str) -> list:
-        """Get common variations and abbreviations for a skill."""
-        variations = [skill]
-        
-        # Common ML/AI abbreviations
-        abbreviations = {
-            'machine learning': ['ml', 'machine-learning'],
-            'artificial intelligence': ['ai', 'artificial-intelligence'],
-            'natural language processing': ['nlp', 'natural-language-processing'],
-            'computer vision': ['cv'],
-            'deep learning': ['dl', 'deep-learning'],
-            'large language model': ['llm', 'large-language-model'],
-            'large language models': ['llm', 'llms', 'large-language-models'],
-            'python (programming language)': ['python'],
-            'python': ['python3', 'py'],
-            'tensorflow': ['tf'],
-            'pytorch': ['torch'],
-            'scikit-learn': ['sklearn', 'scikit learn'],
-            'xgboost': ['xgb'],
-        }
-        
-        skill_lower = skill.lower()
-        if skill_lower in abbreviations:
-            variations.extend(abbreviations[skill_lower])
-        
-        # Remove parentheses content (e.g., "Python (Programming Language)" -> "Python")
-        if '(' in skill:
-            clean_skill = skill.split('(')[0].strip().lower()
-            if clean_skill != skill_lower:
-                variations.append(clean_skill)
-        
-        return variations
-    
-    def _find_missing_skills(self, profile_skills: list, job_desc: str, job_keywords: list) -> list:
+    def _find_missing_skills(self, profile_skills: list, job_desc_lower: str, job_keywords: list) -> list:
         """
-        Find important skills/keywords from job description that are missing from profile.
+        Find important skills/keywords from the (lowercased) job description that
+        are missing from profile.
         Focus on technical skills and frameworks, not generic words.
+        Expects skills normalized as by _extract_all_skills; phrases and
+        TF-IDF keywords come out lowercased.
         """
-        job_desc_lower = job_desc.lower()
-        profile_skills_lower = [s.lower() for s in profile_skills]
+        profile_skills_set = frozenset(profile_skills)
+        # One newline-joined string answers "is X inside any profile skill" in a
+        # single scan (phrases and keywords never contain newlines)
+        profile_skills_text = '\n'.join(profile_skills_set)
         missing = []
         
         # First, prioritize important technical phrases (these are most valuable)
-        important_phrases = self._extract_important_phrases(job_desc)
+        important_phrases = self._extract_important_phrases(job_desc_lower)
         for phrase in important_phrases:
-            phrase_lower = phrase.lower()
-            if phrase_lower not in profile_skills_lower:
-                if not any(phrase_lower in ps or ps in phrase_lower for ps in profile_skills_lower):
+            if phrase not in profile_skills_set:
+                if phrase not in profile_skills_text and not any(
+                    ps in phrase for ps in profile_skills_set
+                ):
                     if phrase not in missing:
                         missing.append(phrase)
         
-        # Define generic/common words to skip (not actual skills)
-        generic_words = {
-            'experience', 'work', 'working', 'strong', 'good', 'knowledge', 
-            'understanding', 'ability', 'skills', 'experience', 'years',
-            'team', 'project', 'projects', 'develop', 'building', 'using',
-            'data', 'code', 'software', 'system', 'systems', 'design',
-            'development', 'work', 'build', 'create', 'make', 'use',
-            'contribute', 'deliver', 'end', 'quality', 'practices',
-            'familiarity', 'proficiency', 'clean', 'tested', 'robust'
-        }
-        
         # Only add specific technical keywords (not generic words)
         for keyword in job_keywords:
-            keyword_lower = keyword.lower()
-            
             # Skip generic words
-            if keyword_lower in generic_words:
+            if keyword in _GENERIC_WORDS:
                 continue
             
             # Skip short words (usually not meaningful)
-            if len(keyword_lower) < 3:
+            if len(keyword) < 3:
                 continue
             
             # Skip if keyword is already in profile skills
-            if keyword_lower in profile_skills_lower:
+            if keyword in profile_skills_set:
                 continue
             
             # Skip if any profile skill contains this keyword
-            if any(keyword_lower in profile_skill for profile_skill in profile_skills_lower):
+            if keyword in profile_skills_text:
                 continue
             
             # Skip if this keyword is contained in any profile skill
-            if any(profile_skill in keyword_lower for profile_skill in profile_skills_lower):
+            if any(profile_skill in keyword for profile_skill in profile_skills_set):
                 continue
             
             # Only add if it seems technical (contains common tech indicators)
             # or is long enough to be a specific term
-            if len(keyword_lower) > 6 or any(tech in keyword_lower for tech in 
-                ['py', 'js', 'ml', 'ai', 'api', 'sql', 'framework', 'learn', 
-                 'model', 'neural', 'cloud', 'deploy', 'test', 'metric']):
+            if len(keyword) > 6 or any(tech in keyword for tech in _TECH_INDICATORS):
                 missing.append(keyword)
         
         return missing
     
-    def _extract_important_phrases(self, job_desc: str) -> list:
-        """Extract important multi-word technical phrases from job description."""
-        import re
-        
-        # Common important technical phrases patterns
-        important_patterns = [
-            r'\b(machine learning|deep learning|neural networks?)\b',
-            r'\b(natural language processing|nlp)\b',
-            r'\b(computer vision|cv)\b',
-            r'\b(large language models?|llm|llms)\b',
-            r'\b(data pipelines?|data engineering)\b',
-            r'\b(model deployment|mlops|ml ops)\b',
-            r'\b(a/?b testing|experimentation)\b',
-            r'\b(tensorflow|pytorch|scikit-learn|keras|xgboost)\b',
-            r'\b(docker|kubernetes|containerization)\b',
-            r'\b(aws|azure|gcp|cloud)\b',
-            r'\b(rest api|api development|microservices)\b',
-            r'\b(ci/?cd|continuous integration)\b',
-            r'\b(fine[- ]?tuning|quantization|optimization)\b',
-            r'\b(evaluation metrics|model evaluation)\b',
-            r'\b(statistics|probability|statistical)\b',
-        ]
-        
-        phrases = []
-        job_desc_lower = job_desc.lower()
-        
-        for pattern in important_patterns:
-            matches = re.findall(pattern, job_desc_lower)
-            phrases.extend(matches)
-        
-        return list(set(phrases))
+    def _extract_important_phrases(self, job_desc_lower: str) -> list:
+        """Extract important multi-word technical phrases from the (lowercased) job description."""
+        return list(set(_IMPORTANT_PHRASES_RE.findall(job_desc_lower)))
     
     def _extract_position_skills(self, profile_data: Dict[str, Any]) -> list:
-        """Extract skills mapped to each position."""
-        experience = profile_data.get('experience', [])
-        mapping = []
-        
-        for exp in experience:
-            if exp.get('skills'):
-                mapping.append({
-                    'position': f"{exp.get('title')} at {exp.get('company')}",
-                    'duration': exp.get('duration', ''),
-                    'is_current': exp.get('is_current', False),
-                    'skills': exp.get('skills', [])
-                })
+        """
+        Extract the positions that list skills.
         
-        return mapping
+        Entries are the experience dicts themselves; _format_position_skills
+        builds the display text only for the positions it shows.
+        """
+        return [exp for exp in profile_data.get('experience', []) if exp.get('skills')]
     
-    def _find_relevant_experience(self, profile_data: Dict[str, Any], job_desc: str) -> list:
-        """Find most relevant past positions based on job description."""
+    def _find_relevant_experience(
+        self,
+        profile_data: Dict[str, Any],
+        job_desc_lower: str,
+        mentioned_skills: set = None,
+        job_keywords: list = None
+    ) -> list:
+        """Find most relevant past positions based on the (lowercased) job description."""
         experience = profile_data.get('experience', [])
-        job_desc_lower = job_desc.lower()
-        job_keywords = set(extract_keywords(job_desc_lower))
+        if job_keywords is None:
+            job_keywords = extract_keywords(job_desc_lower)
+        job_keywords = set(job_keywords)
         
-        scored_exp = []
+        # Build experience texts INCLUDING the skills lists, then extract their
+        # keywords (cached per profile)
+        exp_texts = []
         for exp in experience:
-            # Build experience text INCLUDING the skills list
             exp_text_parts = [
                 exp.get('title', ''),
                 exp.get('description', ''),
@@ -558,8 +787,10 @@ Be specific and actionable. Focus on changes that will move the needle.
             if exp.get('skills'):
                 exp_text_parts.extend(exp.get('skills', []))
             
-            exp_text = ' '.join(exp_text_parts).lower()
-            exp_keywords = set(extract_keywords(exp_text))
+            exp_texts.append(' '.join(exp_text_parts).lower())
+        
+        scored_exp = []
+        for exp, exp_keywords in zip(experience, _experience_keywords(tuple(exp_texts))):
             
             # Get complete skill phrases from the skills list (not split)
             exp_skills = set()
@@ -573,15 +804,11 @@ Be specific and actionable. Focus on changes that will move the needle.
             # 1. Text keyword overlap
             text_overlap = job_keywords & exp_keywords
             
-            # 2. Check if complete skills appear in job description
-            skill_matches = set()
-            for skill in exp_skills:
-                if skill in job_desc_lower:
-                    skill_matches.add(skill)
-                # Check variations
-                skill_variations = self._get_skill_variations(skill)
-                if any(var in job_desc_lower for var in skill_variations):
-                    skill_matches.add(skill)
+            # 2. Check if complete skills (or variations) appear in job description
+            if mentioned_skills is not None:
+                skill_matches = exp_skills & mentioned_skills
+            else:
+                skill_matches = self._find_mentioned_skills(exp_skills, job_desc_lower)
             
             # Combine all matches
             all_matches = text_overlap | skill_matches
@@ -604,11 +831,11 @@ Be specific and actionable. Focus on changes that will move the needle.
             return "No position-specific skills data available"
         
         formatted = []
-        for item in mapping[:5]:  # Top 5 positions
-            current = " (CURRENT)" if item['is_current'] else ""
+        for exp in mapping[:5]:  # Top 5 positions
+            current = " (CURRENT)" if exp.get('is_current', False) else ""
             formatted.append(
-                f"• {item['position']}{current}\n"
-                f"  Skills: {', '.join(item['skills'][:8])}"
+                f"• {exp.get('title')} at {exp.get('company')}{current}\n"
+                f"  Skills: {', '.join(exp['skills'][:8])}"
             )
         
         return '\n'.join(formatted)
@@ -631,21 +858,20 @@ Be specific and actionable. Focus on changes that will move the needle.
     
     def _extract_improvements(self, analysis: str) -> list:
         """Extract improvement suggestions from analysis."""
-        lines = analysis.split('\n')
         improvements = []
         
         capture = False
-        for line in lines:
-            line = line.strip()
-            
+        for match in _ANALYSIS_LINE_RE.finditer(analysis):
             # Look for improvement sections
-            if any(keyword in line.lower() for keyword in ['improvement', 'suggestion', 'recommendation', 'optimize']):
+            if match.group('header') is not None:
                 capture = True
                 continue
             
-            if capture and line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
-                clean_line = line.lstrip('0123456789.-•) ').strip()
+            if capture:
+                clean_line = match.group('item').strip()
                 if clean_line:
                     improvements.append(clean_line)
+                    if len(improvements) == 8:
+                        break
         
-        return improvements[:8]
\ No newline at end of file
+        return improvements
@@ -1,6 +1,7 @@
 """Profile analysis agent."""
 
-from typing import Dict, Any
+import re
+from typing import Dict, Any, Optional
 from datetime import datetime
 from src.services.llm_service import LLMService
 from src.utils.helpers import (
@@ -10,61 +11,11 @@ from src.utils.helpers import (
 )
 
 
-class ProfileAnalyzerAgent:
-    """Agent for analyzing LinkedIn profiles."""
-    
-    def __init__(self, llm_service: LLMService):
-        """
-        Initialize profile analyzer.
-        
-        Args:
-            llm_service: LLM service instance
-        """
-        self.llm = llm_service
-    
-    def analyze(
-        self,
-        profile_data: Dict[str, Any],
-        query: str = "Analyze this profile",
-        previous_analysis: str = ""
-    ) -> Dict[str, Any]:
-        """
-        Analyze LinkedIn profile and provide feedback.
-        
-        Args:
-            profile_data: LinkedIn profile data
-            query: Specific analysis query
-            previous_analysis: Previous analysis for context
-            
-        Returns:
-            Analysis results dictionary
-        """
-        # Calculate completeness score
-        completeness = calculate_profile_completeness(profile_data)
-        
-        # Validate experience dates
-        date_issues = []
-        if profile_data.get("experience"):
-            date_issues = validate_experience_dates(profile_data["experience"])
-        
-        # Analyze skills quality (focus on experience-linkage)
-        skills_analysis = self._analyze_skills_quality(profile_data)
-        
-        # Format profile for LLM
-        formatted_profile = format_profile_data(profile_data)
-        
-        # Get current date for context
-        current_date = datetime.now().strftime("%B %d, %Y")
-        
-        # Add date validation context if there are real issues
-        date_validation_note = ""
-        if date_issues:
-            date_validation_note = "\n\nDATE VALIDATION ALERTS (Real Issues Found):\n"
-            for issue in date_issues:
-                date_validation_note += f"- {issue['position']}: {issue['issue']} (Start: {issue.get('start_date', 'N/A')}, Current Date: {issue.get('current_date', 'N/A')})\n"
-        
-        # Enhanced prompt for better analysis
-        enhanced_query = f"""
+# Numbered or bulleted lines of an LLM analysis, capturing the text after the marker
+_LIST_ITEM_RE = re.compile(r'^[^\S\n]*[0-9\-•][0-9.\-•) ]*(.*)$', re.MULTILINE)
+
+# Profile analysis query, filled in per analysis
+_ANALYSIS_QUERY_TEMPLATE = """
 You are an expert LinkedIn profile strategist and career consultant with 10+ years of experience.
 
 IMPORTANT CONTEXT:
@@ -79,10 +30,10 @@ IMPORTANT CONTEXT:
 {date_validation_note}
 
 **SKILLS OVERVIEW:**
-- Total Skills: {skills_analysis['total_skills']}
-- Skills Demonstrated in Experience: {skills_analysis['linked_skills']} ({skills_analysis['proof_rate']:.0f}%)
-- Skills Without Work History Proof: {skills_analysis['orphan_skills']}
-{f"- Note: {skills_analysis['endorsed_skills']} skills have endorsements (optional but helpful)" if skills_analysis['endorsed_skills'] > 0 else ""}
+- Total Skills: {total_skills}
+- Skills Demonstrated in Experience: {linked_skills} ({proof_rate:.0f}%)
+- Skills Without Work History Proof: {orphan_skills}
+{endorsement_note}
 
 TASK: Conduct a comprehensive analysis of this LinkedIn profile.
 
@@ -90,10 +41,12 @@ PROFILE DATA:
 {formatted_profile}
 
 PREVIOUS ANALYSIS (if any):
-{previous_analysis if previous_analysis else "None - this is a fresh analysis"}
+{previous_analysis}
 
 USER QUERY: {query}
 
+IMPORTANT: Answer the user's specific question. If they ask about one section (e.g., "How's my headline?"), answer ONLY that concisely; give the full analysis below when they ask to analyze or review the whole profile.
+
 ANALYSIS REQUIREMENTS:
 1. Evaluate profile strength across all sections (headline, summary, experience, skills, education)
 2. **PRIMARY CONCERN:** Skills should be backed by actual work experience (not just listed)
@@ -132,13 +85,87 @@ OUTPUT FORMAT:
 Keep recommendations actionable, specific, and professional. Focus on high-impact changes.
 Keep the tone constructive. Endorsements are optional - the real issue is when skills lack ANY proof from work history.
 """
+
+
+class ProfileAnalyzerAgent:
+    """Agent for analyzing LinkedIn profiles."""
+    
+    def __init__(self, llm_service: LLMService):
+        """
+        Initialize profile analyzer.
+        
+        Args:
+            llm_service: LLM service instance
+        """
+        self.llm = llm_service
+    
+    def analyze(
+        self,
+        profile_data: Dict[str, Any],
+        query: str = "Analyze this profile",
+        previous_analysis: str = "",
+        formatted_profile: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze LinkedIn profile and provide feedback.
+        
+        Args:
+            profile_data: LinkedIn profile data
+            query: Specific analysis query
+            previous_analysis: Previous analysis for context
+            formatted_profile: Pre-formatted profile text (formatted on demand if omitted)
+            
+        Returns:
+            Analysis results dictionary
+        """
+        # Calculate completeness score
+        completeness = calculate_profile_completeness(profile_data)
+        
+        # Validate experience dates
+        date_issues = []
+        if profile_data.get("experience"):
+            date_issues = validate_experience_dates(profile_data["experience"])
+        
+        # Analyze skills quality (focus on experience-linkage)
+        skills_analysis = self._analyze_skills_quality(profile_data)
+        
+        # Format profile for LLM
+        if formatted_profile is None:
+            formatted_profile = format_profile_data(profile_data)
+        
+        # Get current date for context
+        current_date = datetime.now().strftime("%B %d, %Y")
+        
+        # Add date validation context if there are real issues
+        date_validation_note = ""
+        if date_issues:
+            date_validation_note = "\n\nDATE VALIDATION ALERTS (Real Issues Found):\n" + "".join(
+                f"- {issue['position']}: {issue['issue']} (Start: {issue.get('start_date', 'N/A')}, Current Date: {issue.get('current_date', 'N/A')})\n"
+                for issue in date_issues
+            )
+        
+        endorsement_note = ""
+        if skills_analysis['endorsed_skills'] > 0:
+            endorsement_note = f"- Note: {skills_analysis['endorsed_skills']} skills have endorsements (optional but helpful)"
+        
+        # Enhanced prompt for better analysis
+        enhanced_query = _ANALYSIS_QUERY_TEMPLATE.format_map({
+            'current_date': current_date,
+            'date_validation_note': date_validation_note,
+            'total_skills': skills_analysis['total_skills'],
+            'linked_skills': skills_analysis['linked_skills'],
+            'proof_rate': skills_analysis['proof_rate'],
+            'orphan_skills': skills_analysis['orphan_skills'],
+            'endorsement_note': endorsement_note,
+            'formatted_profile': formatted_profile,
+            'previous_analysis': previous_analysis if previous_analysis else "None - this is a fresh analysis",
+            'query': query
+        })
         
-        # Get LLM analysis
-        llm_analysis = self.llm.analyze_profile(
-            profile_data=formatted_profile,
-            query=enhanced_query,
-            previous_analysis=previous_analysis
-        )
+        # The enhanced query already carries the profile and previous analysis,
+        # so it is sent as the whole prompt rather than wrapped in
+        # PROFILE_ANALYSIS_PROMPT, which would repeat both
+        llm_analysis = self.llm.generate_cached_response(enhanced_query)
         
         return {
             "completeness_score": completeness["score"],
@@ -154,10 +181,13 @@ Keep the tone constructive. Endorsements are optional - the real issue is when s
         skills_detailed = profile_data.get('skills_detailed', [])
         
         total = len(skills_detailed)
-        endorsed = sum(1 for s in skills_detailed if s.get('endorsement_count', 0) > 0)
-        linked = sum(1 for s in skills_detailed if s.get('related_experiences'))
-        orphan = sum(1 for s in skills_detailed 
-                    if not s.get('related_experiences'))  # Don't care about endorsements here
+        endorsed = linked = 0
+        for skill in skills_detailed:
+            if skill.get('endorsement_count', 0) > 0:
+                endorsed += 1
+            if skill.get('related_experiences'):
+                linked += 1
+        orphan = total - linked  # Don't care about endorsements here
         
         return {
             'total_skills': total,
@@ -170,16 +200,15 @@ Keep the tone constructive. Endorsements are optional - the real issue is when s
     
     def _extract_recommendations(self, analysis: str) -> list:
         """Extract actionable recommendations from analysis."""
-        # Simple extraction - split by numbered lists or bullet points
-        lines = analysis.split('\n')
+        # Simple extraction - numbered lists or bullet points, with the
+        # numbering or bullets removed
         recommendations = []
         
-        for line in lines:
-            line = line.strip()
-            if line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
-                # Remove numbering or bullets
-                clean_line = line.lstrip('0123456789.-•) ').strip()
-                if clean_line:
-                    recommendations.append(clean_line)
+        for match in _LIST_ITEM_RE.finditer(analysis):
+            clean_line = match.group(1).strip()
+            if clean_line:
+                recommendations.append(clean_line)
+                if len(recommendations) == 10:  # Limit to top 10
+                    break
         
-        return recommendations[:10]  # Limit to top 10
\ No newline at end of file
+        return recommendations
\ No newline at end of file
@@ -23,6 +23,55 @@ class Settings(BaseSettings):
     llm_model: str = "gemini-2.5-flash"
     llm_temperature: float = 0.6
     
+    # Prompt input budgets (characters)
+    max_formatted_profile_chars: int = 12000
+    max_profile_chars: int = 6000
+    max_job_description_chars: int = 4000
+    max_experience_description_chars: int = 1500
+    # Most recent positions and top skills included in profile prompts
+    max_profile_experiences: int = 12
+    max_profile_skills: int = 50
+    
+    # Exact-match LLM response cache
+    llm_cache_size: int = 256
+    llm_cache_ttl_seconds: int = 86400
+    llm_cache_persist: bool = True
+    
+    # Semantic cache of routing decisions
+    router_semantic_cache: bool = True
+    router_embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    router_cache_threshold: float = 0.92
+    router_cache_size: int = 1000
+    
+    # Local classifier routing queries it is confident about without an LLM call
+    router_local_model: bool = True
+    router_local_min_margin: float = 0.8
+    
+    # Micro-batching of routing requests from concurrent sessions
+    router_batch_size: int = 8
+    router_batch_wait_ms: int = 20
+    
+    # Session memory: recent chat messages kept in memory (the log on disk keeps all)
+    conversation_history_size: int = 40
+    # Oldest messages folded into the rolling conversation summary at a time
+    conversation_summary_block: int = 20
+    # Analysis results kept in the session (oldest dropped first)
+    max_stored_analyses: int = 200
+    
+    # Seconds to wait for an online job search before using default descriptions
+    jd_search_deadline_seconds: float = 6.0
+    
+    # Cache of online job search results
+    jd_search_cache_size: int = 256
+    jd_search_cache_ttl_seconds: int = 86400
+    
+    # Attempts per Apify actor run before a scrape fails
+    scrape_max_retries: int = 3
+    
+    # Cache of scraped LinkedIn profiles, keyed by username
+    profile_cache_size: int = 128
+    profile_cache_ttl_seconds: int = 3600
+    
     # Database
     database_path: str = "data/user_profiles/profiles.db"
     
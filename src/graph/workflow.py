@@ -1,6 +1,9 @@
 """LangGraph workflow definition."""
 
-from typing import Dict, Any
+import re
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Dict, Any, Optional
 from langgraph.graph import StateGraph, END
 from langchain.schema import HumanMessage, AIMessage
 
@@ -11,46 +14,94 @@ from src.agents import (
     ContentGeneratorAgent,
     CareerCounselorAgent
 )
-from src.services import LLMService, LinkedInScraper, JobDescriptionService
+from src.services import LLMService, JobDescriptionService
+from src.services.route_batcher import BatchingRouter
 from src.memory import MemoryManager
 
 
-def create_workflow(memory_manager: MemoryManager) -> StateGraph:
+# Queries asking for suggestions on every profile section
+_GENERATE_ALL_RE = re.compile(
+    r'all section|every section|complete profile|entire profile|'
+    r'comprehensive|all suggestions|full profile',
+    re.IGNORECASE
+)
+
+# Section named anywhere in a query. Each alternative looks ahead over the
+# whole query, so sections keep their priority order (about beats headline
+# even when headline comes first); lastgroup names the winner
+_SECTION_QUERY_RE = re.compile(
+    r'^(?:(?=.*?(?:about|summary))(?P<about>)'
+    r'|(?=.*?headline)(?P<headline>)'
+    r'|(?=.*?experience)(?P<experience>)'
+    r'|(?=.*?education)(?P<education>)'
+    r'|(?=.*?skills)(?P<skills>))',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+@lru_cache(maxsize=4)
+def _build_agents(llm_service: LLMService) -> SimpleNamespace:
+    """
+    Build the agents for an LLM service once and share them across workflows.
+    
+    Agents hold no per-session state, so every session's graph can reuse
+    the same instances (and the job matcher's result cache). Sharing the
+    router lets queries from concurrent sessions be routed together.
+    
+    Args:
+        llm_service: LLM service instance
+        
+    Returns:
+        Namespace of the router and agent instances
+    """
+    return SimpleNamespace(
+        router=BatchingRouter(llm_service),
+        profile_analyzer=ProfileAnalyzerAgent(llm_service),
+        job_matcher=JobMatcherAgent(llm_service, JobDescriptionService()),
+        content_generator=ContentGeneratorAgent(llm_service),
+        career_counselor=CareerCounselorAgent(llm_service)
+    )
+
+
+def create_workflow(
+    memory_manager: MemoryManager,
+    llm_service: Optional[LLMService] = None
+) -> StateGraph:
     """
     Create the LangGraph workflow.
     
     Args:
         memory_manager: Memory manager instance
+        llm_service: LLM service instance (created if omitted)
         
     Returns:
         Configured StateGraph
     """
     
-    # Initialize services
-    llm_service = LLMService()
-    scraper = LinkedInScraper()
-    job_service = JobDescriptionService()
-    
-    # Initialize agents
-    profile_analyzer = ProfileAnalyzerAgent(llm_service)
-    job_matcher = JobMatcherAgent(llm_service, job_service)
-    content_generator = ContentGeneratorAgent(llm_service)
-    career_counselor = CareerCounselorAgent(llm_service)
-    
-    # Define node functions
-    def router_node(state: GraphState) -> GraphState:
+    # Initialize services and agents
+    llm_service = llm_service or LLMService()
+    agents = _build_agents(llm_service)
+    router = agents.router
+    profile_analyzer = agents.profile_analyzer
+    job_matcher = agents.job_matcher
+    content_generator = agents.content_generator
+    career_counselor = agents.career_counselor
+    
+    # Define node functions. Each returns only the state keys it changes, so
+    # LangGraph writes just those channels instead of the whole state
+    def router_node(state: GraphState) -> Dict[str, Any]:
         """Route user query to appropriate agent."""
         query = state["user_query"]
         context = memory_manager.get_context_summary()
         
-        # Use LLM to determine routing
-        agent = llm_service.route_query(query, context)
+        # Use LLM to determine routing, batched with other sessions' queries
+        agent = router.route(query, context)
         
-        state["next_agent"] = agent
-        return state
+        return {"next_agent": agent}
     
-    def profile_analyzer_node(state: GraphState) -> GraphState:
+    def profile_analyzer_node(state: GraphState) -> Dict[str, Any]:
         """Analyze LinkedIn profile."""
+        update = {}
         profile_data = state.get("profile_data")
         query = state["user_query"]
         
@@ -58,26 +109,30 @@ def create_workflow(memory_manager: MemoryManager) -> StateGraph:
             # Check if we have it in memory
             profile_data = memory_manager.get_profile()
             if profile_data:
-                state["profile_data"] = profile_data
+                update["profile_data"] = profile_data
         
         if profile_data:
             previous_analysis = memory_manager.get_latest_analysis("profile_analysis")
             prev_text = previous_analysis["result"]["detailed_analysis"] if previous_analysis else ""
             
-            result = profile_analyzer.analyze(profile_data, query, prev_text)
-            state["profile_analysis"] = result
+            result = profile_analyzer.analyze(
+                profile_data, query, prev_text,
+                formatted_profile=memory_manager.get_formatted_profile()
+            )
+            update["profile_analysis"] = result
             
             # Save to memory
             memory_manager.add_analysis("profile_analysis", result)
         else:
-            state["profile_analysis"] = {
+            update["profile_analysis"] = {
                 "error": "No profile data available. Please provide a LinkedIn URL first."
             }
         
-        return state
+        return update
     
-    def job_matcher_node(state: GraphState) -> GraphState:
+    def job_matcher_node(state: GraphState) -> Dict[str, Any]:
         """Match profile with job description."""
+        update = {}
         profile_data = state.get("profile_data") or memory_manager.get_profile()
         target_role = state.get("target_role") or memory_manager.get_target_role()
         custom_jd = state.get("job_description")
@@ -85,11 +140,11 @@ def create_workflow(memory_manager: MemoryManager) -> StateGraph:
         location = state.get("job_location", "")
         
         if not profile_data:
-            state["job_match_results"] = {
+            update["job_match_results"] = {
                 "error": "No profile data available."
             }
         elif not target_role:
-            state["job_match_results"] = {
+            update["job_match_results"] = {
                 "error": "Please specify a target job role."
             }
         else:
@@ -98,28 +153,26 @@ def create_workflow(memory_manager: MemoryManager) -> StateGraph:
                 job_title=target_role,
                 custom_jd=custom_jd,
                 location=location,
-                use_online_search=use_online_search
+                use_online_search=use_online_search,
+                formatted_profile=memory_manager.get_formatted_profile()
             )
-            state["job_match_results"] = result
+            update["job_match_results"] = result
             
             # Save to memory
             memory_manager.add_analysis("job_match", result)
         
-        return state
+        return update
     
-    def content_generator_node(state: GraphState) -> GraphState:
+    def content_generator_node(state: GraphState) -> Dict[str, Any]:
         """Generate improved content."""
+        update = {}
         profile_data = state.get("profile_data") or memory_manager.get_profile()
         query = state["user_query"]
         target_role = state.get("target_role") or memory_manager.get_target_role()
         job_desc = state.get("job_description", "")
         
         # Check if user wants suggestions for all sections
-        query_lower = query.lower()
-        generate_all = any(keyword in query_lower for keyword in [
-            'all section', 'every section', 'complete profile', 'entire profile',
-            'comprehensive', 'all suggestions', 'full profile'
-        ])
+        generate_all = _GENERATE_ALL_RE.search(query) is not None
         
         if profile_data:
             if generate_all:
@@ -127,9 +180,10 @@ def create_workflow(memory_manager: MemoryManager) -> StateGraph:
                 result = content_generator.generate_all_sections(
                     profile_data=profile_data,
                     target_role=target_role,
-                    job_description=job_desc
+                    job_description=job_desc,
+                    formatted_profile=memory_manager.get_formatted_profile()
                 )
-                state["generated_content"] = result
+                update["generated_content"] = result
             else:
                 # Generate for specific section
                 section = _extract_section_from_query(query)
@@ -140,21 +194,23 @@ def create_workflow(memory_manager: MemoryManager) -> StateGraph:
                     current_content=current_content,
                     profile_data=profile_data,
                     target_role=target_role,
-                    job_description=job_desc
+                    job_description=job_desc,
+                    formatted_profile=memory_manager.get_formatted_profile()
                 )
-                state["generated_content"] = result
+                update["generated_content"] = result
             
             # Save to memory
             memory_manager.add_analysis("content_generation", result)
         else:
-            state["generated_content"] = {
+            update["generated_content"] = {
                 "error": "Could not determine which section to improve."
             }
         
-        return state
+        return update
     
-    def career_counselor_node(state: GraphState) -> GraphState:
+    def career_counselor_node(state: GraphState) -> Dict[str, Any]:
         """Provide career counseling."""
+        update = {}
         profile_data = state.get("profile_data") or memory_manager.get_profile()
         query = state["user_query"]
         career_goals = state.get("career_goals") or memory_manager.get_career_goals()
@@ -165,20 +221,21 @@ def create_workflow(memory_manager: MemoryManager) -> StateGraph:
                 profile_data=profile_data,
                 query=query,
                 career_goals=career_goals,
-                target_role=target_role
+                target_role=target_role,
+                formatted_profile=memory_manager.get_formatted_profile()
             )
-            state["career_guidance"] = result
+            update["career_guidance"] = result
             
             # Save to memory
             memory_manager.add_analysis("career_counseling", result)
         else:
-            state["career_guidance"] = {
+            update["career_guidance"] = {
                 "error": "No profile data available."
             }
         
-        return state
+        return update
     
-    def response_formatter_node(state: GraphState) -> GraphState:
+    def response_formatter_node(state: GraphState) -> Dict[str, Any]:
         """Format the final response."""
         next_agent = state.get("next_agent")
         
@@ -198,16 +255,14 @@ def create_workflow(memory_manager: MemoryManager) -> StateGraph:
         else:
             response = "I'm not sure how to help with that. Could you rephrase your question?"
         
-        # Add to messages
-        state["messages"].append({
-            "role": "assistant",
-            "content": response
-        })
-        
         # Save to memory
         memory_manager.add_message("assistant", response)
         
-        return state
+        # add_messages appends the reply to the existing messages
+        return {"messages": [{
+            "role": "assistant",
+            "content": response
+        }]}
     
     # Build the graph
     workflow = StateGraph(GraphState)
@@ -251,20 +306,8 @@ def create_workflow(memory_manager: MemoryManager) -> StateGraph:
 
 def _extract_section_from_query(query: str) -> str:
     """Extract which profile section to improve from query."""
-    query_lower = query.lower()
-    
-    if "about" in query_lower or "summary" in query_lower:
-        return "about"
-    elif "headline" in query_lower:
-        return "headline"
-    elif "experience" in query_lower:
-        return "experience"
-    elif "education" in query_lower:
-        return "education"
-    elif "skills" in query_lower:
-        return "skills"
-    else:
-        return "about"  # Default
+    match = _SECTION_QUERY_RE.match(query)
+    return match.lastgroup if match else "about"  # Default
 
 
 def _get_section_content(profile_data: Dict[str, Any], section: str) -> str:
@@ -333,7 +376,7 @@ def _format_generated_content(result: Dict[str, Any]) -> str:
     
     # Single section format
     section = result.get('section', 'Unknown')
-    output = f"""
+    parts = [f"""
 ✨ **Improved {section.title()} Section**
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -353,32 +396,32 @@ def _format_generated_content(result: Dict[str, Any]) -> str:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 🔑 **Key Improvements Made:**
-"""
+"""]
     
     improvements = result.get('improvements', [])
     if improvements:
         for i, improvement in enumerate(improvements, 1):
-            output += f"{i}. {improvement}\n"
+            parts.append(f"{i}. {improvement}\n")
     else:
-        output += "• See generated content above\n"
+        parts.append("• See generated content above\n")
     
     keywords = result.get('keywords_added', [])
     if keywords:
-        output += f"\n📌 **Keywords Added:**\n{', '.join(keywords)}\n"
+        parts.append(f"\n📌 **Keywords Added:**\n{', '.join(keywords)}\n")
     
     credibility = result.get('credibility_elements', [])
     if credibility:
-        output += "\n✅ **Credibility Elements Added:**\n"
+        parts.append("\n✅ **Credibility Elements Added:**\n")
         for cred in credibility:
-            output += f"• {cred}\n"
+            parts.append(f"• {cred}\n")
     
     tips = result.get('tips', [])
     if tips:
-        output += "\n💡 **Additional Tips:**\n"
+        parts.append("\n💡 **Additional Tips:**\n")
         for tip in tips:
-            output += f"• {tip}\n"
+            parts.append(f"• {tip}\n")
     
-    return output.strip()
+    return "".join(parts).strip()
 
 
 def _format_all_sections_content(result: Dict[str, Any]) -> str:
@@ -389,7 +432,7 @@ def _format_all_sections_content(result: Dict[str, Any]) -> str:
     advanced_tips = result.get('advanced_tips', [])
     
     # Build response
-    response = f"""
+    parts = [f"""
 🎨 **Comprehensive LinkedIn Profile Optimization Plan**
 
 **Target Role:** {result.get('target_role', 'General professional development')}
@@ -400,7 +443,7 @@ def _format_all_sections_content(result: Dict[str, Any]) -> str:
 
 ## 📊 Section Priorities
 
-"""
+"""]
     
     # Add priorities with visual indicators
     priority_order = ['HIGH', 'MEDIUM', 'LOW']
@@ -408,28 +451,28 @@ def _format_all_sections_content(result: Dict[str, Any]) -> str:
         matching_sections = {name: info for name, info in priorities.items() if info['priority'] == priority_level}
         if matching_sections:
             priority_emoji = "🔴" if priority_level == "HIGH" else "🟡" if priority_level == "MEDIUM" else "🟢"
-            response += f"\n### {priority_emoji} {priority_level} Priority\n\n"
+            parts.append(f"\n### {priority_emoji} {priority_level} Priority\n\n")
             
             for section_name, info in matching_sections.items():
-                response += f"**{section_name.title()}**\n"
-                response += f"- Reason: {info['reason']}\n"
-                response += f"- Impact: {info['impact']}\n\n"
+                parts.append(f"**{section_name.title()}**\n")
+                parts.append(f"- Reason: {info['reason']}\n")
+                parts.append(f"- Impact: {info['impact']}\n\n")
     
-    response += "\n---\n\n## ⚡ Quick Wins (Start Here!)\n\n"
+    parts.append("\n---\n\n## ⚡ Quick Wins (Start Here!)\n\n")
     
     if quick_wins:
         for i, win in enumerate(quick_wins, 1):
-            response += f"""
+            parts.append(f"""
 **{i}. {win['section']}**
 - **Action:** {win['action']}
 - **Current:** {win['current_length']}
 - **Time:** {win['time']} | **Impact:** {win['impact']}
 
-"""
+""")
     else:
-        response += "_No major quick wins identified - your profile is in good shape!_\n\n"
+        parts.append("_No major quick wins identified - your profile is in good shape!_\n\n")
     
-    response += "\n---\n\n## 📝 Detailed Section Suggestions\n\n"
+    parts.append("\n---\n\n## 📝 Detailed Section Suggestions\n\n")
     
     # Add suggestions for each section
     section_order = ['headline', 'about', 'experience', 'skills', 'education']
@@ -439,7 +482,7 @@ def _format_all_sections_content(result: Dict[str, Any]) -> str:
             priority_info = priorities.get(section_name, {})
             priority_emoji = "🔴" if priority_info.get('priority') == "HIGH" else "🟡" if priority_info.get('priority') == "MEDIUM" else "🟢"
             
-            response += f"""
+            parts.append(f"""
 ### {priority_emoji} {section_name.title()}
 
 **Generated Content:**
@@ -460,15 +503,15 @@ def _format_all_sections_content(result: Dict[str, Any]) -> str:
 
 ---
 
-"""
+""")
     
-    response += "\n## 🚀 Advanced Optimization Tips\n\n"
+    parts.append("\n## 🚀 Advanced Optimization Tips\n\n")
     
     if advanced_tips:
         for tip in advanced_tips:
-            response += f"{tip}\n\n"
+            parts.append(f"{tip}\n\n")
     
-    response += """
+    parts.append("""
 ---
 
 ## 🎯 Next Steps
@@ -480,9 +523,9 @@ def _format_all_sections_content(result: Dict[str, Any]) -> str:
 5. **Track Results:** Monitor profile views and connection requests after updates
 
 **Remember:** A great LinkedIn profile is never "done" - keep iterating based on your career goals!
-"""
+""")
     
-    return response.strip()
+    return "".join(parts).strip()
 
 
 def _format_career_guidance(result: Dict[str, Any]) -> str:
@@ -4,6 +4,9 @@ from typing import Dict, Any, Optional
 from langgraph.checkpoint import BaseCheckpointSaver
 from langgraph.checkpoint.base import Checkpoint
 import json
+import sqlite3
+import threading
+import time
 from pathlib import Path
 from src.config.settings import settings
 
@@ -20,6 +23,21 @@ class CustomCheckpointer(BaseCheckpointSaver):
         """
         self.checkpoint_dir = checkpoint_dir or settings.profiles_dir / "checkpoints"
         self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        
+        # One SQLite database for all threads; WAL keeps reads from blocking
+        # on writes and makes each put a single append to the log
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.checkpoint_dir / "checkpoints.db",
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
     
     def put(self, config: Dict[str, Any], checkpoint: Checkpoint) -> None:
         """
@@ -30,7 +48,6 @@ class CustomCheckpointer(BaseCheckpointSaver):
             checkpoint: Checkpoint to save
         """
         thread_id = config.get("configurable", {}).get("thread_id", "default")
-        checkpoint_file = self.checkpoint_dir / f"{thread_id}.json"
         
         try:
             checkpoint_data = {
@@ -38,8 +55,13 @@ class CustomCheckpointer(BaseCheckpointSaver):
                 "state": checkpoint,
             }
             
-            with open(checkpoint_file, 'w') as f:
-                json.dump(checkpoint_data, f, indent=2, default=str)
+            # Compact json.dumps runs on the C encoder (see MemoryManager.save_session)
+            payload = json.dumps(checkpoint_data, separators=(',', ':'), ensure_ascii=False, default=str)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, updated_at, data) VALUES (?, ?, ?)",
+                    (thread_id, time.time(), payload)
+                )
         except Exception as e:
             print(f"Error saving checkpoint: {e}")
     
@@ -54,15 +76,15 @@ class CustomCheckpointer(BaseCheckpointSaver):
             Loaded checkpoint or None
         """
         thread_id = config.get("configurable", {}).get("thread_id", "default")
-        checkpoint_file = self.checkpoint_dir / f"{thread_id}.json"
-        
-        if not checkpoint_file.exists():
-            return None
         
         try:
-            with open(checkpoint_file, 'r') as f:
-                checkpoint_data = json.load(f)
-                return checkpoint_data.get("state")
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT data FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                ).fetchone()
+            if row is None:
+                return None
+            return json.loads(row[0]).get("state")
         except Exception as e:
             print(f"Error loading checkpoint: {e}")
             return None
@@ -1,36 +1,87 @@
 """Memory management for maintaining conversation context and user data."""
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, Iterable, List, Optional
 from datetime import datetime
+import atexit
 import json
+import threading
+import time
+import weakref
+from collections import deque
+from itertools import islice
 from pathlib import Path
 from src.config.settings import settings
+from src.utils.helpers import format_profile_data, write_text_atomic
+
+
+# Managers with possibly unsaved changes, flushed when the process exits
+_live_managers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_managers():
+    """Write out any session changes still pending at interpreter exit."""
+    for manager in list(_live_managers):
+        manager.flush()
 
 
 class MemoryManager:
     """Manages session and persistent memory for user interactions."""
     
-    def __init__(self, session_id: str):
+    # Analyses added during a turn are written once either limit is reached,
+    # or on flush(); other changes are saved immediately
+    FLUSH_INTERVAL_SECONDS = 2.0
+    FLUSH_MAX_PENDING = 10
+    
+    def __init__(
+        self,
+        session_id: str,
+        summarizer: Optional[Callable[[List[Dict[str, str]], str], str]] = None
+    ):
         """
         Initialize memory manager.
         
         Args:
             session_id: Unique session identifier
+            summarizer: Folds (messages, previous summary) into a new summary;
+                without one, messages leaving memory are not summarized
         """
         self.session_id = session_id
+        self._summarizer = summarizer
+        self._summarizing = False
+        # Guards session_memory against the summary thread; the generation
+        # changes when the session is cleared, so a late summary is dropped
+        self._lock = threading.Lock()
+        self._generation = 0
         self.session_file = settings.profiles_dir / f"session_{session_id}.json"
+        # Messages are appended to their own log instead of rewriting the session
+        self.messages_file = settings.profiles_dir / f"session_{session_id}.messages.jsonl"
         
         # Session memory (temporary)
         self.session_memory: Dict[str, Any] = {
             "session_id": session_id,
             "started_at": datetime.now().isoformat(),
-            "conversation_history": [],
+            "conversation_history": self._new_history(),
             "current_profile": None,
             "target_role": None,
             "career_goals": None,
             "analyses": []
         }
         
+        # Formatted profile text, derived from current_profile on demand
+        self._formatted_profile: Optional[str] = None
+        
+        # Most recent analysis of each type, kept in step with "analyses"
+        self._latest_analyses: Dict[str, Dict[str, Any]] = {}
+        
+        # Messages ever added, including those evicted from the in-memory history
+        self._message_count = 0
+        
+        # Changes made since the session file was last written
+        self._pending_writes = 0
+        self._last_flush = time.monotonic()
+        _live_managers.add(self)
+        
         # Load existing session if available
         self._load_session()
     
@@ -38,20 +89,91 @@ class MemoryManager:
         """Load existing session data if available."""
         if self.session_file.exists():
             try:
-                with open(self.session_file, 'r') as f:
+                with open(self.session_file, 'r', encoding='utf-8') as f:
                     loaded_data = json.load(f)
                     self.session_memory.update(loaded_data)
+                self._latest_analyses = {
+                    analysis["type"]: analysis
+                    for analysis in self.session_memory.get("analyses", [])
+                }
             except Exception as e:
                 print(f"Error loading session: {e}")
+        
+        # Sessions saved before the message log existed keep their history in
+        # the session file; move it to the log once
+        history = self.session_memory["conversation_history"]
+        if history and not self.messages_file.exists():
+            self._append_messages(history)
+            self._message_count = len(history)
+            self.session_memory["conversation_history"] = self._new_history(history)
+        else:
+            self.session_memory["conversation_history"] = self._read_messages()
     
-    def save_session(self):
-        """Save current session to disk."""
+    @staticmethod
+    def _new_history(messages: Iterable[Dict[str, str]] = ()) -> deque:
+        """Create the in-memory history, keeping only the most recent messages."""
+        return deque(messages, maxlen=settings.conversation_history_size)
+    
+    def _read_messages(self) -> deque:
+        """Read the most recent messages from the message log and count them all."""
+        history = self._new_history()
+        if not self.messages_file.exists():
+            return history
+        
         try:
-            self.session_memory["updated_at"] = datetime.now().isoformat()
-            with open(self.session_file, 'w') as f:
-                json.dump(self.session_memory, f, indent=2)
+            with open(self.messages_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        history.append(json.loads(line))
+                        self._message_count += 1
         except Exception as e:
-            print(f"Error saving session: {e}")
+            print(f"Error loading conversation history: {e}")
+        return history
+    
+    def _append_messages(self, messages: List[Dict[str, str]]):
+        """Append messages to the message log, one JSON object per line."""
+        try:
+            payload = "".join(
+                json.dumps(message, separators=(',', ':'), ensure_ascii=False) + "\n"
+                for message in messages
+            )
+            with open(self.messages_file, 'a', encoding='utf-8') as f:
+                f.write(payload)
+        except Exception as e:
+            print(f"Error saving conversation history: {e}")
+    
+    def save_session(self):
+        """Save current session to disk."""
+        with self._lock:
+            try:
+                self.session_memory["updated_at"] = datetime.now().isoformat()
+                # Compact json.dumps runs on the C encoder; indented output or
+                # json.dump to a file fall back to the pure-Python one. Non-ASCII
+                # text (names, emoji) is written as UTF-8 rather than \u escapes
+                # Conversation history lives in the message log
+                session_data = {
+                    key: value for key, value in self.session_memory.items()
+                    if key != "conversation_history"
+                }
+                payload = json.dumps(session_data, separators=(',', ':'), ensure_ascii=False)
+                write_text_atomic(self.session_file, payload)
+                self._pending_writes = 0
+                self._last_flush = time.monotonic()
+            except Exception as e:
+                print(f"Error saving session: {e}")
+    
+    def flush(self):
+        """Save the session now if it has unsaved changes."""
+        if self._pending_writes:
+            self.save_session()
+    
+    def _mark_dirty(self):
+        """Record a change, saving once enough changes or time have accumulated."""
+        with self._lock:
+            self._pending_writes += 1
+        if (self._pending_writes >= self.FLUSH_MAX_PENDING
+                or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL_SECONDS):
+            self.save_session()
     
     def add_message(self, role: str, content: str):
         """
@@ -67,22 +189,66 @@ class MemoryManager:
             "timestamp": datetime.now().isoformat()
         }
         self.session_memory["conversation_history"].append(message)
-        self.save_session()
+        self._message_count += 1
+        self._append_messages([message])
+        self._maybe_summarize()
+    
+    def _maybe_summarize(self):
+        """
+        Fold the oldest unsummarized messages into the rolling summary.
+        
+        Runs once the unsummarized messages fill the in-memory history, so a
+        block is summarized just before it would be evicted. The LLM call
+        runs on a background thread and the result is saved with the next flush.
+        """
+        summarized = self.session_memory.get("summarized_messages", 0)
+        if (self._summarizer is None or self._summarizing
+                or self._message_count - summarized < settings.conversation_history_size):
+            return
+        
+        history = self.session_memory["conversation_history"]
+        first_kept = self._message_count - len(history)
+        start = max(summarized - first_kept, 0)
+        block = list(islice(history, start, start + settings.conversation_summary_block))
+        summarized_upto = first_kept + start + len(block)
+        previous_summary = self.session_memory.get("conversation_summary", "")
+        generation = self._generation
+        
+        def summarize():
+            summary = None
+            try:
+                summary = self._summarizer(block, previous_summary)
+            except Exception as e:
+                print(f"Error summarizing conversation: {e}")
+            
+            with self._lock:
+                # The session was cleared meanwhile; the summary is of the old chat
+                if generation != self._generation:
+                    return
+                if summary and not summary.startswith("Error:"):
+                    self.session_memory["conversation_summary"] = summary.strip()
+                # Advance even on failure so a failing summarizer is not retried every message
+                self.session_memory["summarized_messages"] = summarized_upto
+                self._pending_writes += 1
+                self._summarizing = False
+        
+        self._summarizing = True
+        threading.Thread(target=summarize, daemon=True).start()
     
     def get_conversation_history(self, last_n: Optional[int] = None) -> List[Dict[str, str]]:
         """
         Get conversation history.
         
         Args:
-            last_n: Number of recent messages to return (None for all)
+            last_n: Number of recent messages to return (None for all kept in memory)
             
         Returns:
             List of conversation messages
         """
         history = self.session_memory["conversation_history"]
         if last_n:
-            return history[-last_n:]
-        return history
+            return list(islice(history, max(len(history) - last_n, 0), None))
+        return list(history)
     
     def set_profile(self, profile_data: Dict[str, Any]):
         """
@@ -93,12 +259,31 @@ class MemoryManager:
         """
         self.session_memory["current_profile"] = profile_data
         self.session_memory["profile_loaded_at"] = datetime.now().isoformat()
+        self._formatted_profile = None
         self.save_session()
     
     def get_profile(self) -> Optional[Dict[str, Any]]:
         """Get stored profile data."""
         return self.session_memory.get("current_profile")
     
+    def get_formatted_profile(self) -> Optional[str]:
+        """
+        Get stored profile formatted as LLM-ready text.
+        
+        The formatted text is computed once per profile and reused until
+        the profile changes.
+        
+        Returns:
+            Formatted profile string or None if no profile is loaded
+        """
+        profile = self.get_profile()
+        if not profile:
+            return None
+        
+        if self._formatted_profile is None:
+            self._formatted_profile = format_profile_data(profile)
+        return self._formatted_profile
+    
     def set_target_role(self, role: str):
         """Set target job role."""
         self.session_memory["target_role"] = role
@@ -130,8 +315,13 @@ class MemoryManager:
             "result": result,
             "timestamp": datetime.now().isoformat()
         }
-        self.session_memory["analyses"].append(analysis)
-        self.save_session()
+        analyses = self.session_memory["analyses"]
+        analyses.append(analysis)
+        # Keep the stored (and saved) analyses bounded; the oldest go first
+        if len(analyses) > settings.max_stored_analyses:
+            del analyses[:len(analyses) - settings.max_stored_analyses]
+        self._latest_analyses[analysis_type] = analysis
+        self._mark_dirty()
     
     def get_latest_analysis(self, analysis_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
@@ -143,16 +333,11 @@ class MemoryManager:
         Returns:
             Latest analysis or None
         """
-        analyses = self.session_memory.get("analyses", [])
-        
-        if not analyses:
-            return None
-        
         if analysis_type:
-            filtered = [a for a in analyses if a["type"] == analysis_type]
-            return filtered[-1] if filtered else None
+            return self._latest_analyses.get(analysis_type)
         
-        return analyses[-1]
+        analyses = self.session_memory.get("analyses", [])
+        return analyses[-1] if analyses else None
     
     def get_context_summary(self) -> str:
         """
@@ -177,6 +362,10 @@ class MemoryManager:
         if career_goals:
             summary_parts.append(f"Career goals: {career_goals}")
         
+        conversation_summary = self.session_memory.get("conversation_summary")
+        if conversation_summary:
+            summary_parts.append(f"Earlier conversation: {conversation_summary}")
+        
         recent_analyses = self.session_memory.get("analyses", [])[-3:]
         if recent_analyses:
             summary_parts.append(f"Recent analyses: {len(recent_analyses)}")
@@ -185,13 +374,20 @@ class MemoryManager:
     
     def clear_session(self):
         """Clear current session data."""
-        self.session_memory = {
-            "session_id": self.session_id,
-            "started_at": datetime.now().isoformat(),
-            "conversation_history": [],
-            "current_profile": None,
-            "target_role": None,
-            "career_goals": None,
-            "analyses": []
-        }
+        with self._lock:
+            self._generation += 1
+            self._summarizing = False
+            self.session_memory = {
+                "session_id": self.session_id,
+                "started_at": datetime.now().isoformat(),
+                "conversation_history": self._new_history(),
+                "current_profile": None,
+                "target_role": None,
+                "career_goals": None,
+                "analyses": []
+            }
+            self._formatted_profile = None
+            self._latest_analyses = {}
+            self._message_count = 0
+        self.messages_file.unlink(missing_ok=True)
         self.save_session()
\ No newline at end of file
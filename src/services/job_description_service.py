@@ -1,73 +1,36 @@
 """Service for fetching and processing job descriptions."""
 
 from typing import Dict, Any, Optional, List
-import requests
-from bs4 import BeautifulSoup
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
 from src.config.settings import settings
+from src.utils.helpers import write_text_atomic
 
 
-class JobDescriptionService:
-    """Service for fetching job descriptions from various sources."""
-    
-    def __init__(self):
-        """Initialize the job description service."""
-        self.default_job_descriptions = self._load_default_descriptions()
-        self.tavily_api_key = settings.tavily_api_key
-    
-    def get_job_description(
-        self,
-        job_title: str,
-        custom_description: Optional[str] = None,
-        location: str = "",
-        use_online_search: bool = False
-    ) -> Dict[str, Any]:
-        """
-        Get job description for a given role.
-        
-        Args:
-            job_title: Job title/role
-            custom_description: Custom JD provided by user
-            location: Location for online search
-            use_online_search: Whether to search online first
-            
-        Returns:
-            Dictionary with job description and metadata
-        """
-        # Priority 1: Custom description provided by user
-        if custom_description:
-            return {
-                "title": job_title,
-                "description": custom_description,
-                "source": "user_provided",
-                "skills": self._extract_skills_from_text(custom_description)
-            }
-        
-        # Priority 2: Online search (if enabled and API key available)
-        if use_online_search and self.tavily_api_key:
-            online_jd = self.search_job_online(job_title, location)
-            if online_jd:
-                return {
-                    "title": job_title,
-                    "description": online_jd,
-                    "source": "tavily_search",
-                    "skills": self._extract_skills_from_text(online_jd)
-                }
-        
-        # Priority 3: Default database
-        default_jd = self._get_default_jd(job_title)
-        if default_jd:
-            return default_jd
-        
-        # Priority 4: Generic fallback
-        return self._generate_generic_jd(job_title)
-    
-    def _load_default_descriptions(self) -> Dict[str, Dict[str, Any]]:
-        """Load default job descriptions for common roles."""
-        return {
-            "data_analyst": {
-                "title": "Data Analyst",
-                "description": """
+# Common technical skills to look for in job descriptions, with display names.
+# Plain substring checks are deliberate: each runs at C speed, and a combined
+# regex has to test every text position and cannot report overlapping skills
+# such as "java" inside "javascript"
+_COMMON_SKILLS = tuple((skill, skill.title()) for skill in (
+    "python", "java", "javascript", "sql", "react", "angular", "vue",
+    "docker", "kubernetes", "aws", "azure", "gcp", "git", "agile",
+    "scrum", "tableau", "power bi", "excel", "machine learning",
+    "deep learning", "tensorflow", "pytorch", "spark", "hadoop",
+    "rest api", "graphql", "mongodb", "postgresql", "redis",
+    "jenkins", "ci/cd", "terraform", "ansible", "linux"
+))
+
+
+# Default job descriptions for common roles, keyed by normalized title
+_DEFAULT_JOB_DESCRIPTIONS = {
+    "data_analyst": {
+        "title": "Data Analyst",
+        "description": """
                 We are seeking a Data Analyst to join our team. The ideal candidate will be responsible for 
                 collecting, processing, and performing statistical analyses on large datasets.
                 
@@ -92,13 +55,13 @@ class JobDescriptionService:
                 - 2+ years of experience in data analysis
                 - Experience with machine learning is a plus
                 """,
-                "skills": ["SQL", "Python", "R", "Tableau", "Power BI", "Excel", "Statistics", 
-                          "Data Visualization", "ETL", "Data Modeling"],
-                "source": "default_database"
-            },
-            "software_engineer": {
-                "title": "Software Engineer",
-                "description": """
+        "skills": ["SQL", "Python", "R", "Tableau", "Power BI", "Excel", "Statistics", 
+                  "Data Visualization", "ETL", "Data Modeling"],
+        "source": "default_database"
+    },
+    "software_engineer": {
+        "title": "Software Engineer",
+        "description": """
                 We are looking for a Software Engineer to produce and implement functional software solutions.
                 
                 Key Responsibilities:
@@ -122,13 +85,13 @@ class JobDescriptionService:
                 - 3+ years of software development experience
                 - Cloud platform experience (AWS, Azure, GCP)
                 """,
-                "skills": ["Java", "Python", "C++", "JavaScript", "React", "Django", "SQL", 
-                          "Git", "AWS", "REST APIs", "Docker", "Agile"],
-                "source": "default_database"
-            },
-            "product_manager": {
-                "title": "Product Manager",
-                "description": """
+        "skills": ["Java", "Python", "C++", "JavaScript", "React", "Django", "SQL", 
+                  "Git", "AWS", "REST APIs", "Docker", "Agile"],
+        "source": "default_database"
+    },
+    "product_manager": {
+        "title": "Product Manager",
+        "description": """
                 We are seeking a Product Manager to lead product development from conception to launch.
                 
                 Key Responsibilities:
@@ -152,14 +115,14 @@ class JobDescriptionService:
                 - 4+ years of product management experience
                 - Technical background is a plus
                 """,
-                "skills": ["Product Strategy", "Roadmap Planning", "Agile", "Scrum", 
-                          "User Research", "Analytics", "A/B Testing", "Stakeholder Management",
-                          "JIRA", "SQL", "Data Analysis"],
-                "source": "default_database"
-            },
-            "data_scientist": {
-                "title": "Data Scientist",
-                "description": """
+        "skills": ["Product Strategy", "Roadmap Planning", "Agile", "Scrum", 
+                  "User Research", "Analytics", "A/B Testing", "Stakeholder Management",
+                  "JIRA", "SQL", "Data Analysis"],
+        "source": "default_database"
+    },
+    "data_scientist": {
+        "title": "Data Scientist",
+        "description": """
                 We are looking for a Data Scientist to analyze large amounts of raw information to find patterns.
                 
                 Key Responsibilities:
@@ -182,14 +145,14 @@ class JobDescriptionService:
                 - 3+ years of experience in data science
                 - Experience with cloud platforms
                 """,
-                "skills": ["Python", "R", "SQL", "Machine Learning", "Deep Learning", 
-                          "TensorFlow", "PyTorch", "Scikit-learn", "Spark", "Hadoop",
-                          "Statistics", "Data Mining", "NLP"],
-                "source": "default_database"
-            },
-            "marketing_manager": {
-                "title": "Marketing Manager",
-                "description": """
+        "skills": ["Python", "R", "SQL", "Machine Learning", "Deep Learning", 
+                  "TensorFlow", "PyTorch", "Scikit-learn", "Spark", "Hadoop",
+                  "Statistics", "Data Mining", "NLP"],
+        "source": "default_database"
+    },
+    "marketing_manager": {
+        "title": "Marketing Manager",
+        "description": """
                 We are seeking a Marketing Manager to develop and execute marketing strategies.
                 
                 Key Responsibilities:
@@ -213,12 +176,106 @@ class JobDescriptionService:
                 - 5+ years of marketing experience
                 - Experience with CRM systems
                 """,
-                "skills": ["Digital Marketing", "SEO", "SEM", "Google Analytics", 
-                          "Social Media Marketing", "Content Strategy", "Email Marketing",
-                          "Marketing Automation", "HubSpot", "Brand Management"],
-                "source": "default_database"
+        "skills": ["Digital Marketing", "SEO", "SEM", "Google Analytics", 
+                  "Social Media Marketing", "Content Strategy", "Email Marketing",
+                  "Marketing Automation", "HubSpot", "Brand Management"],
+        "source": "default_database"
+    }
+}
+
+
+# Cached because a pasted custom JD is sent again with every query
+@lru_cache(maxsize=64)
+def _find_common_skills(text: str) -> tuple:
+    """Find the common skills mentioned in a text, in _COMMON_SKILLS order."""
+    text_lower = text.lower()
+    return tuple(title for skill, title in _COMMON_SKILLS if skill in text_lower)
+
+
+class JobDescriptionService:
+    """Service for fetching job descriptions from various sources."""
+    
+    def __init__(self):
+        """Initialize the job description service."""
+        self.default_job_descriptions = _DEFAULT_JOB_DESCRIPTIONS
+        self.tavily_api_key = settings.tavily_api_key
+        # HTTP session reused across searches, created on the first search
+        self._http = None
+        # Searches run here so a slow one can be abandoned at the deadline
+        self._search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="jd_search")
+        
+        # Online search results keyed by title and location, persisted across restarts
+        self.search_cache_path = settings.data_dir / "jd_search_cache.json"
+        self._search_cache = self._load_search_cache()
+        self._search_cache_lock = threading.Lock()
+    
+    def get_job_description(
+        self,
+        job_title: str,
+        custom_description: Optional[str] = None,
+        location: str = "",
+        use_online_search: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Get job description for a given role.
+        
+        Args:
+            job_title: Job title/role
+            custom_description: Custom JD provided by user
+            location: Location for online search
+            use_online_search: Whether to search online first
+            
+        Returns:
+            Dictionary with job description and metadata
+        """
+        # Priority 1: Custom description provided by user
+        if custom_description:
+            return {
+                "title": job_title,
+                "description": custom_description,
+                "source": "user_provided",
+                "skills": self._extract_skills_from_text(custom_description)
             }
-        }
+        
+        # Priority 2: Online search (if enabled and API key available)
+        if use_online_search and self.tavily_api_key:
+            online_jd = self._search_with_deadline(job_title, location)
+            if online_jd:
+                return {
+                    "title": job_title,
+                    "description": online_jd,
+                    "source": "tavily_search",
+                    "skills": self._extract_skills_from_text(online_jd)
+                }
+        
+        # Priority 3: Default database
+        default_jd = self._get_default_jd(job_title)
+        if default_jd:
+            return default_jd
+        
+        # Priority 4: Generic fallback
+        return self._generate_generic_jd(job_title)
+    
+    def _search_with_deadline(self, job_title: str, location: str) -> Optional[str]:
+        """
+        Search online, giving up after settings.jd_search_deadline_seconds.
+        
+        A search still running at the deadline is left to finish in the
+        background, and the caller falls back to the default descriptions.
+        
+        Args:
+            job_title: Job title to search
+            location: Location filter (optional)
+            
+        Returns:
+            Job description text or None if the search failed or timed out
+        """
+        future = self._search_executor.submit(self.search_job_online, job_title, location)
+        try:
+            return future.result(timeout=settings.jd_search_deadline_seconds)
+        except FutureTimeoutError:
+            print(f"Online job search for '{job_title}' timed out. Falling back to default descriptions.")
+            return None
     
     def _get_default_jd(self, job_title: str) -> Optional[Dict[str, Any]]:
         """Get default job description from database."""
@@ -263,26 +320,72 @@ class JobDescriptionService:
     
     def _extract_skills_from_text(self, text: str) -> List[str]:
         """Extract potential skills from job description text."""
-        # Common technical skills to look for
-        common_skills = [
-            "python", "java", "javascript", "sql", "react", "angular", "vue",
-            "docker", "kubernetes", "aws", "azure", "gcp", "git", "agile",
-            "scrum", "tableau", "power bi", "excel", "machine learning",
-            "deep learning", "tensorflow", "pytorch", "spark", "hadoop",
-            "rest api", "graphql", "mongodb", "postgresql", "redis",
-            "jenkins", "ci/cd", "terraform", "ansible", "linux"
-        ]
+        return list(_find_common_skills(text))
+    
+    def search_job_online(
+        self,
+        job_title: str,
+        location: str = "",
+        force_refresh: bool = False
+    ) -> Optional[str]:
+        """
+        Search for job descriptions online, reusing recent results for the same query.
+        
+        Args:
+            job_title: Job title to search
+            location: Location filter (optional)
+            force_refresh: Ignore any cached result and search again
+            
+        Returns:
+            Job description text or None if search fails
+        """
+        key = hashlib.blake2b(
+            f"{job_title.strip().lower()}|{location.strip().lower()}".encode("utf-8"),
+            digest_size=16
+        ).hexdigest()
+        
+        if not force_refresh:
+            with self._search_cache_lock:
+                entry = self._search_cache.get(key)
+                if entry and time.time() - entry[0] < settings.jd_search_cache_ttl_seconds:
+                    return entry[1]
         
-        text_lower = text.lower()
-        found_skills = []
+        job_description = self._search_tavily(job_title, location)
         
-        for skill in common_skills:
-            if skill in text_lower:
-                found_skills.append(skill.title())
+        if job_description:
+            with self._search_cache_lock:
+                self._search_cache[key] = (time.time(), job_description)
+                self._search_cache.move_to_end(key)
+                while len(self._search_cache) > settings.jd_search_cache_size:
+                    self._search_cache.popitem(last=False)
+                self._save_search_cache()
         
-        return found_skills
+        return job_description
     
-    def search_job_online(self, job_title: str, location: str = "") -> Optional[str]:
+    def _load_search_cache(self) -> OrderedDict:
+        """Load persisted online search results, if any."""
+        if not self.search_cache_path.exists():
+            return OrderedDict()
+        
+        try:
+            with open(self.search_cache_path, 'r', encoding='utf-8') as f:
+                return OrderedDict((key, tuple(entry)) for key, entry in json.load(f).items())
+        except Exception as e:
+            print(f"Error loading job search cache: {e}")
+            return OrderedDict()
+    
+    def _save_search_cache(self):
+        """Persist online search results (caller holds the lock)."""
+        try:
+            self.search_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(
+                self.search_cache_path,
+                json.dumps(self._search_cache, separators=(',', ':'), ensure_ascii=False)
+            )
+        except Exception as e:
+            print(f"Error saving job search cache: {e}")
+    
+    def _search_tavily(self, job_title: str, location: str = "") -> Optional[str]:
         """
         Search for job descriptions online using Tavily API.
         
@@ -297,7 +400,12 @@ class JobDescriptionService:
             print("Warning: Tavily API key not configured. Falling back to default descriptions.")
             return None
         
+        # Imported on first search so the HTTP stack stays out of cold start
+        import requests
+        
         try:
+            http = self._get_http_session()
+            
             # Construct search query
             query = f"{job_title} job description requirements skills"
             if location:
@@ -306,10 +414,6 @@ class JobDescriptionService:
             # Tavily API endpoint
             url = "https://api.tavily.com/search"
             
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
             payload = {
                 "api_key": self.tavily_api_key,
                 "query": query,
@@ -321,12 +425,12 @@ class JobDescriptionService:
                     "monster.com",
                     "ziprecruiter.com"
                 ],
-                "max_results": 5,
+                "max_results": 3,  # Only the top 3 results are used
                 "include_answer": True,  # Get AI-generated summary
-                "include_raw_content": True  # Get full content
+                "include_raw_content": False  # Only each result's content snippet is used
             }
             
-            response = requests.post(url, json=payload, headers=headers, timeout=10)
+            response = http.post(url, json=payload, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -343,6 +447,34 @@ class JobDescriptionService:
             print(f"Unexpected error in job search: {e}")
             return None
     
+    def _get_http_session(self):
+        """
+        Get the HTTP session used for Tavily searches.
+        
+        Reusing one session keeps the TLS connection alive between searches
+        instead of opening a new one for every request.
+        
+        Returns:
+            requests.Session with JSON headers and retries on gateway errors
+        """
+        if self._http is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            
+            http = requests.Session()
+            http.headers.update({"Content-Type": "application/json"})
+            retry = Retry(
+                total=2,
+                backoff_factor=0.3,
+                status_forcelist=[502, 503, 504],
+                allowed_methods=frozenset({"POST"})  # Searches are safe to repeat
+            )
+            http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+            self._http = http
+        
+        return self._http
+    
     def _extract_jd_from_tavily_results(self, data: Dict[str, Any], job_title: str) -> Optional[str]:
         """
         Extract and format job description from Tavily search results.
@@ -1,72 +1,196 @@
 """LinkedIn profile scraping service using Apify."""
 
-from typing import Dict, Any, Optional
-from apify_client import ApifyClient
+import copy
+import random
+import re
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional
 from src.config.settings import settings
 import time
 
 
+# LinkedIn profile URL; the group is the username
+_PROFILE_URL_RE = re.compile(r"linkedin\.com/in/([^/?#\s]+)", re.IGNORECASE)
+
+_INVALID_URL_MESSAGE = "Invalid LinkedIn profile URL. Please use format: https://www.linkedin.com/in/username"
+
+
+# Month names for actors that report months as numbers; "Jun 2024" is what
+# parse_date_string expects
+_MONTH_NAMES = ("", "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _format_date(value: Any) -> str:
+    """
+    Format a date from the actor output as "Mon YYYY" or "YYYY".
+    
+    Args:
+        value: {"year": ..., "month": ...} dict, preformatted string, or None
+        
+    Returns:
+        Formatted date, or "" if there is no year
+    """
+    if not isinstance(value, dict):
+        return str(value) if value else ""
+    
+    year = value.get("year")
+    if not year:
+        return ""
+    
+    month = value.get("month")
+    if isinstance(month, int) or (isinstance(month, str) and month.isdigit()):
+        month = _MONTH_NAMES[int(month)] if 1 <= int(month) <= 12 else ""
+    
+    return f"{month} {year}" if month else str(year)
+
+
+@lru_cache(maxsize=8)
+def _get_apify_client(api_key: str):
+    """Get a process-wide Apify client, so its HTTP connection pool is reused."""
+    # Imported on first use so the Apify SDK stays out of cold start
+    from apify_client import ApifyClient
+    
+    return ApifyClient(api_key)
+
+
+def _unique_skill_names(names: Iterable[str]) -> List[str]:
+    """
+    Strip skill names and drop case-insensitive duplicates, keeping first spellings.
+    
+    Names are interned: the same common skills recur across every scraped
+    profile and are compared again in skill matching.
+    
+    Args:
+        names: Skill names in profile order
+        
+    Returns:
+        Unique skill names
+    """
+    seen = set()
+    unique = []
+    for name in names:
+        name = name.strip()
+        key = name.lower()
+        if name and key not in seen:
+            seen.add(key)
+            unique.append(sys.intern(name))
+    return unique
+
+
 class LinkedInScraper:
     """Service for scraping LinkedIn profiles using Apify."""
     
+    # (normalized key, basic_info key, default) for profile fields copied as-is
+    BASIC_INFO_FIELDS = (
+        # Personal info
+        ("full_name", "fullname", ""),
+        ("headline", "headline", ""),
+        ("about", "about", ""),
+        ("profile_url", "profile_url", ""),
+        
+        # Additional basic info
+        ("first_name", "first_name", ""),
+        ("last_name", "last_name", ""),
+        ("public_identifier", "public_identifier", ""),
+        ("profile_picture_url", "profile_picture_url", ""),
+        ("background_picture_url", "background_picture_url", ""),
+        
+        # Flags
+        ("is_creator", "is_creator", False),
+        ("is_influencer", "is_influencer", False),
+        ("is_premium", "is_premium", False),
+        ("open_to_work", "open_to_work", False),
+        ("show_follower_count", "show_follower_count", False),
+        
+        # Metadata
+        ("connections", "connection_count", 0),
+        ("followers", "follower_count", 0),
+        ("current_company", "current_company", ""),
+        ("current_company_urn", "current_company_urn", ""),
+        ("current_company_url", "current_company_url", ""),
+        ("email", "email", ""),
+        ("urn", "urn", ""),
+        ("created_timestamp", "created_timestamp", 0),
+    )
+    
     def __init__(self):
         """Initialize Apify client."""
         if not settings.apify_api_key:
             raise ValueError("APIFY_API_KEY not found in environment variables. Please add it to your .env file")
         
-        self.client = ApifyClient(settings.apify_api_key)
+        self.client = _get_apify_client(settings.apify_api_key)
+        
+        # Username -> (scraped_at, profile) for recently scraped profiles
+        self._profile_cache = OrderedDict()
+        self._profile_cache_lock = threading.Lock()
     
-    def scrape_profile(self, profile_url: str) -> Optional[Dict[str, Any]]:
+    def scrape_profile(self, profile_url: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
         """
         Scrape LinkedIn profile data.
         
         Args:
             profile_url: LinkedIn profile URL (e.g., https://www.linkedin.com/in/username)
+            force_refresh: Ignore any cached profile and run the actor again
             
         Returns:
             Dictionary containing profile data or None if failed
         """
-        try:
-            # Validate URL
-            if not self._is_valid_linkedin_url(profile_url):
-                raise ValueError("Invalid LinkedIn profile URL. Please use format: https://www.linkedin.com/in/username")
-            
-            # Extract username from LinkedIn URL
-            username = self._extract_username(profile_url)
-            
-            # Run the Apify actor 5fajYOBUfeb6fgKlB
-            run_input = {
-                "usernames": [username],
-                "includeEmail": False,
-            }
-            
-            print(f"Scraping LinkedIn profile: {username}")
-            
-            # Start the actor and wait for it to finish
-            run = self.client.actor("5fajYOBUfeb6fgKlB").call(run_input=run_input)
-            
-            # Check if the run was successful
-            if run.get('status') == 'FAILED':
-                error_msg = f"Actor run failed: {run.get('statusMessage', 'Unknown error')}"
-                raise Exception(error_msg)
+        # Validate URL and extract the username in one match
+        username = self._extract_username(profile_url)
+        if username is None:
+            raise ValueError(_INVALID_URL_MESSAGE)
+        
+        profile = self.scrape_profiles([profile_url], force_refresh).get(username.lower())
+        
+        if profile is None:
+            error_msg = "No data returned from Apify actor. Possible reasons:\n"
+            error_msg += "- The LinkedIn profile is private or restricted\n"
+            error_msg += "- The profile may not exist"
+            print(f"Error scraping profile: {error_msg}")
+            raise Exception(f"Failed to scrape profile: {error_msg}")
+        
+        return profile
+    
+    def scrape_profiles(self, profile_urls: List[str], force_refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Scrape several LinkedIn profiles with a single actor run.
+        
+        Args:
+            profile_urls: LinkedIn profile URLs
+            force_refresh: Ignore any cached profiles and run the actor again
             
-            # Fetch results from the dataset
-            items = list(self.client.dataset(run["defaultDatasetId"]).iterate_items())
+        Returns:
+            Dictionary mapping lowercased username to profile data; profiles the
+            actor returned nothing for are missing
+        """
+        try:
+            # Extract usernames from the URLs, dropping duplicates
+            usernames = {}
+            for profile_url in profile_urls:
+                username = self._extract_username(profile_url)
+                if username is None:
+                    raise ValueError(_INVALID_URL_MESSAGE)
+                usernames.setdefault(username.lower(), username)
             
-            if not items:
-                error_msg = "No data returned from Apify actor. Possible reasons:\n"
-                error_msg += "- The LinkedIn profile is private or restricted\n"
-                error_msg += "- The profile may not exist\n"
-                error_msg += f"- Check Apify dashboard for run ID: {run.get('id')}"
-                raise Exception(error_msg)
+            profiles = {}
             
-            # Get the profile data
-            raw_profile = items[0]
-            normalized_data = self._normalize_profile_data(raw_profile)
+            # Each actor run is slow and billed, so reuse recent scrapes
+            if not force_refresh:
+                for key, username in usernames.items():
+                    cached = self._get_cached_profile(username)
+                    if cached is not None:
+                        print(f"✓ Profile loaded from cache: {username}")
+                        profiles[key] = cached
             
-            print(f"✓ Profile loaded: {normalized_data.get('full_name')} ({len(normalized_data.get('skills', []))} skills)")
+            pending = [username for key, username in usernames.items() if key not in profiles]
+            if pending:
+                profiles.update(self._run_actor(pending))
             
-            return normalized_data
+            return profiles
             
         except ValueError as ve:
             # Validation errors
@@ -76,30 +200,125 @@ class LinkedInScraper:
             print(f"Error scraping profile: {str(e)}")
             raise Exception(f"Failed to scrape profile: {str(e)}")
     
-    def _extract_username(self, url: str) -> str:
+    def _run_actor(self, usernames: List[str]) -> Dict[str, Dict[str, Any]]:
         """
-        Extract username from LinkedIn profile URL.
+        Scrape profiles in one Apify actor run and cache them.
         
         Args:
-            url: LinkedIn profile URL
+            usernames: LinkedIn usernames
             
         Returns:
-            Username string
+            Dictionary mapping lowercased username to normalized profile data
         """
-        # Remove trailing slash if present
-        url = url.rstrip('/')
+        # Run the Apify actor 5fajYOBUfeb6fgKlB
+        run_input = {
+            "usernames": usernames,
+            "includeEmail": False,
+        }
+        
+        print(f"Scraping LinkedIn profiles: {', '.join(usernames)}")
+        
+        run = self._call_actor(run_input)
+        
+        # Stream results from the dataset and match them back to the usernames;
+        # the actor returns at most one item per username
+        profiles = {}
+        items = self.client.dataset(run["defaultDatasetId"]).iterate_items(limit=len(usernames))
+        for raw_profile in items:
+            normalized_data = self._normalize_profile_data(raw_profile)
+            # A lone profile belongs to the requested username even if the
+            # actor reports a different vanity name for it
+            if len(usernames) == 1:
+                identifier = usernames[0]
+            else:
+                identifier = normalized_data.get("public_identifier") or ""
+            if not identifier:
+                continue
+            
+            username = identifier.lower()
+            profiles[username] = normalized_data
+            self._cache_profile(username, normalized_data)
+            
+            print(f"✓ Profile loaded: {normalized_data.get('full_name')} ({len(normalized_data.get('skills', []))} skills)")
+            
+            if len(profiles) == len(usernames):
+                break
+        
+        if len(profiles) < len(usernames):
+            print(f"No data returned for some profiles; check Apify dashboard for run ID: {run.get('id')}")
+        
+        return profiles
+    
+    def _call_actor(self, run_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the actor and wait for it to finish, retrying failed runs.
         
-        # Extract username from URL
-        # Example: https://www.linkedin.com/in/username -> username
-        if "/in/" in url:
-            username = url.split("/in/")[-1].split("/")[0]
-            return username
+        Args:
+            run_input: Actor input
+            
+        Returns:
+            The finished run
+        """
+        for attempt in range(settings.scrape_max_retries):
+            try:
+                # Start the actor and wait for it to finish
+                run = self.client.actor("5fajYOBUfeb6fgKlB").call(run_input=run_input)
+                
+                # Check if the run was successful
+                if run.get('status') == 'FAILED':
+                    raise Exception(f"Actor run failed: {run.get('statusMessage', 'Unknown error')}")
+                
+                return run
+            except Exception as e:
+                if attempt + 1 >= settings.scrape_max_retries:
+                    raise
+                
+                # Back off with jitter so retries from concurrent sessions don't line up
+                delay = min(4.0, 0.25 * 2 ** attempt) + random.random() * 0.25
+                print(f"Actor run attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    def _get_cached_profile(self, username: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a cached profile that has not expired, if any."""
+        key = username.lower()
+        with self._profile_cache_lock:
+            entry = self._profile_cache.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] >= settings.profile_cache_ttl_seconds:
+                del self._profile_cache[key]
+                return None
+            self._profile_cache.move_to_end(key)
+        # Copy so callers editing the profile can't change later cache hits
+        return copy.deepcopy(entry[1])
+    
+    def _cache_profile(self, username: str, profile: Dict[str, Any]):
+        """Cache a scraped profile, without the raw actor output."""
+        compact = copy.deepcopy({key: value for key, value in profile.items() if key != "raw_data"})
+        
+        with self._profile_cache_lock:
+            self._profile_cache[username.lower()] = (time.time(), compact)
+            self._profile_cache.move_to_end(username.lower())
+            while len(self._profile_cache) > settings.profile_cache_size:
+                self._profile_cache.popitem(last=False)
+    
+    def _extract_username(self, url: str) -> Optional[str]:
+        """
+        Extract username from LinkedIn profile URL.
         
-        return url
+        Args:
+            url: LinkedIn profile URL
+            
+        Returns:
+            Username string (e.g. https://www.linkedin.com/in/username/?trk=x -> username),
+            or None if the URL is not a LinkedIn profile URL
+        """
+        match = _PROFILE_URL_RE.search(url)
+        return match.group(1) if match else None
     
     def _is_valid_linkedin_url(self, url: str) -> bool:
         """Validate if URL is a LinkedIn profile URL."""
-        return "linkedin.com/in/" in url.lower()
+        return _PROFILE_URL_RE.search(url) is not None
     
     def _normalize_profile_data(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -124,35 +343,15 @@ class LinkedInScraper:
         skills = []
         
         if isinstance(skills_raw, list):
-            for skill in skills_raw:
-                if isinstance(skill, dict):
-                    skill_name = skill.get("name", "")
-                    if skill_name:
-                        skills.append(skill_name)
-                elif isinstance(skill, str):
-                    skills.append(skill)
-        
-        return {
-            # Personal info - extracted from basic_info
-            "full_name": basic_info.get("fullname", ""),
-            "headline": basic_info.get("headline", ""),
-            "about": basic_info.get("about", ""),
+            names = (skill.get("name") if isinstance(skill, dict) else skill for skill in skills_raw)
+            skills = _unique_skill_names(name for name in names if name and isinstance(name, str))
+        
+        # Fields copied from basic_info as-is, then the ones computed above
+        # or taken from the top level
+        normalized = {key: basic_info.get(source, default) for key, source, default in self.BASIC_INFO_FIELDS}
+        normalized.update({
             "location": location,
-            "profile_url": basic_info.get("profile_url", "") or raw_data.get("profileUrl", ""),
-            
-            # Additional basic info
-            "first_name": basic_info.get("first_name", ""),
-            "last_name": basic_info.get("last_name", ""),
-            "public_identifier": basic_info.get("public_identifier", ""),
-            "profile_picture_url": basic_info.get("profile_picture_url", ""),
-            "background_picture_url": basic_info.get("background_picture_url", ""),
-            
-            # Flags
-            "is_creator": basic_info.get("is_creator", False),
-            "is_influencer": basic_info.get("is_influencer", False),
-            "is_premium": basic_info.get("is_premium", False),
-            "open_to_work": basic_info.get("open_to_work", False),
-            "show_follower_count": basic_info.get("show_follower_count", False),
+            "profile_url": normalized["profile_url"] or raw_data.get("profileUrl", ""),
             
             # Experience and education - from top level
             "experience": self._normalize_experience(raw_data.get("experience", [])),
@@ -167,55 +366,24 @@ class LinkedInScraper:
             # Recommendations
             "recommendations": raw_data.get("recommendations", {}),
             
-            # Metadata
-            "connections": basic_info.get("connection_count", 0),
-            "followers": basic_info.get("follower_count", 0),
-            "current_company": basic_info.get("current_company", ""),
-            "current_company_urn": basic_info.get("current_company_urn", ""),
-            "current_company_url": basic_info.get("current_company_url", ""),
-            "email": basic_info.get("email", ""),
-            "urn": basic_info.get("urn", ""),
-            "created_timestamp": basic_info.get("created_timestamp", 0),
-            
-            # Keep raw data for debugging
-            "raw_data": raw_data,
-            "basic_info": basic_info,
             "_raw_keys": list(raw_data.keys())
-        }
+        })
+        
+        # The raw actor output is the bulk of the profile and everything used
+        # from it is extracted above, so it is only kept when debugging
+        if settings.debug:
+            normalized["raw_data"] = raw_data
+        
+        return normalized
     
     def _normalize_experience(self, positions: list) -> list:
         """Normalize experience data from the new actor format."""
         normalized = []
         
         for pos in positions:
-            # Parse start date
-            start_date = ""
-            start_date_obj = pos.get("start_date", {})
-            if isinstance(start_date_obj, dict):
-                year = start_date_obj.get("year", "")
-                month = start_date_obj.get("month", "")
-                if year and month:
-                    start_date = f"{month} {year}"
-                elif year:
-                    start_date = str(year)
-            elif start_date_obj:
-                start_date = str(start_date_obj)
-            
-            # Parse end date
-            end_date = "Present"
             is_current = pos.get("is_current", False)
-            
-            if not is_current:
-                end_date_obj = pos.get("end_date", {})
-                if isinstance(end_date_obj, dict):
-                    year = end_date_obj.get("year", "")
-                    month = end_date_obj.get("month", "")
-                    if year and month:
-                        end_date = f"{month} {year}"
-                    elif year:
-                        end_date = str(year)
-                elif end_date_obj:
-                    end_date = str(end_date_obj)
+            start_date = _format_date(pos.get("start_date"))
+            end_date = "Present" if is_current else (_format_date(pos.get("end_date")) or "Present")
             
             normalized.append({
                 "title": pos.get("title", ""),
@@ -239,29 +407,6 @@ class LinkedInScraper:
         normalized = []
         
         for school in schools:
-            # Parse start and end dates
-            start_date_obj = school.get("start_date", {})
-            end_date_obj = school.get("end_date", {})
-            
-            start_date_str = ""
-            end_date_str = ""
-            
-            if isinstance(start_date_obj, dict):
-                year = start_date_obj.get("year", "")
-                month = start_date_obj.get("month", "")
-                if year and month:
-                    start_date_str = f"{month} {year}"
-                elif year:
-                    start_date_str = str(year)
-            
-            if isinstance(end_date_obj, dict):
-                year = end_date_obj.get("year", "")
-                month = end_date_obj.get("month", "")
-                if year and month:
-                    end_date_str = f"{month} {year}"
-                elif year:
-                    end_date_str = str(year)
-            
             normalized.append({
                 "school": school.get("school", ""),
                 "degree": school.get("degree", ""),
@@ -270,8 +415,8 @@ class LinkedInScraper:
                 "duration": school.get("duration", ""),
                 "description": school.get("description", ""),
                 "activities": school.get("activities", ""),
-                "start_date": start_date_str,
-                "end_date": end_date_str,
+                "start_date": _format_date(school.get("start_date")),
+                "end_date": _format_date(school.get("end_date")),
                 "school_linkedin_url": school.get("school_linkedin_url", ""),
                 "school_logo_url": school.get("school_logo_url", "")
             })
@@ -283,29 +428,9 @@ class LinkedInScraper:
         normalized = []
         
         for cert in certifications:
-            # Parse issued date - can be a string like "Jun 2024" or a dict
-            issue_date = cert.get("issue_date", "")
-            if not issue_date:
-                issue_date = cert.get("issued_date", "")
-            
-            # Handle if it's a dict
-            if isinstance(issue_date, dict):
-                year = issue_date.get("year", "")
-                month = issue_date.get("month", "")
-                if year and month:
-                    issue_date = f"{month} {year}"
-                elif year:
-                    issue_date = str(year)
-            
-            # Parse expiration date
-            expiration_date = cert.get("expiration_date", "")
-            if isinstance(expiration_date, dict):
-                year = expiration_date.get("year", "")
-                month = expiration_date.get("month", "")
-                if year and month:
-                    expiration_date = f"{month} {year}"
-                elif year:
-                    expiration_date = str(year)
+            # Issued date can be a string like "Jun 2024" or a dict
+            issue_date = _format_date(cert.get("issue_date") or cert.get("issued_date"))
+            expiration_date = _format_date(cert.get("expiration_date"))
             
             normalized.append({
                 "name": cert.get("name", ""),
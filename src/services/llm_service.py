@@ -1,9 +1,51 @@
 """LLM service for AI-powered analysis and generation."""
 
-from typing import Dict, Any, Optional, List
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterator, AsyncIterator
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage, SystemMessage, AIMessage
 from src.config.settings import settings
+from src.services.route_cache import SemanticRouteCache
+from src.services.router_model import LocalRouter
+from src.utils.helpers import shrink_text
+from src.utils.prompts import (
+    JOB_MATCH_PROMPT,
+    CONTENT_GENERATION_PROMPT,
+    CAREER_COUNSELING_PROMPT,
+    CONVERSATION_SUMMARY_PROMPT,
+    ROUTER_PROMPT
+)
+
+
+# Per-request callback receiving response tokens as they stream in. A context
+# variable keeps concurrent sessions sharing one service from seeing each
+# other's callbacks.
+_token_callback: ContextVar[Optional[Callable[[str], None]]] = ContextVar(
+    "token_callback", default=None
+)
+
+
+@lru_cache(maxsize=8)
+def _get_chat_model(model: str, api_key: str, temperature: float) -> ChatGoogleGenerativeAI:
+    """Get a process-wide Gemini client, so its HTTP/gRPC connections are reused."""
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=api_key,
+        temperature=temperature,
+        convert_system_message_to_human=True
+    )
+
+
+# Delimiter line opening each task's answer in a batched response
+_BATCH_DELIMITER_RE = re.compile(r"^===([A-Z0-9_]+)===[ \t]*$", re.MULTILINE)
 
 
 class LLMService:
@@ -22,24 +64,58 @@ class LLMService:
         self.temperature = settings.llm_temperature
         
         self.llm = self._initialize_llm()
+        
+        # Exact-match cache of responses to repeatable prompts, keyed by
+        # model, temperature and prompt
+        self._response_cache = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        # Cached responses are also kept on disk, so they survive restarts
+        self._response_store = self._open_response_store() if settings.llm_cache_persist else None
+        
+        # Routes for near-duplicate queries are reused without an LLM call
+        self.route_cache = SemanticRouteCache() if settings.router_semantic_cache else None
+        # Clear-cut queries are routed by a local classifier
+        self.local_router = LocalRouter() if settings.router_local_model else None
     
     def _initialize_llm(self):
         """Initialize the appropriate LLM based on provider."""
         if self.provider == "google":
-            return ChatGoogleGenerativeAI(
-                model=self.model,
-                google_api_key=settings.gemini_api_key,
-                temperature=self.temperature,
-                convert_system_message_to_human=True
-            )
+            return _get_chat_model(self.model, settings.gemini_api_key, self.temperature)
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider}. Use 'google' for Gemini.")
     
-    def generate_response(
+    def _build_messages(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
         conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> list:
+        """Build the LangChain message list for a prompt."""
+        messages = []
+        
+        # Add system message if provided
+        if system_prompt:
+            messages.append(SystemMessage(content=system_prompt))
+        
+        # Add conversation history if provided
+        if conversation_history:
+            for msg in conversation_history:
+                if msg["role"] == "user":
+                    messages.append(HumanMessage(content=msg["content"]))
+                elif msg["role"] == "assistant":
+                    messages.append(AIMessage(content=msg["content"]))
+        
+        # Add current prompt
+        messages.append(HumanMessage(content=prompt))
+        
+        return messages
+    
+    def generate_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        stream: bool = True
     ) -> str:
         """
         Generate a response from the LLM.
@@ -48,27 +124,21 @@ class LLMService:
             prompt: User prompt
             system_prompt: System instruction
             conversation_history: Previous conversation messages
+            stream: Forward tokens to the active token callback, if any
             
         Returns:
             Generated response string
         """
         try:
-            messages = []
-            
-            # Add system message if provided
-            if system_prompt:
-                messages.append(SystemMessage(content=system_prompt))
-            
-            # Add conversation history if provided
-            if conversation_history:
-                for msg in conversation_history:
-                    if msg["role"] == "user":
-                        messages.append(HumanMessage(content=msg["content"]))
-                    elif msg["role"] == "assistant":
-                        messages.append(AIMessage(content=msg["content"]))
+            token_callback = _token_callback.get()
+            if stream and token_callback:
+                chunks = []
+                for chunk in self.stream_response(prompt, system_prompt, conversation_history):
+                    chunks.append(chunk)
+                    token_callback(chunk)
+                return "".join(chunks)
             
-            # Add current prompt
-            messages.append(HumanMessage(content=prompt))
+            messages = self._build_messages(prompt, system_prompt, conversation_history)
             
             # Generate response
             response = self.llm.invoke(messages)
@@ -79,17 +149,215 @@ class LLMService:
             print(f"Error generating LLM response: {e}")
             return f"Error: {str(e)}"
     
-    def analyze_profile(self, profile_data: str, query: str, previous_analysis: str = "") -> str:
-        """Analyze LinkedIn profile."""
-        from src.utils.prompts import PROFILE_ANALYSIS_PROMPT
+    async def agenerate_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """
+        Generate a response from the LLM without blocking the event loop.
         
-        prompt = PROFILE_ANALYSIS_PROMPT.format(
-            profile_data=profile_data,
-            previous_analysis=previous_analysis,
-            query=query
-        )
+        Args:
+            prompt: User prompt
+            system_prompt: System instruction
+            conversation_history: Previous conversation messages
+            
+        Returns:
+            Generated response string
+        """
+        try:
+            messages = self._build_messages(prompt, system_prompt, conversation_history)
+            response = await self.llm.ainvoke(messages)
+            return response.content
+            
+        except Exception as e:
+            print(f"Error generating LLM response: {e}")
+            return f"Error: {str(e)}"
+    
+    @contextmanager
+    def streaming_to(self, callback: Callable[[str], None]):
+        """
+        Stream response tokens to a callback for the duration of the block.
         
-        return self.generate_response(prompt)
+        Args:
+            callback: Function called with each response chunk
+        """
+        token = _token_callback.set(callback)
+        try:
+            yield
+        finally:
+            _token_callback.reset(token)
+    
+    def emit_progress(self, text: str):
+        """
+        Forward text to the active token callback, if any.
+        
+        Lets callers stream partial results that are not produced token by
+        token (e.g. finished sections, or a cached response).
+        
+        Args:
+            text: Text to show
+        """
+        token_callback = _token_callback.get()
+        if token_callback:
+            token_callback(text)
+    
+    def stream_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> Iterator[str]:
+        """
+        Stream a response from the LLM chunk by chunk.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System instruction
+            conversation_history: Previous conversation messages
+            
+        Yields:
+            Response text chunks as they arrive
+        """
+        messages = self._build_messages(prompt, system_prompt, conversation_history)
+        
+        for chunk in self.llm.stream(messages):
+            if chunk.content:
+                yield chunk.content
+    
+    async def astream_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from the LLM chunk by chunk without blocking the event loop.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System instruction
+            conversation_history: Previous conversation messages
+            
+        Yields:
+            Response text chunks as they arrive
+        """
+        messages = self._build_messages(prompt, system_prompt, conversation_history)
+        
+        async for chunk in self.llm.astream(messages):
+            if chunk.content:
+                yield chunk.content
+    
+    def generate_cached_response(self, prompt: str, stream: bool = True) -> str:
+        """
+        Generate a response, reusing an earlier response to the identical prompt.
+        
+        Args:
+            prompt: User prompt
+            stream: Forward tokens (or the cached response) to the active token callback
+            
+        Returns:
+            Generated response string
+        """
+        key = hashlib.blake2b(
+            f"{self.model}|{self.temperature}|{prompt}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+        
+        with self._response_cache_lock:
+            entry = self._response_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] > settings.llm_cache_ttl_seconds:
+                del self._response_cache[key]
+                entry = None
+            if entry is not None:
+                self._response_cache.move_to_end(key)
+        
+            if entry is None and self._response_store is not None:
+                entry = self._load_stored_response(key)
+                if entry is not None:
+                    self._remember_response(key, *entry)
+        
+        if entry is not None:
+            response = entry[1]
+            if stream:
+                self.emit_progress(response)
+            return response
+        
+        response = self.generate_response(prompt, stream=stream)
+        
+        # Errors are retried on the next call rather than cached
+        if not response.startswith("Error:"):
+            with self._response_cache_lock:
+                self._remember_response(key, time.monotonic(), response)
+                if self._response_store is not None:
+                    self._store_response(key, response)
+        
+        return response
+    
+    def _remember_response(self, key: str, cached_at: float, response: str):
+        """Add a response to the in-memory cache (caller holds the lock)."""
+        self._response_cache[key] = (cached_at, response)
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > settings.llm_cache_size:
+            self._response_cache.popitem(last=False)
+    
+    def _open_response_store(self) -> Optional[sqlite3.Connection]:
+        """Open the on-disk response cache, dropping expired entries."""
+        try:
+            settings.data_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                settings.data_dir / "llm_cache.db",
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, created_at REAL NOT NULL, response TEXT NOT NULL)"
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - settings.llm_cache_ttl_seconds,)
+            )
+            return conn
+        except Exception as e:
+            print(f"LLM response cache will not be persisted: {e}")
+            return None
+    
+    def _load_stored_response(self, key: str) -> Optional[Tuple[float, str]]:
+        """
+        Look up a response in the on-disk cache (caller holds the lock).
+        
+        Returns:
+            (monotonic time the response was cached, response), or None
+        """
+        try:
+            row = self._response_store.execute(
+                "SELECT created_at, response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        except Exception as e:
+            print(f"Error reading LLM response cache: {e}")
+            return None
+        
+        if row is None:
+            return None
+        
+        age = time.time() - row[0]
+        if age > settings.llm_cache_ttl_seconds:
+            return None
+        
+        return time.monotonic() - age, row[1]
+    
+    def _store_response(self, key: str, response: str):
+        """Write a response to the on-disk cache (caller holds the lock)."""
+        try:
+            self._response_store.execute(
+                "INSERT OR REPLACE INTO responses (key, created_at, response) VALUES (?, ?, ?)",
+                (key, time.time(), response)
+            )
+        except Exception as e:
+            print(f"Error writing LLM response cache: {e}")
     
     def match_job(
         self,
@@ -98,17 +366,51 @@ class LLMService:
         job_title: str
     ) -> str:
         """Match profile with job description."""
-        from src.utils.prompts import JOB_MATCH_PROMPT
-        
         prompt = JOB_MATCH_PROMPT.format(
             profile_data=profile_data,
             job_description=job_description,
             job_title=job_title
         )
         
-        return self.generate_response(prompt)
+        # The analysis is JSON, rendered once parsed, so it is not streamed
+        return self.generate_response(prompt, stream=False)
     
-    def generate_content(
+    def batch_analyze(self, prompts: Dict[str, str]) -> Dict[str, str]:
+        """
+        Run several independent tasks in a single LLM call.
+        
+        Args:
+            prompts: Task prompts keyed by label (uppercase letters, digits, underscores)
+            
+        Returns:
+            Response text keyed by label; tasks missing from the response are omitted
+        """
+        parts = [
+            "Complete each of the following independent tasks in order.",
+            "Begin the answer to each task with its delimiter line, exactly as shown, "
+            "and write nothing before the first delimiter.",
+            "",
+        ]
+        for label, prompt in prompts.items():
+            parts.extend([f"TASK {label} (answer after the line ==={label}===):", prompt.strip(), ""])
+        
+        # Batched output interleaves tasks, so it is never streamed to the UI
+        response = self.generate_response("\n".join(parts), stream=False)
+        
+        delimiters = list(_BATCH_DELIMITER_RE.finditer(response))
+        results = {}
+        for i, match in enumerate(delimiters):
+            label = match.group(1)
+            if label not in prompts:
+                continue
+            end = delimiters[i + 1].start() if i + 1 < len(delimiters) else len(response)
+            answer = response[match.end():end].strip()
+            if answer:
+                results[label] = answer
+        
+        return results
+    
+    def _build_content_prompt(
         self,
         section_name: str,
         current_content: str,
@@ -116,18 +418,46 @@ class LLMService:
         job_description: str,
         query: str
     ) -> str:
-        """Generate improved content for profile section."""
-        from src.utils.prompts import CONTENT_GENERATION_PROMPT
-        
-        prompt = CONTENT_GENERATION_PROMPT.format(
+        """Build the content generation prompt for a profile section."""
+        return CONTENT_GENERATION_PROMPT.format(
             section_name=section_name,
             current_content=current_content,
             target_role=target_role,
             job_description=job_description,
             query=query
         )
+    
+    def generate_content(
+        self,
+        section_name: str,
+        current_content: str,
+        target_role: str,
+        job_description: str,
+        query: str
+    ) -> str:
+        """Generate improved content for profile section."""
+        prompt = self._build_content_prompt(
+            section_name, current_content, target_role, job_description, query
+        )
         
-        return self.generate_response(prompt)
+        # The rewrite is JSON, rendered once parsed, so it is not streamed
+        return self.generate_response(prompt, stream=False)
+    
+    async def astream_content(
+        self,
+        section_name: str,
+        current_content: str,
+        target_role: str,
+        job_description: str,
+        query: str
+    ) -> AsyncIterator[str]:
+        """Stream improved content for profile section chunk by chunk."""
+        prompt = self._build_content_prompt(
+            section_name, current_content, target_role, job_description, query
+        )
+        
+        async for chunk in self.astream_response(prompt):
+            yield chunk
     
     def provide_career_counseling(
         self,
@@ -137,8 +467,6 @@ class LLMService:
         query: str
     ) -> str:
         """Provide career counseling and guidance."""
-        from src.utils.prompts import CAREER_COUNSELING_PROMPT
-        
         prompt = CAREER_COUNSELING_PROMPT.format(
             profile_data=profile_data,
             career_goals=career_goals,
@@ -148,25 +476,109 @@ class LLMService:
         
         return self.generate_response(prompt)
     
+    def summarize_conversation(
+        self,
+        messages: List[Dict[str, str]],
+        previous_summary: str = ""
+    ) -> str:
+        """Fold conversation messages into a short rolling summary."""
+        # Assistant replies can be whole analyses; their head and tail are enough
+        prompt = CONVERSATION_SUMMARY_PROMPT.format(
+            previous_summary=previous_summary or "None",
+            messages="\n".join(
+                f"{msg['role']}: {shrink_text(msg['content'], 800)}" for msg in messages
+            )
+        )
+        
+        # Summaries are internal context, so never stream them to the user
+        return self.generate_response(prompt, stream=False)
+    
     def route_query(self, query: str, context: str) -> str:
         """Determine which agent should handle the query."""
-        from src.utils.prompts import ROUTER_PROMPT
+        return self._route_locally(query) or self._route_with_llm(query, context)
+    
+    def route_queries(
+        self,
+        requests: List[Tuple[str, str]],
+        route_locally: bool = True
+    ) -> List[str]:
+        """
+        Route several queries with a single LLM call.
+        
+        Args:
+            requests: (query, context) pairs
+            route_locally: Try the semantic cache and local classifier first
+                (False when the caller already has)
+            
+        Returns:
+            Agent name for each request, in order
+        """
+        if len(requests) == 1:
+            if route_locally:
+                return [self.route_query(*requests[0])]
+            return [self._route_with_llm(*requests[0])]
+        
+        agents = [None] * len(requests)
+        prompts = {}
+        for i, (query, context) in enumerate(requests):
+            if route_locally:
+                agents[i] = self._route_locally(query)
+            if not agents[i]:
+                prompts[f"Q{i}"] = self._build_route_prompt(query, context)
         
-        prompt = ROUTER_PROMPT.format(query=query, context=context)
+        responses = self.batch_analyze(prompts) if prompts else {}
+        for label in prompts:
+            i = int(label[1:])
+            if label in responses:
+                agents[i] = self._record_route(requests[i][0], responses[label])
+            else:
+                # Answer missing from the batched response; route it on its own
+                agents[i] = self._route_with_llm(*requests[i])
         
-        response = self.generate_response(prompt)
+        return agents
+    
+    def _route_with_llm(self, query: str, context: str) -> str:
+        """Route a query with its own LLM call."""
+        # Routing output is internal, so never stream it to the user
+        response = self.generate_cached_response(
+            self._build_route_prompt(query, context), stream=False
+        )
+        return self._record_route(query, response)
+    
+    def _route_locally(self, query: str) -> Optional[str]:
+        """Route a query from the semantic cache or the local classifier, if either is confident."""
+        if self.route_cache is not None:
+            cached_agent = self.route_cache.lookup(query)
+            if cached_agent:
+                return cached_agent
         
-        # Extract agent name from response
+        if self.local_router is not None:
+            return self.local_router.predict(query)
+        
+        return None
+    
+    def _build_route_prompt(self, query: str, context: str) -> str:
+        """Build the routing prompt for a query."""
+        return ROUTER_PROMPT.format(query=query, context=context)
+    
+    def _record_route(self, query: str, response: str) -> str:
+        """Extract the agent name from a routing response and cache the decision."""
         response_lower = response.lower().strip()
         
         if "profile_analyzer" in response_lower:
-            return "profile_analyzer"
+            agent = "profile_analyzer"
         elif "job_matcher" in response_lower:
-            return "job_matcher"
+            agent = "job_matcher"
         elif "content_generator" in response_lower:
-            return "content_generator"
+            agent = "content_generator"
         elif "career_counselor" in response_lower:
-            return "career_counselor"
+            agent = "career_counselor"
         else:
             # Default to career counselor for general queries
-            return "career_counselor"
\ No newline at end of file
+            agent = "career_counselor"
+        
+        # Only cache decisions the LLM actually made
+        if self.route_cache is not None and not response.startswith("Error:"):
+            self.route_cache.add(query, agent)
+        
+        return agent
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""Micro-batching of routing requests from concurrent sessions."""
+
+import threading
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+from src.config.settings import settings
+from src.services.llm_service import LLMService
+
+
+class BatchingRouter:
+    """Collect routing requests arriving close together and route them in one LLM call."""
+    
+    def __init__(
+        self,
+        llm_service: LLMService,
+        max_batch: Optional[int] = None,
+        max_wait_seconds: Optional[float] = None
+    ):
+        """
+        Initialize the router.
+        
+        Args:
+            llm_service: LLM service instance
+            max_batch: Maximum number of queries routed per LLM call
+            max_wait_seconds: How long the first query of a batch waits for others
+        """
+        self.llm = llm_service
+        self.max_batch = max_batch or settings.router_batch_size
+        self.max_wait_seconds = (
+            max_wait_seconds if max_wait_seconds is not None
+            else settings.router_batch_wait_ms / 1000
+        )
+        
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, str, Future]] = []
+        self._timer: Optional[threading.Timer] = None
+    
+    def route(self, query: str, context: str) -> str:
+        """
+        Determine which agent should handle the query.
+        
+        Queries the semantic cache or local classifier can route are answered
+        at once; only those needing the LLM wait for a batch.
+        
+        Args:
+            query: User query
+            context: Session context summary
+            
+        Returns:
+            Agent name
+        """
+        if self.max_batch <= 1:
+            return self.llm.route_query(query, context)
+        
+        local_agent = self.llm._route_locally(query)
+        if local_agent:
+            return local_agent
+        
+        future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((query, context, future))
+            if len(self._pending) >= self.max_batch:
+                batch = self._take_batch()
+            elif len(self._pending) == 1:
+                self._timer = threading.Timer(self.max_wait_seconds, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        
+        # A full batch is routed on the thread that filled it
+        if batch:
+            self._dispatch(batch)
+        
+        return future.result()
+    
+    def _flush(self):
+        """Route whatever is pending once the wait window closes."""
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._dispatch(batch)
+    
+    def _take_batch(self) -> List[Tuple[str, str, Future]]:
+        """Detach the pending batch (caller holds the lock)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        return batch
+    
+    def _dispatch(self, batch: List[Tuple[str, str, Future]]):
+        """Route a batch and resolve its futures."""
+        try:
+            agents = self.llm.route_queries(
+                [(query, context) for query, context, _ in batch], route_locally=False
+            )
+        except Exception as e:
+            print(f"Error routing batch: {e}")
+            agents = ["career_counselor"] * len(batch)
+        
+        for (_, _, future), agent in zip(batch, agents):
+            future.set_result(agent)
@@ -0,0 +1,171 @@
+"""Semantic cache of routing decisions for near-duplicate queries."""
+
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from src.config.settings import settings
+
+
+# Replies whose meaning depends on the conversation so far ("yes", "do that for experience")
+_FOLLOW_UP_RE = re.compile(
+    r"^(yes|yeah|yep|no|nope|ok|okay|sure|please|thanks|and|also|then|same|"
+    r"do (that|it|this)|that|this|it|what about|how about)\b",
+    re.IGNORECASE
+)
+
+
+class SemanticRouteCache:
+    """Cache mapping query embeddings to the agent the router chose for them."""
+    
+    # Shorter queries and follow-ups are routed by the LLM with their context
+    MIN_QUERY_WORDS = 3
+    # Routes added within this window are persisted together, off the request path
+    SAVE_DELAY_SECONDS = 5.0
+    
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        cache_path: Optional[Path] = None
+    ):
+        """
+        Initialize the cache and start loading the embedding model in the background.
+        
+        Args:
+            model_name: Sentence-transformers model used to embed queries
+            threshold: Minimum cosine similarity for a cached route to be reused
+            max_entries: Maximum number of cached routes (oldest dropped first)
+            cache_path: File the cache is persisted to
+        """
+        self.model_name = model_name or settings.router_embedding_model
+        self.threshold = threshold if threshold is not None else settings.router_cache_threshold
+        self.max_entries = max_entries or settings.router_cache_size
+        self.cache_path = cache_path or settings.data_dir / "router_cache.npz"
+        
+        self._model = None
+        self._lock = threading.Lock()
+        self._embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._agents = []
+        self._save_scheduled = False
+        self._load()
+        
+        # The model takes seconds to load; until it is ready every lookup
+        # misses and routing falls through to the LLM
+        threading.Thread(target=self._load_model, daemon=True).start()
+    
+    def lookup(self, query: str) -> Optional[str]:
+        """
+        Find the agent chosen for the most similar cached query.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            Agent name, or None if no cached query is similar enough
+        """
+        if not self._is_cacheable(query):
+            return None
+        
+        embedding = self._embed(query)
+        if embedding is None:
+            return None
+        
+        with self._lock:
+            if not self._agents or self._embeddings.shape[1] != embedding.shape[0]:
+                return None
+            
+            # Embeddings are normalized, so the dot product is the cosine similarity
+            similarities = self._embeddings @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return self._agents[best]
+        
+        return None
+    
+    def add(self, query: str, agent: str):
+        """
+        Cache the agent chosen for a query and schedule the cache to be persisted.
+        
+        Only the query embedding is kept, not the query text.
+        
+        Args:
+            query: User query
+            agent: Agent the router chose
+        """
+        if not self._is_cacheable(query):
+            return
+        
+        embedding = self._embed(query)
+        if embedding is None:
+            return
+        
+        with self._lock:
+            if self._embeddings.shape[1] != embedding.shape[0]:
+                # Empty cache, or one persisted with a different model
+                self._embeddings = np.zeros((0, embedding.shape[0]), dtype=np.float32)
+                self._agents = []
+            
+            self._embeddings = np.vstack([self._embeddings, embedding])[-self.max_entries:]
+            self._agents = (self._agents + [agent])[-self.max_entries:]
+            
+            if not self._save_scheduled:
+                self._save_scheduled = True
+                timer = threading.Timer(self.SAVE_DELAY_SECONDS, self._save)
+                timer.daemon = True
+                timer.start()
+    
+    def _is_cacheable(self, query: str) -> bool:
+        """Whether a query's route is independent of the conversation context."""
+        query = query.strip()
+        return len(query.split()) >= self.MIN_QUERY_WORDS and not _FOLLOW_UP_RE.match(query)
+    
+    def _load_model(self):
+        """Load the embedding model (run on a background thread)."""
+        try:
+            from sentence_transformers import SentenceTransformer
+            
+            self._model = SentenceTransformer(self.model_name)
+        except Exception as e:
+            print(f"Semantic route cache disabled: {e}")
+    
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        """Embed a normalized query, or return None while the model is unavailable."""
+        if self._model is None:
+            return None
+        
+        try:
+            embedding = self._model.encode(
+                query.strip().lower(), normalize_embeddings=True
+            )
+            return np.asarray(embedding, dtype=np.float32)
+        except Exception as e:
+            print(f"Error embedding query: {e}")
+            return None
+    
+    def _load(self):
+        """Load a persisted cache, if any."""
+        if not self.cache_path.exists():
+            return
+        
+        try:
+            with np.load(self.cache_path) as data:
+                self._embeddings = data["embeddings"].astype(np.float32)
+                self._agents = data["agents"].tolist()
+        except Exception as e:
+            print(f"Error loading route cache: {e}")
+    
+    def _save(self):
+        """Persist the cache (run on a timer thread)."""
+        with self._lock:
+            self._save_scheduled = False
+            embeddings = self._embeddings
+            agents = np.array(self._agents)
+        
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(self.cache_path, embeddings=embeddings, agents=agents)
+        except Exception as e:
+            print(f"Error saving route cache: {e}")
@@ -0,0 +1,123 @@
+"""Local text classifier that routes clear-cut queries without an LLM call."""
+
+import threading
+from typing import Optional
+from src.config.settings import settings
+
+
+# Labelled queries the classifier is trained on, following ROUTER_PROMPT
+_TRAINING_QUERIES = (
+    ("Analyze my profile", "profile_analyzer"),
+    ("Analyze my LinkedIn profile", "profile_analyzer"),
+    ("Review my profile", "profile_analyzer"),
+    ("Review my entire profile", "profile_analyzer"),
+    ("Can you review my LinkedIn profile?", "profile_analyzer"),
+    ("Check my profile completeness", "profile_analyzer"),
+    ("How complete is my profile?", "profile_analyzer"),
+    ("Give me a full analysis of my profile", "profile_analyzer"),
+    ("Audit my profile", "profile_analyzer"),
+    ("Score my profile", "profile_analyzer"),
+    ("Does this job match my profile?", "job_matcher"),
+    ("Am I a good fit for this job?", "job_matcher"),
+    ("Analyze my fit for this role", "job_matcher"),
+    ("Compare my profile with this job description", "job_matcher"),
+    ("What is my match score for this position?", "job_matcher"),
+    ("How well do I match the job description?", "job_matcher"),
+    ("Check my job fit", "job_matcher"),
+    ("Which requirements of this job am I missing?", "job_matcher"),
+    ("Am I qualified for this job?", "job_matcher"),
+    ("Calculate my match for the target role", "job_matcher"),
+    ("Rewrite my headline", "content_generator"),
+    ("Write a new headline for me", "content_generator"),
+    ("Rewrite my about section", "content_generator"),
+    ("Write my about section", "content_generator"),
+    ("Generate a summary for my profile", "content_generator"),
+    ("Rewrite my experience descriptions", "content_generator"),
+    ("Improve the wording of my experience section", "content_generator"),
+    ("Draft a better headline", "content_generator"),
+    ("Create a LinkedIn summary for me", "content_generator"),
+    ("Make my about section more engaging", "content_generator"),
+    ("How can I improve?", "career_counselor"),
+    ("What skills should I learn?", "career_counselor"),
+    ("Tell me about my profile", "career_counselor"),
+    ("Give me career advice", "career_counselor"),
+    ("What career path should I take?", "career_counselor"),
+    ("How do I switch careers into data science?", "career_counselor"),
+    ("What are the trends in my industry?", "career_counselor"),
+    ("Suggest a learning path for me", "career_counselor"),
+    ("Which certifications are worth getting?", "career_counselor"),
+    ("How do I prepare for interviews?", "career_counselor"),
+    ("Should I ask for a promotion?", "career_counselor"),
+    ("How is the job market right now?", "career_counselor"),
+    ("What jobs should I apply for?", "career_counselor"),
+    ("How can I improve my profile?", "career_counselor"),
+    ("Hello", "career_counselor"),
+    ("Thanks!", "career_counselor"),
+)
+
+
+class LocalRouter:
+    """TF-IDF + linear SVM classifier over the agent names."""
+    
+    def __init__(self, min_margin: Optional[float] = None):
+        """
+        Initialize the router; the model is trained on first use.
+        
+        Args:
+            min_margin: Minimum gap between the best and second-best class
+                scores for a prediction to be trusted
+        """
+        self.min_margin = min_margin if min_margin is not None else settings.router_local_min_margin
+        
+        self._model = None
+        self._lock = threading.Lock()
+    
+    def predict(self, query: str) -> Optional[str]:
+        """
+        Classify a query.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            Agent name, or None if the classifier is not confident enough
+        """
+        model = self._get_model()
+        if model is None:
+            return None
+        
+        try:
+            scores = model.decision_function([query.strip().lower()])[0]
+        except Exception as e:
+            print(f"Error classifying query: {e}")
+            return None
+        
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        if scores[ranked[0]] - scores[ranked[1]] < self.min_margin:
+            return None
+        
+        return str(model.classes_[ranked[0]])
+    
+    def _get_model(self):
+        """Train the classifier once (a few milliseconds on the built-in examples)."""
+        with self._lock:
+            if self._model is None:
+                try:
+                    from sklearn.feature_extraction.text import TfidfVectorizer
+                    from sklearn.pipeline import Pipeline
+                    from sklearn.svm import LinearSVC
+                    
+                    model = Pipeline([
+                        ("tfidf", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)),
+                        ("svm", LinearSVC()),
+                    ])
+                    model.fit(
+                        [query.lower() for query, _ in _TRAINING_QUERIES],
+                        [agent for _, agent in _TRAINING_QUERIES]
+                    )
+                    self._model = model
+                except Exception as e:
+                    print(f"Local router disabled: {e}")
+                    self._model = False
+            
+            return self._model or None
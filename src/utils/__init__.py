@@ -10,6 +10,7 @@ from .prompts import (
 from .helpers import (
     calculate_profile_completeness,
     calculate_match_score,
+    calculate_match_scores,
     extract_keywords,
     format_profile_data,
     sanitize_text
@@ -23,6 +24,7 @@ __all__ = [
     "ROUTER_PROMPT",
     "calculate_profile_completeness",
     "calculate_match_score",
+    "calculate_match_scores",
     "extract_keywords",
     "format_profile_data",
     "sanitize_text"
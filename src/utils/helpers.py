@@ -1,13 +1,26 @@
 """Helper functions for data processing and analysis."""
 
+import math
+import os
 import re
+import secrets
+from pathlib import Path
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime
 import json
+from bisect import bisect_right
 from collections import Counter
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from functools import lru_cache
 import numpy as np
+from src.config.settings import settings
+
+
+# Patterns used by sanitize_text and parse_experience_duration
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s.,!?-]')
+_YEARS_RE = re.compile(r'(\d+)\s*(?:year|yr)', re.IGNORECASE)
+_MONTHS_RE = re.compile(r'(\d+)\s*(?:month|mo)', re.IGNORECASE)
+# scikit-learn's default token pattern, for the vectorizer-free match score
+_TOKEN_RE = re.compile(r'(?u)\b\w\w+\b')
 
 
 def extract_message_content(message: Union[object, Dict[str, Any]]) -> str:
@@ -36,33 +49,54 @@ def sanitize_text(text: str) -> str:
     if not text:
         return ""
     
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
-    # Remove special characters but keep basic punctuation
-    text = re.sub(r'[^\w\s.,!?-]', '', text)
+    # Collapse whitespace with split/join (one C-level pass, no regex), then
+    # remove special characters but keep basic punctuation
+    text = _SPECIAL_CHARS_RE.sub('', ' '.join(text.split()))
     return text.strip()
 
 
+def shrink_text(text: str, max_chars: int) -> str:
+    """
+    Cap text length by keeping its head and tail and dropping the middle.
+    
+    Args:
+        text: Text to shrink
+        max_chars: Maximum number of characters to keep
+        
+    Returns:
+        Original text if within budget, otherwise head + marker + tail
+    """
+    if not text or len(text) <= max_chars:
+        return text
+    
+    head_chars = max_chars * 2 // 3
+    tail_chars = max_chars - head_chars
+    return f"{text[:head_chars].rstrip()}\n[...]\n{text[-tail_chars:].lstrip()}"
+
+
+# Profile sections scored for completeness, with their weights (sum to 100)
+_COMPLETENESS_SECTIONS = (
+    ("about", 15),
+    ("headline", 10),
+    ("experience", 30),
+    ("education", 15),
+    ("skills", 20),
+    ("certifications", 10),
+)
+
+
 def calculate_profile_completeness(profile_data: Dict[str, Any]) -> Dict[str, Any]:
     """Calculate profile completeness score and identify missing sections."""
     
-    required_sections = {
-        "about": 15,
-        "headline": 10,
-        "experience": 30,
-        "education": 15,
-        "skills": 20,
-        "certifications": 10
-    }
-    
     score = 0
     missing_sections = []
     weak_sections = []
     
-    for section, weight in required_sections.items():
-        section_data = profile_data.get(section, "")
+    for section, weight in _COMPLETENESS_SECTIONS:
+        section_data = profile_data.get(section)
         
-        if not section_data or (isinstance(section_data, list) and len(section_data) == 0):
+        # Covers missing keys, None, empty strings and empty lists
+        if not section_data:
             missing_sections.append(section)
         elif isinstance(section_data, str) and len(section_data) < 50:
             weak_sections.append(section)
@@ -81,80 +115,190 @@ def calculate_profile_completeness(profile_data: Dict[str, Any]) -> Dict[str, An
     }
 
 
+# Lowest score for each grade above F, and the grades they start
+_GRADE_THRESHOLDS = (60, 70, 80, 90)
+_GRADES = ("F", "D", "C", "B", "A")
+
+
 def get_grade(score: float) -> str:
     """Convert numerical score to letter grade."""
-    if score >= 90:
-        return "A"
-    elif score >= 80:
-        return "B"
-    elif score >= 70:
-        return "C"
-    elif score >= 60:
-        return "D"
-    else:
-        return "F"
+    return _GRADES[bisect_right(_GRADE_THRESHOLDS, score)]
 
 
 def calculate_match_score(profile_text: str, job_description: str) -> Dict[str, Any]:
-    """Calculate semantic similarity between profile and job description."""
+    """
+    Calculate semantic similarity between profile and job description.
+    
+    Computes the TF-IDF cosine similarity of the two documents the way
+    scikit-learn's TfidfVectorizer does (English stop words, 500 features),
+    directly from term counts: with two documents a term's IDF only depends
+    on whether the other document has it, so no vocabulary or sparse matrix
+    is needed. Beyond 500 distinct terms, ties at the feature cutoff are
+    broken alphabetically, so the score can differ slightly from the
+    vectorizer's, which breaks them arbitrarily.
+    """
     
     if not profile_text or not job_description:
         return {"score": 0, "confidence": "low"}
     
     try:
-        # Use TF-IDF vectorization
-        vectorizer = TfidfVectorizer(stop_words='english', max_features=500)
-        vectors = vectorizer.fit_transform([profile_text, job_description])
-        
-        # Calculate cosine similarity
-        similarity = cosine_similarity(vectors[0:1], vectors[1:2])[0][0]
-        
-        # Convert to percentage
-        score = round(similarity * 100, 2)
-        
-        # Determine confidence
-        if score >= 70:
-            confidence = "high"
-        elif score >= 50:
-            confidence = "medium"
-        else:
-            confidence = "low"
-        
-        return {
-            "score": score,
-            "confidence": confidence,
-            "similarity_matrix": similarity
-        }
+        return _match_score_from_counts(_count_terms(profile_text), _count_terms(job_description))
     except Exception as e:
         print(f"Error calculating match score: {e}")
         return {"score": 0, "confidence": "error", "error": str(e)}
 
 
-def extract_keywords(text: str, top_n: int = 20) -> List[str]:
-    """Extract top keywords from text using TF-IDF."""
+def calculate_match_scores(profile_text: str, job_descriptions: List[str]) -> List[Dict[str, Any]]:
+    """
+    Score one profile against several job descriptions.
+    
+    Each score equals calculate_match_score(profile_text, job_description);
+    the profile is tokenized once for all of them.
+    
+    Args:
+        profile_text: Profile text
+        job_descriptions: Job descriptions to score against
+        
+    Returns:
+        Match score dictionary for each job description, in order
+    """
+    if not profile_text:
+        return [{"score": 0, "confidence": "low"} for _ in job_descriptions]
+    
+    try:
+        profile_counts = _count_terms(profile_text)
+    except Exception as e:
+        print(f"Error calculating match score: {e}")
+        return [{"score": 0, "confidence": "error", "error": str(e)} for _ in job_descriptions]
+    
+    scores = []
+    for job_description in job_descriptions:
+        if not job_description:
+            scores.append({"score": 0, "confidence": "low"})
+            continue
+        try:
+            scores.append(_match_score_from_counts(profile_counts, _count_terms(job_description)))
+        except Exception as e:
+            print(f"Error calculating match score: {e}")
+            scores.append({"score": 0, "confidence": "error", "error": str(e)})
+    return scores
+
+
+def _count_terms(text: str) -> Counter:
+    """Count a text's terms as TfidfVectorizer(stop_words='english') tokenizes them."""
+    # scikit-learn is imported on first use to keep it out of app cold start
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    
+    return Counter(token for token in _TOKEN_RE.findall(text.lower()) if token not in ENGLISH_STOP_WORDS)
+
+
+def _match_score_from_counts(profile_counts: Counter, job_counts: Counter) -> Dict[str, Any]:
+    """Build a match score dictionary from the two documents' term counts."""
+    # Keep the 500 most frequent terms overall, like max_features; ties are
+    # broken alphabetically so the score is deterministic
+    totals = profile_counts + job_counts
+    if len(totals) > 500:
+        vocabulary = set(sorted(totals, key=lambda term: (-totals[term], term))[:500])
+    else:
+        vocabulary = totals.keys()
+    
+    # Smoothed IDF: ln(3/2) + 1 for terms in one document, 1 for terms in both
+    unique_idf = math.log(1.5) + 1
+    dot = 0.0
+    profile_norm = 0.0
+    job_norm = 0.0
+    for term in vocabulary:
+        profile_count = profile_counts.get(term, 0)
+        job_count = job_counts.get(term, 0)
+        if profile_count and job_count:
+            dot += profile_count * job_count
+            profile_norm += profile_count * profile_count
+            job_norm += job_count * job_count
+        else:
+            profile_norm += (profile_count * unique_idf) ** 2
+            job_norm += (job_count * unique_idf) ** 2
+    
+    # Calculate cosine similarity
+    similarity = dot / math.sqrt(profile_norm * job_norm) if profile_norm and job_norm else 0.0
+    
+    # Convert to percentage
+    score = round(similarity * 100, 2)
+    
+    # Determine confidence
+    if score >= 70:
+        confidence = "high"
+    elif score >= 50:
+        confidence = "medium"
+    else:
+        confidence = "low"
+    
+    return {
+        "score": score,
+        "confidence": confidence,
+        "similarity_matrix": similarity
+    }
+
+
+def extract_keywords(text: str, top_n: int = 20, ranked: bool = False) -> List[str]:
+    """
+    Extract top keywords from text.
+    
+    Ranks terms by their count in the text, breaking ties alphabetically so
+    the result is deterministic. With one document every TF-IDF weight is
+    proportional to the count, so this follows the ranking
+    TfidfVectorizer(stop_words='english', max_features=top_n) uses, but the
+    vectorizer breaks ties differently and may keep other terms among equal counts.
+    
+    Args:
+        text: Text to extract keywords from
+        top_n: Maximum number of keywords
+        ranked: Order keywords by weight (highest first) instead of alphabetically,
+            so callers can take a shorter top-k prefix without recounting
+        
+    Returns:
+        List of lowercase keywords
+    """
     
     if not text:
         return []
     
     try:
-        vectorizer = TfidfVectorizer(stop_words='english', max_features=top_n)
-        vectorizer.fit([text])
-        keywords = vectorizer.get_feature_names_out()
-        return list(keywords)
+        counts = _count_terms(text)
+        # Most frequent first; ties alphabetical
+        keywords = sorted(counts, key=lambda term: (-counts[term], term))[:top_n]
+        return keywords if ranked else sorted(keywords)
     except Exception as e:
         print(f"Error extracting keywords: {e}")
         return []
 
 
+def extract_keywords_batch(texts: List[str], top_n: int = 20) -> List[List[str]]:
+    """
+    Extract top keywords from each of several texts.
+    
+    Args:
+        texts: Texts to extract keywords from
+        top_n: Maximum number of keywords per text
+        
+    Returns:
+        List of keyword lists, one per text, as extract_keywords returns them
+    """
+    return [extract_keywords(text, top_n) for text in texts]
+
+
 def find_missing_keywords(profile_keywords: List[str], job_keywords: List[str]) -> List[str]:
     """Find keywords in job description that are missing from profile."""
-    profile_set = set(k.lower() for k in profile_keywords)
-    job_set = set(k.lower() for k in job_keywords)
-    return list(job_set - profile_set)
+    # Callers may pass skill names as well as (lowercase) TF-IDF terms
+    return list(set(map(str.lower, job_keywords)).difference(map(str.lower, profile_keywords)))
 
 
 def format_profile_data(raw_profile: Dict[str, Any]) -> str:
-    """Format profile data into readable text for LLM processing."""
+    """
+    Format profile data into readable text for LLM processing.
+    
+    Only the most recent positions and the first (most endorsed) skills are
+    included, and the result is capped at settings.max_formatted_profile_chars.
+    """
     
     formatted = []
     
@@ -169,58 +313,62 @@ def format_profile_data(raw_profile: Dict[str, Any]) -> str:
     # Experience
     if raw_profile.get("experience"):
         formatted.append("\nExperience:")
-        for exp in raw_profile["experience"]:
-            title = exp.get('title', 'N/A')
-            company = exp.get('company', 'N/A')
+        # Positions are listed most recent first
+        experiences = raw_profile["experience"]
+        for exp in experiences[:settings.max_profile_experiences]:
             start_date = exp.get('start_date', '')
-            end_date = exp.get('end_date', 'Present')
-            is_current = exp.get('is_current', False)
-            
-            # Format the experience entry with clear date information
-            date_range = f"{start_date} - {end_date}" if start_date else "Date not specified"
-            status = " (CURRENT POSITION)" if is_current else " (ENDED)"
+            description = exp.get('description')
+            duration = exp.get('duration')
             
-            formatted.append(f"- {title} at {company}")
-            formatted.append(f"  Period: {date_range}{status}")
+            # Format the experience entry with clear date information, as one
+            # multi-line string per entry
+            date_range = f"{start_date} - {exp.get('end_date', 'Present')}" if start_date else "Date not specified"
+            status = " (CURRENT POSITION)" if exp.get('is_current', False) else " (ENDED)"
             
-            if exp.get("description"):
-                formatted.append(f"  {exp['description']}")
-            if exp.get("duration"):
-                formatted.append(f"  Duration: {exp['duration']}")
+            entry = f"- {exp.get('title', 'N/A')} at {exp.get('company', 'N/A')}\n  Period: {date_range}{status}"
+            if description:
+                entry += f"\n  {shrink_text(description, settings.max_experience_description_chars)}"
+            if duration:
+                entry += f"\n  Duration: {duration}"
+            formatted.append(entry)
+        
+        omitted = len(experiences) - settings.max_profile_experiences
+        if omitted > 0:
+            formatted.append(f"- ({omitted} earlier positions omitted)")
     
     # Education
     if raw_profile.get("education"):
         formatted.append("\nEducation:")
         for edu in raw_profile["education"]:
             degree = edu.get('degree', 'N/A')
-            school = edu.get('school', 'N/A')
             start_date = edu.get('start_date', '')
             end_date = edu.get('end_date', '')
             duration = edu.get('duration', '')
             field_of_study = edu.get('field_of_study', '')
             
             # Format the education entry with complete information
-            formatted.append(f"- {degree} from {school}")
+            entry = f"- {degree} from {edu.get('school', 'N/A')}"
             
             if field_of_study and field_of_study not in degree:
-                formatted.append(f"  Field of Study: {field_of_study}")
+                entry += f"\n  Field of Study: {field_of_study}"
             
             # Show dates if available
-            if start_date or end_date or duration:
-                if duration:
-                    formatted.append(f"  Duration: {duration}")
-                elif start_date and end_date:
-                    formatted.append(f"  Period: {start_date} - {end_date}")
-                elif start_date:
-                    formatted.append(f"  Start Date: {start_date}")
-                elif end_date:
-                    formatted.append(f"  Graduation Date: {end_date}")
+            if duration:
+                entry += f"\n  Duration: {duration}"
+            elif start_date and end_date:
+                entry += f"\n  Period: {start_date} - {end_date}"
+            elif start_date:
+                entry += f"\n  Start Date: {start_date}"
+            elif end_date:
+                entry += f"\n  Graduation Date: {end_date}"
+            
+            formatted.append(entry)
     
     # Skills
     if raw_profile.get("skills"):
         skills = raw_profile["skills"]
         if isinstance(skills, list):
-            formatted.append(f"\nSkills: {', '.join(skills)}")
+            formatted.append(f"\nSkills: {', '.join(skills[:settings.max_profile_skills])}")
         else:
             formatted.append(f"\nSkills: {skills}")
     
@@ -230,9 +378,10 @@ def format_profile_data(raw_profile: Dict[str, Any]) -> str:
         for cert in raw_profile["certifications"]:
             formatted.append(f"- {cert.get('name', 'N/A')}")
     
-    return "\n".join(formatted)
+    return shrink_text("\n".join(formatted), settings.max_formatted_profile_chars)
 
 
+@lru_cache(maxsize=512)
 def parse_experience_duration(duration_str: str) -> int:
     """Parse experience duration string and return months."""
     if not duration_str:
@@ -240,8 +389,8 @@ def parse_experience_duration(duration_str: str) -> int:
     
     try:
         # Extract years and months
-        years = re.search(r'(\d+)\s*(?:year|yr)', duration_str, re.IGNORECASE)
-        months = re.search(r'(\d+)\s*(?:month|mo)', duration_str, re.IGNORECASE)
+        years = _YEARS_RE.search(duration_str)
+        months = _MONTHS_RE.search(duration_str)
         
         total_months = 0
         if years:
@@ -267,6 +416,18 @@ def calculate_total_experience(experiences: List[Dict[str, Any]]) -> Dict[str, i
     return {"years": years, "months": months, "total_months": total_months}
 
 
+# Formats that can match a LinkedIn date, by the date's shape; only these
+# are tried, so a date costs one failed strptime at most
+_NAMED_MONTH_FORMATS = (
+    "%b %Y",      # Mar 2025
+    "%B %Y",      # March 2025
+)
+_SLASH_FORMATS = ("%m/%Y",)     # 03/2025
+_DASH_FORMATS = ("%m-%Y",)      # 03-2025
+_YEAR_FORMATS = ("%Y",)         # 2025
+
+
+@lru_cache(maxsize=512)
 def parse_date_string(date_str: str) -> Optional[datetime]:
     """
     Parse date string from LinkedIn profile into datetime object.
@@ -282,18 +443,19 @@ def parse_date_string(date_str: str) -> Optional[datetime]:
         return None
     
     try:
-        # Try different date formats
-        formats = [
-            "%b %Y",      # Mar 2025
-            "%B %Y",      # March 2025
-            "%Y",         # 2025
-            "%m/%Y",      # 03/2025
-            "%m-%Y",      # 03-2025
-        ]
+        date_str = date_str.strip()
+        if not date_str[:1].isdigit():
+            formats = _NAMED_MONTH_FORMATS
+        elif "/" in date_str:
+            formats = _SLASH_FORMATS
+        elif "-" in date_str:
+            formats = _DASH_FORMATS
+        else:
+            formats = _YEAR_FORMATS
         
         for fmt in formats:
             try:
-                return datetime.strptime(date_str.strip(), fmt)
+                return datetime.strptime(date_str, fmt)
             except ValueError:
                 continue
         
@@ -303,19 +465,25 @@ def parse_date_string(date_str: str) -> Optional[datetime]:
         return None
 
 
-def validate_experience_dates(experiences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def validate_experience_dates(
+    experiences: List[Dict[str, Any]],
+    current_date: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
     """
     Validate experience dates and check for inconsistencies.
     Returns list of issues found.
     
     Args:
         experiences: List of experience dictionaries
+        current_date: Date to validate against (defaults to now); pass one
+            timestamp to validate many profiles consistently
         
     Returns:
         List of validation issues
     """
     issues = []
-    current_date = datetime.now()
+    current_date = current_date or datetime.now()
+    current_date_str = current_date.strftime("%b %Y")
     
     for i, exp in enumerate(experiences):
         title = exp.get('title', 'Unknown')
@@ -334,7 +502,7 @@ def validate_experience_dates(experiences: List[Dict[str, Any]]) -> List[Dict[st
                 'position': f"{title} at {company}",
                 'issue': 'Start date appears to be in the future',
                 'start_date': start_date_str,
-                'current_date': current_date.strftime("%b %Y")
+                'current_date': current_date_str
             })
         
         # Check if end date is before start date
@@ -350,9 +518,27 @@ def validate_experience_dates(experiences: List[Dict[str, Any]]) -> List[Dict[st
 
 
 def generate_session_id() -> str:
-    """Generate a unique session ID."""
-    from uuid import uuid4
-    return str(uuid4())
+    """Generate a unique session ID (32 random hex characters)."""
+    return secrets.token_hex(16)
+
+
+def write_text_atomic(path: Path, text: str):
+    """
+    Replace a file's contents so readers see either the old or the new file.
+    
+    The text goes to a temporary file next to the target, is fsynced, and is
+    then renamed over the target; a crash mid-write leaves the old file intact.
+    
+    Args:
+        path: File to write
+        text: New file contents
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 
 def save_json(data: Any, filepath: str) -> bool: